@@ -6,17 +6,19 @@
 import sys
 import os
 import re
+import threading
+from collections import deque
 from functools import partial
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLineEdit, QPushButton, QTextEdit, QLabel, QSplitter, QTreeWidget,
     QTreeWidgetItem, QFormLayout, QDialog, QDialogButtonBox, QMessageBox,
-    QInputDialog, QComboBox
+    QInputDialog, QComboBox, QListWidget, QListWidgetItem, QTabWidget, QTabBar, QCheckBox
 )
 from PyQt5.QtCore import (
-    Qt, QThread, QObject, pyqtSignal, QPropertyAnimation, QEasingCurve,
-    pyqtProperty
+    Qt, QObject, pyqtSignal, QPropertyAnimation, QEasingCurve,
+    pyqtProperty, QTimer
 )
 from PyQt5.QtGui import QFont, QIcon, QColor, QTextCursor, QTextCharFormat
 
@@ -25,12 +27,35 @@ from auth_rbac import AuthManager, Role
 from command_templates import CommandTemplates, ParamSpec
 from logging_audit import AuditLogger
 from utils import AdvancedNLUParser
-from sysadmin_actions import execute_intent
+from execution_pool import ExecutionPool, Job, PENDING, RUNNING, DONE, FAILED, CANCELLED
+import output_spool
+from process_engine import get_engine
+import shell_pool
+import capabilities
+from sysadmin_actions import has_special_handler
+import system_monitor
 import icon
 from spinner import SpinnerWidget # Импорт нашего спиннера
+from load_graph import LoadGraphWidget
+from record_view import RecordTableWidget
+from output_pager import OutputPager
 
 # --- Константы ---
 COMMANDS_FILE = "commands.json"
+SUGGEST_DEBOUNCE_MS = 150
+SUGGEST_LIMIT = 5
+MAX_PARALLEL_JOBS = 4
+# Набор команд для быстрой диагностики, запускаемых одновременно
+TRIAGE_INTENTS = ["disk.usage", "services.list", "system.get_load", "logs.show_system"]
+JOB_STATUS_LABELS = {PENDING: "в очереди", RUNNING: "выполняется", DONE: "готово", FAILED: "ошибка",
+                     CANCELLED: "отменено"}
+JOB_STATUS_ICONS = {PENDING: "appointment-soon", RUNNING: "media-playback-start",
+                    DONE: "dialog-ok", FAILED: "dialog-error", CANCELLED: "process-stop"}
+# Сколько ждать остановки заданий при закрытии окна (секунды)
+SHUTDOWN_WAIT_SECONDS = 10
+# Сколько символов вывода задания может ждать UI-поток; у заданий с файлом
+# вывода более ранний текст отбрасывается (консоль перечитает его из файла)
+MAX_PENDING_OUTPUT = 1024 * 1024
 DISCORD_STYLESHEET = """
     QMainWindow, QDialog { background-color: #36393f; }
     QWidget { color: #dcddde; font-family: "Segoe UI", "Cantarell", sans-serif; font-size: 10pt; }
@@ -40,6 +65,11 @@ DISCORD_STYLESHEET = """
     QTreeWidget::item { padding: 8px 10px; border-radius: 4px; }
     QTreeWidget::item:hover { background-color: #3a3c43; }
     QTreeWidget::item:selected { background-color: #40444b; color: #ffffff; }
+    QListWidget {
+        background-color: #2f3136; border: 1px solid #40444b; border-radius: 4px; outline: 0;
+    }
+    QListWidget::item { padding: 4px 8px; }
+    QListWidget::item:selected, QListWidget::item:hover { background-color: #40444b; }
     QTreeWidget::branch {
         /* Оставляем пустым, чтобы использовались системные стрелки */
     }
@@ -58,6 +88,20 @@ DISCORD_STYLESHEET = """
         border-radius: 4px; color: #dcddde;
         font-family: "Consolas", "Courier New", monospace;
     }
+    QTableView {
+        background-color: #202225; border: 1px solid #40444b; border-radius: 4px;
+        color: #dcddde; gridline-color: #2f3136; selection-background-color: #40444b;
+    }
+    QHeaderView::section {
+        background-color: #2f3136; color: #8e9297; border: none; padding: 4px 6px;
+    }
+    QTabWidget::pane { border: none; }
+    QTabBar::tab {
+        background-color: #2f3136; color: #8e9297; padding: 6px 12px;
+        border-top-left-radius: 4px; border-top-right-radius: 4px; margin-right: 2px;
+    }
+    QTabBar::tab:selected { background-color: #40444b; color: #ffffff; }
+    QTabBar::tab:hover { color: #dcddde; }
     QSplitter::handle { background-color: #202225; }
     QSplitter::handle:hover { background-color: #7289da; }
     QScrollBar:vertical { background: #2f3136; width: 10px; margin: 0; }
@@ -65,6 +109,7 @@ DISCORD_STYLESHEET = """
     QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical { height: 0px; }
     QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical { background: none; }
     QLabel { padding-top: 4px; }
+    QCheckBox { color: #8e9297; }
     QMessageBox { background-color: #36393f; }
     QDialogButtonBox QPushButton {
         background-color: #5865f2;
@@ -121,15 +166,32 @@ INTENT_ICONS = {
     'power.reboot': 'system-reboot', 'power.shutdown': 'system-shutdown'
 }
 
-class Worker(QObject):
-    finished = pyqtSignal()
-    output = pyqtSignal(str)
-    def __init__(self, intent, params, command_templates):
+class PoolBridge(QObject):
+    """
+    Переносит события пула выполнения из потока движка в UI-поток через очередь Qt.
+    Вывод копится до обработки: на все накопленное - один сигнал job_output.
+    """
+    job_output = pyqtSignal(int)
+    job_status = pyqtSignal(int, str)
+    def __init__(self):
         super().__init__()
-        self.intent, self.params, self.command_templates = intent, params, command_templates
-    def run(self):
-        execute_intent(self.intent, self.params, self.command_templates, self.output.emit)
-        self.finished.emit()
+        self._pending, self._lock = {}, threading.Lock()
+    def on_output(self, job: Job, text: str):
+        with self._lock:
+            pending = self._pending.get(job.job_id)
+            notify = pending is None
+            if notify: pending = self._pending[job.job_id] = {"chunks": deque(), "size": 0, "truncated": False}
+            pending["chunks"].append(text); pending["size"] += len(text)
+            while job.spool and pending["size"] > MAX_PENDING_OUTPUT and len(pending["chunks"]) > 1:
+                pending["size"] -= len(pending["chunks"].popleft()); pending["truncated"] = True
+        if notify: self.job_output.emit(job.job_id)
+    def take_output(self, job_id: int):
+        """Накопленный вывод задания и признак того, что его начало отброшено."""
+        with self._lock:
+            pending = self._pending.pop(job_id, None)
+        return (list(pending["chunks"]), pending["truncated"]) if pending else ([], False)
+    # Статус передается в сигнале: к моменту обработки задание может уйти дальше
+    def on_status(self, job: Job): self.job_status.emit(job.job_id, job.status)
 
 class AnimatedButton(QPushButton):
     def __init__(self, *args, **kwargs):
@@ -185,6 +247,8 @@ class LoginDialog(QDialog):
             self.status_label.setText("Неверное имя пользователя или пароль.")
 
 class MainWindow(QMainWindow):
+    nlu_ready = pyqtSignal()
+    capabilities_changed = pyqtSignal()
     def __init__(self, username: str, user_role: Role, auth_manager: AuthManager):
         super().__init__()
         self.username, self.user_role, self.auth_manager = username, user_role, auth_manager
@@ -192,10 +256,30 @@ class MainWindow(QMainWindow):
         try: self.command_templates.load_from_json(COMMANDS_FILE)
         except Exception as e:
             QMessageBox.critical(self, "Критическая ошибка", f"Не удалось загрузить '{COMMANDS_FILE}':\n{e}"); sys.exit(1)
-        self.nlu_parser, self.logger = AdvancedNLUParser(self.command_templates), AuditLogger()
+        self.nlu_parser, self.logger = AdvancedNLUParser(self.command_templates, background=True), AuditLogger()
         self.current_intent, self.param_widgets = None, {}
-        self.thread, self.worker = None, None
+        self.pool_bridge = PoolBridge()
+        # Вывод заданий пишется в файлы logs/spool/, в консоли - только страница
+        output_spool.cleanup_spool_dir()
+        self.execution_pool = ExecutionPool(self.command_templates, MAX_PARALLEL_JOBS,
+                                            self.pool_bridge.on_output, self.pool_bridge.on_status,
+                                            spool_dir=output_spool.SPOOL_DIR)
+        # Вкладка задания - консоль или (при разборе вывода) консоль и таблица записей
+        self.job_pagers, self.job_pages, self.job_tables, self.intent_items = {}, {}, {}, {}
+        # Снимки процессов и метрики собираются заранее, чтобы process.list
+        # и system.get_load отвечали сразу, а график загрузки имел историю
+        system_monitor.start_background_sampling()
+        # Оболочки для интентов с "pool_safe" запускаются заранее
+        shell_pool.start_shell_pool()
         self.init_ui()
+        # Словари pymorphy2 грузятся в фоне; сигнал переносит уведомление в UI-поток
+        self.nlu_ready.connect(self.on_nlu_ready)
+        if not self.nlu_parser.is_ready(): self.statusBar().showMessage("NLU: загрузка словарей (упрощенный режим)...")
+        self.nlu_parser.on_ready(self.nlu_ready.emit)
+        # Доступность программ проверяется в фоне; недоступные интенты затеняются
+        self.capabilities_changed.connect(self.update_intent_availability)
+        self.capabilities = capabilities.start_probe(self.command_templates, native=has_special_handler)
+        self.capabilities.add_listener(self.capabilities_changed.emit)
     def init_ui(self):
         self.setWindowTitle("SysAdmin Assistant"); self.setGeometry(100, 100, 1200, 800)
         central_widget = QWidget()
@@ -204,8 +288,14 @@ class MainWindow(QMainWindow):
         main_layout.setContentsMargins(0, 0, 0, 0); main_layout.setSpacing(0)
         splitter = QSplitter(Qt.Horizontal)
         main_layout.addWidget(splitter)
+        left_panel = QWidget()
+        left_layout = QVBoxLayout(left_panel)
+        left_layout.setContentsMargins(0, 0, 0, 0); left_layout.setSpacing(0)
         self.function_tree = QTreeWidget(); self.function_tree.setHeaderHidden(True)
-        splitter.addWidget(self.function_tree)
+        left_layout.addWidget(self.function_tree)
+        self.load_graph = LoadGraphWidget()
+        left_layout.addWidget(self.load_graph)
+        splitter.addWidget(left_panel)
         self.populate_function_tree()
         right_panel = QWidget()
         right_layout = QVBoxLayout(right_panel)
@@ -217,7 +307,18 @@ class MainWindow(QMainWindow):
         self.spinner = SpinnerWidget(); self.spinner.hide()
         nlu_area_layout.addWidget(self.nlu_input); nlu_area_layout.addWidget(self.spinner)
         nlu_area_layout.addWidget(self.nlu_execute_button)
+        self.triage_button = AnimatedButton("Диагностика")
+        self.triage_button.setIcon(QIcon.fromTheme("utilities-system-monitor"))
+        self.triage_button.setToolTip("Одновременно запустить: " + ", ".join(TRIAGE_INTENTS))
+        nlu_area_layout.addWidget(self.triage_button)
         right_layout.addLayout(nlu_area_layout)
+        self.force_refresh_checkbox = QCheckBox("Обновить принудительно (без кэша)")
+        self.force_refresh_checkbox.setToolTip("Выполнить команду заново, даже если ее результат есть в кэше")
+        right_layout.addWidget(self.force_refresh_checkbox)
+        self.suggestion_list = QListWidget(); self.suggestion_list.setMaximumHeight(130)
+        right_layout.addWidget(self.suggestion_list); self.suggestion_list.hide()
+        self.suggest_timer = QTimer(self); self.suggest_timer.setSingleShot(True)
+        self.suggest_timer.setInterval(SUGGEST_DEBOUNCE_MS)
         self.param_form_layout = QFormLayout()
         self.param_form_layout.setRowWrapPolicy(QFormLayout.WrapAllRows)
         right_layout.addLayout(self.param_form_layout)
@@ -225,15 +326,27 @@ class MainWindow(QMainWindow):
         self.form_execute_button.setIcon(QIcon.fromTheme("media-playback-start"))
         right_layout.addWidget(self.form_execute_button); self.form_execute_button.hide()
         right_layout.addStretch(1)
+        self.output_tabs = QTabWidget(); self.output_tabs.setTabsClosable(True)
         self.output_console = QTextEdit(); self.output_console.setReadOnly(True)
-        right_layout.addWidget(self.output_console, 2)
+        self.output_tabs.addTab(self.output_console, QIcon.fromTheme("utilities-terminal"), "Журнал")
+        self.output_tabs.tabBar().setTabButton(0, QTabBar.RightSide, None)
+        right_layout.addWidget(self.output_tabs, 2)
         splitter.addWidget(right_panel); splitter.setSizes([280, 920]); splitter.setHandleWidth(1)
         self.function_tree.itemClicked.connect(self.on_tree_item_clicked)
         self.nlu_execute_button.clicked.connect(self.execute_from_nlu)
         self.nlu_input.returnPressed.connect(self.execute_from_nlu)
+        self.nlu_input.textEdited.connect(self.suggest_timer.start)
+        self.suggest_timer.timeout.connect(self.update_suggestions)
+        self.suggestion_list.itemClicked.connect(self.on_suggestion_clicked)
         self.form_execute_button.clicked.connect(self.execute_from_form)
+        self.triage_button.clicked.connect(self.run_triage)
+        self.output_tabs.tabCloseRequested.connect(self.close_job_tab)
+        self.pool_bridge.job_output.connect(self.handle_job_output)
+        self.pool_bridge.job_status.connect(self.handle_job_status)
+    def on_nlu_ready(self):
+        self.statusBar().showMessage("NLU: готов", 3000)
     def populate_function_tree(self):
-        self.function_tree.clear(); categories = {}
+        self.function_tree.clear(); self.intent_items.clear(); categories = {}
         for intent, template in self.command_templates.intents.items():
             category_key = intent.split('.')[0].capitalize()
             if category_key not in categories: categories[category_key] = []
@@ -248,6 +361,17 @@ class MainWindow(QMainWindow):
                 child_item.setIcon(0, QIcon.fromTheme(icon_name))
                 child_item.setData(0, Qt.UserRole, template.intent)
                 child_item.setToolTip(0, f"Интент: {template.intent}")
+                self.intent_items[template.intent] = child_item
+    def update_intent_availability(self):
+        for intent, item in self.intent_items.items():
+            reason = self.capabilities.unavailable_reason(intent)
+            template = self.command_templates.get_intent_template(intent)
+            command = template.templates.get(self.capabilities.os_type, "") if template else ""
+            tooltip = f"Интент: {intent}"
+            if reason: tooltip += f"\nНедоступно: {reason}"
+            elif not has_special_handler(intent) and self.capabilities.sudo_password_required(command):
+                tooltip += "\nsudo запросит пароль"
+            item.setDisabled(bool(reason)); item.setToolTip(0, tooltip)
     def clear_param_form(self):
         for i in reversed(range(self.param_form_layout.count())):
             layout_item = self.param_form_layout.takeAt(i)
@@ -256,6 +380,8 @@ class MainWindow(QMainWindow):
     def on_tree_item_clicked(self, item, column):
         intent = item.data(0, Qt.UserRole)
         if not intent: self.clear_param_form(); self.current_intent = None; return
+        self.select_intent(intent)
+    def select_intent(self, intent: str):
         template = self.command_templates.get_intent_template(intent)
         if not template: return
         if not template.params:
@@ -286,7 +412,25 @@ class MainWindow(QMainWindow):
             elif template.params[name].required:
                 QMessageBox.warning(self, "Ошибка ввода", f"Параметр '{name}' является обязательным."); return
         self.run_execution(self.current_intent, params)
+    def update_suggestions(self):
+        text = self.nlu_input.text()
+        suggestions = self.nlu_parser.suggest(text, SUGGEST_LIMIT) if text.strip() else []
+        self.suggestion_list.clear()
+        for intent, score in suggestions:
+            template = self.command_templates.get_intent_template(intent)
+            item = QListWidgetItem(f"{template.description if template else intent}  ({score:.0f}%)")
+            item.setIcon(QIcon.fromTheme(INTENT_ICONS.get(intent, 'application-x-executable')))
+            item.setData(Qt.UserRole, intent); item.setToolTip(f"Интент: {intent}")
+            self.suggestion_list.addItem(item)
+        self.suggestion_list.setVisible(bool(suggestions))
+    def hide_suggestions(self):
+        self.suggest_timer.stop(); self.suggestion_list.clear(); self.suggestion_list.hide()
+    def on_suggestion_clicked(self, item):
+        intent = item.data(Qt.UserRole)
+        self.hide_suggestions()
+        if intent: self.select_intent(intent)
     def execute_from_nlu(self):
+        self.hide_suggestions()
         text = self.nlu_input.text().strip()
         if not text: return
         parsed_data = self.nlu_parser.parse(text)
@@ -301,38 +445,90 @@ class MainWindow(QMainWindow):
                     if ok and value: params[p_name] = value
                     else: self.log_to_console(f"Отмена. Нет параметра '{p_name}'.\n", "error"); return
         self.run_execution(intent, params)
-    def run_execution(self, intent: str, params: dict):
-        if self.thread and self.thread.isRunning():
-            self.log_to_console("! Предыдущая команда еще выполняется...\n", "warning"); return
-        self.output_console.clear()
-        self.log_to_console(f"----- Запуск: {intent} -----\n", "header")
+    def run_triage(self):
+        for intent in TRIAGE_INTENTS:
+            if self.command_templates.get_intent_template(intent): self.run_execution(intent, {}, focus=False)
+        self.log_to_console(f"Диагностика: запущено {len(TRIAGE_INTENTS)} команд, "
+                            f"одновременно не более {MAX_PARALLEL_JOBS}.\n", "info")
+    def run_execution(self, intent: str, params: dict, focus: bool = True):
         masked_params = {k: '******' if 'password' in k.lower() else v for k, v in params.items()}
-        self.log_to_console(f"> Параметры: {masked_params}\n", "info")
         self.logger.info(self.username, intent, params, "Execution started.")
-        self.toggle_ui_for_execution(True)
-        self.thread, self.worker = QThread(), Worker(intent, params, self.command_templates)
-        self.worker.moveToThread(self.thread)
-        self.worker.output.connect(self.handle_worker_output)
-        self.worker.finished.connect(self.on_execution_finished)
-        self.thread.started.connect(self.worker.run)
-        self.thread.start()
-    def on_execution_finished(self):
-        self.log_to_console("\n----- Выполнение завершено -----\n", "success")
-        self.toggle_ui_for_execution(False)
-        if self.thread:
-            self.thread.quit(); self.thread.wait()
-            self.thread.deleteLater(); self.worker.deleteLater()
-            self.thread, self.worker = None, None
-    def toggle_ui_for_execution(self, is_running: bool):
-        self.nlu_execute_button.setEnabled(not is_running); self.form_execute_button.setEnabled(not is_running)
-        self.function_tree.setEnabled(not is_running)
-        if is_running: self.spinner.start()
-        else: self.spinner.stop()
-    def handle_worker_output(self, text: str):
-        if text.strip().startswith("ERROR:"): self.log_to_console(text, "error")
-        else: self.log_to_console(text, "stdout")
-    def log_to_console(self, text: str, msg_type: str = "stdout"):
-        cursor = self.output_console.textCursor(); cursor.movePosition(QTextCursor.End)
+        header, params_line = f"----- Запуск: {intent} -----\n", f"> Параметры: {masked_params}\n"
+        # Заголовок хранится в выводе задания (для перехода по страницам), а
+        # вывод команды придет через очередь Qt, то есть после заголовка
+        job = self.execution_pool.submit(intent, params, use_cache=not self.force_refresh_checkbox.isChecked(),
+                                         header=header + params_line)
+        pager = OutputPager(job.spool, self.log_to_console)
+        pager.append(header, "header"); pager.append(params_line, "info")
+        self.job_pagers[job.job_id] = pager
+        page = pager
+        if job.table is not None:
+            table_view = RecordTableWidget(job.table)
+            page = QTabWidget(); page.setDocumentMode(True)
+            page.addTab(pager, QIcon.fromTheme("utilities-terminal"), "Вывод")
+            page.addTab(table_view, QIcon.fromTheme("view-list-details"), "Таблица")
+            self.job_tables[job.job_id] = table_view
+        page.setProperty("job_id", job.job_id)
+        self.job_pages[job.job_id] = page
+        index = self.output_tabs.addTab(page, "")
+        self.update_job_tab(job)
+        if focus: self.output_tabs.setCurrentIndex(index)
+        self.update_execution_state()
+    def handle_job_output(self, job_id: int):
+        chunks, truncated = self.pool_bridge.take_output(job_id)
+        pager = self.job_pagers.get(job_id)
+        if pager is None: return
+        # UI отстал от вывода: пропущенный текст уже в файле вывода
+        if truncated: pager.catch_up()
+        else:
+            for text in chunks: pager.append(text, "error" if text.strip().startswith("ERROR:") else "stdout")
+        self.refresh_job_table(job_id)
+    def refresh_job_table(self, job_id: int):
+        table_view, page = self.job_tables.get(job_id), self.job_pages.get(job_id)
+        if table_view is None: return
+        table_view.refresh()
+        page.setTabText(page.indexOf(table_view), f"Таблица ({len(table_view.table)})")
+    def handle_job_status(self, job_id: int, status: str):
+        job, pager = self.execution_pool.get(job_id), self.job_pagers.get(job_id)
+        if job is None: return
+        if status in (DONE, FAILED, CANCELLED):
+            self.refresh_job_table(job_id)
+            stats = job.result.summary() if job.result else f"{job.duration or 0:.2f} с"
+            summary = f"\n----- Выполнение завершено ({JOB_STATUS_LABELS[status]}, {stats}) -----\n"
+            self.execution_pool.annotate(job_id, summary)
+            if pager is not None: pager.append(summary, "success" if status == DONE else "error")
+            self.logger.info(self.username, job.intent, job.params,
+                             f"Execution finished: {status}, exit code {job.exit_code}, {stats}.")
+        self.update_job_tab(job, status)
+        self.update_execution_state()
+    def update_job_tab(self, job: Job, status: str = None):
+        page, status = self.job_pages.get(job.job_id), status or job.status
+        index = self.output_tabs.indexOf(page) if page is not None else -1
+        if index < 0: return
+        self.output_tabs.setTabText(index, f"{job.intent} [{JOB_STATUS_LABELS[status]}]")
+        self.output_tabs.setTabIcon(index, QIcon.fromTheme(JOB_STATUS_ICONS[status]))
+        hint = "" if status in (DONE, FAILED, CANCELLED) else "\nЗакрытие вкладки останавливает задание"
+        self.output_tabs.setTabToolTip(index, f"Задание #{job.job_id}: {job.intent}{hint}")
+    def close_job_tab(self, index: int):
+        page = self.output_tabs.widget(index)
+        job_id = page.property("job_id") if page is not None else None
+        if job_id is None: return
+        job = self.execution_pool.get(job_id)
+        if job and not job.is_finished:
+            # Первое закрытие останавливает задание, вкладка остается с его выводом
+            if self.execution_pool.cancel(job_id):
+                self.statusBar().showMessage(f"Задание {job.intent} останавливается...", 3000)
+            return
+        self.output_tabs.removeTab(index); page.deleteLater()
+        for pages in (self.job_pagers, self.job_pages, self.job_tables): pages.pop(job_id, None)
+        self.execution_pool.forget(job_id)
+    def update_execution_state(self):
+        active = len(self.execution_pool.active_jobs())
+        if active: self.spinner.start(); self.statusBar().showMessage(f"Выполняется заданий: {active}")
+        else: self.spinner.stop(); self.statusBar().clearMessage()
+    def log_to_console(self, text: str, msg_type: str = "stdout", console: QTextEdit = None):
+        console = console or self.output_console
+        cursor = console.textCursor(); cursor.movePosition(QTextCursor.End)
         char_format = QTextCharFormat()
         color = {"stdout": QColor("#dcddde"), "header": QColor("#7289da"), "error": QColor("#f04747"),
                  "warning": QColor("#faa61a"), "success": QColor("#43b581"), "info": QColor("#8e9297")
@@ -341,10 +537,14 @@ class MainWindow(QMainWindow):
         if msg_type in ["header", "error"]: char_format.setFontWeight(QFont.Bold)
         else: char_format.setFontWeight(QFont.Normal)
         cursor.insertText(text, char_format)
-        self.output_console.verticalScrollBar().setValue(self.output_console.verticalScrollBar().maximum())
+        console.verticalScrollBar().setValue(console.verticalScrollBar().maximum())
     def closeEvent(self, event):
-        if self.thread and self.thread.isRunning():
-            self.thread.quit(); self.thread.wait()
+        self.execution_pool.cancel_all()
+        if not self.execution_pool.wait_all(SHUTDOWN_WAIT_SECONDS): print("Some jobs did not stop in time.")
+        self.execution_pool.close()
+        shell_pool.stop_shell_pool()
+        get_engine().shutdown()
+        system_monitor.stop_background_sampling()
         self.logger.close(); self.auth_manager.close(); super().closeEvent(event)
 
 def main():
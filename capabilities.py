@@ -0,0 +1,338 @@
+# capabilities.py
+"""
+Определение возможностей системы: тип ОС, доступные программы и права.
+
+CapabilityProbe один раз находит через shutil.which программы, с которых
+начинаются шаблоны команд (для "sudo" - и саму sudo, и запускаемую ей
+программу), и проверяет, нужна ли sudo (процесс уже работает от имени
+администратора) и запрашивает ли она пароль. Проверка выполняется в фоне,
+а ее результат сохраняется в db/ с ключом по PATH и commands.json: при
+следующем запуске сведения доступны сразу и затем перепроверяются.
+Изменение PATH запускает повторную проверку.
+"""
+import hashlib
+import json
+import os
+import platform
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass, field, replace
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+DB_DIR = "db"
+CAPABILITIES_CACHE_PATH = os.path.join(DB_DIR, "capabilities.json")
+CAPABILITIES_CACHE_FORMAT = 1
+# Внутренние команды cmd.exe: программы с такими именами не ищутся
+WINDOWS_SHELL_BUILTINS = {"echo", "dir", "set", "type", "cd", "copy", "move", "del", "mkdir", "rmdir",
+                          "ver", "vol", "start", "cls", "path", "title"}
+
+
+@lru_cache(maxsize=1)
+def detect_os_type() -> str:
+    """Тип ОС для выбора шаблона команды: "win" или "astro"."""
+    return "win" if platform.system().lower() == "windows" else "astro"
+
+
+def _is_admin() -> bool:
+    if detect_os_type() == "win":
+        try:
+            import ctypes
+            return bool(ctypes.windll.shell32.IsUserAnAdmin())
+        except Exception:
+            return False
+    return hasattr(os, "geteuid") and os.geteuid() == 0
+
+
+def _split_command(command: str) -> List[str]:
+    try:
+        return shlex.split(command, posix=detect_os_type() != "win")
+    except ValueError:
+        return command.split()
+
+
+def command_executables(command: str) -> List[str]:
+    """
+    Программы, которые нужны для запуска команды: первый токен, а для
+    "sudo" - еще и следующий. Внутренние команды cmd.exe и неотрендеренные
+    подстановки ("{algorithm}sum") пропускаются.
+    """
+    tokens = _split_command(command)
+    executables = []
+    for token in tokens[:2]:
+        if "{" in token or (detect_os_type() == "win" and token.lower() in WINDOWS_SHELL_BUILTINS):
+            break
+        executables.append(token)
+        if token != "sudo":
+            break
+    return executables
+
+
+@dataclass
+class CapabilityReport:
+    """
+    Результат проверки возможностей системы.
+
+    Attributes:
+        key: Ключ актуальности (формат, ОС, PATH, хэш commands.json).
+        os_type: "win" или "astro".
+        os_name: Описание ОС (platform.platform()).
+        is_admin: Процесс работает от имени администратора (root).
+        sudo_passwordless: sudo выполняется без пароля ("sudo -n true").
+        executables: Найденные пути программ (None - программа не найдена).
+        probed_at: Время проверки (time.time()).
+    """
+    key: str
+    os_type: str
+    os_name: str
+    is_admin: bool = False
+    sudo_passwordless: bool = False
+    executables: Dict[str, Optional[str]] = field(default_factory=dict)
+    probed_at: float = 0.0
+
+
+class CapabilityProbe:
+    """
+    Кэширующая проверка доступности программ для шаблонов команд.
+    До окончания первой проверки все интенты считаются доступными.
+    """
+
+    def __init__(self, command_templates=None, cache_path: Optional[str] = CAPABILITIES_CACHE_PATH,
+                 native: Optional[Callable[[str], bool]] = None):
+        """
+        Args:
+            command_templates: Шаблоны команд, программы которых проверяются заранее.
+            cache_path: Путь к файлу кэша. None отключает дисковый кэш.
+            native: Функция, возвращающая True для интентов, которые выполняются
+                    без внешних программ (специальными обработчиками).
+        """
+        self.command_templates = command_templates
+        self.cache_path = cache_path
+        self.native = native or (lambda intent: False)
+        self.os_type = detect_os_type()
+        self.report: Optional[CapabilityReport] = None
+        self._lock = threading.Lock()
+        self._probing = False
+        self._ready = threading.Event()
+        self._listeners: List[Callable[[], None]] = []
+        # Программы, найденные вне фоновой проверки (например, после изменения PATH)
+        self._which_cache: Dict[str, Optional[str]] = {}
+        self._path = os.environ.get("PATH", "")
+
+    # --- Проверка ---
+
+    def _key(self, path: str) -> str:
+        source_hash = getattr(self.command_templates, "source_hash", None) or ""
+        key_data = f"{CAPABILITIES_CACHE_FORMAT}|{self.os_type}|{path}|{source_hash}"
+        return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+    def _template_executables(self) -> List[str]:
+        names = set()
+        intents = getattr(self.command_templates, "intents", {}) or {}
+        for template in intents.values():
+            command = template.templates.get(self.os_type)
+            if command:
+                names.update(command_executables(command))
+        return sorted(names)
+
+    def probe(self) -> CapabilityReport:
+        """Выполняет проверку (блокирующе) и сохраняет результат."""
+        path = os.environ.get("PATH", "")
+        started = time.perf_counter()
+        executables = {name: shutil.which(name) for name in self._template_executables()}
+        report = CapabilityReport(key=self._key(path), os_type=self.os_type, os_name=platform.platform(),
+                                  is_admin=_is_admin(), executables=executables, probed_at=time.time())
+        if self.os_type == "astro" and not report.is_admin and executables.get("sudo"):
+            try:
+                report.sudo_passwordless = subprocess.run(["sudo", "-n", "true"], stdin=subprocess.DEVNULL,
+                                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                                          timeout=5).returncode == 0
+            except (OSError, subprocess.TimeoutExpired):
+                report.sudo_passwordless = False
+        missing = sorted(name for name, location in executables.items() if location is None)
+        print(f"Capabilities probed in {time.perf_counter() - started:.2f}s: {len(executables)} programs, "
+              f"missing: {', '.join(missing) or 'none'}.")
+        self._apply(report, path)
+        self._save_cache(report)
+        return report
+
+    def start(self):
+        """
+        Загружает сохраненный результат (если он актуален) и запускает
+        проверку в фоновом потоке.
+        """
+        cached = self._load_cache()
+        if cached:
+            self._apply(cached, os.environ.get("PATH", ""))
+        self._start_probe()
+
+    def _start_probe(self):
+        with self._lock:
+            if self._probing:
+                return
+            self._probing = True
+
+        def run():
+            try:
+                self.probe()
+            except Exception as e:
+                print(f"Warning: Capability probe failed: {e}")
+            finally:
+                with self._lock:
+                    self._probing = False
+
+        threading.Thread(target=run, name="CapabilityProbe", daemon=True).start()
+
+    def _apply(self, report: CapabilityReport, path: str):
+        with self._lock:
+            changed = self.report is None or replace(self.report, probed_at=0) != replace(report, probed_at=0)
+            self.report = report
+            self._path = path
+            self._which_cache.clear()
+            listeners = list(self._listeners) if changed else []
+        self._ready.set()
+        for listener in listeners:
+            listener()
+
+    def _check_path(self):
+        """Сбрасывает найденные пути и перепроверяет программы, если PATH изменился."""
+        path = os.environ.get("PATH", "")
+        if path == self._path:
+            return
+        with self._lock:
+            self._path = path
+            self._which_cache.clear()
+        print("Capabilities: PATH changed, probing again.")
+        self._start_probe()
+
+    # --- Дисковый кэш ---
+
+    def _load_cache(self) -> Optional[CapabilityReport]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                report = CapabilityReport(**json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Warning: Failed to read capabilities cache '{self.cache_path}': {e}")
+            return None
+        if report.key != self._key(os.environ.get("PATH", "")):
+            return None
+        return report
+
+    def _save_cache(self, report: CapabilityReport):
+        """Сохраняет результат проверки (через временный файл, атомарно)."""
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            cache_dir = os.path.dirname(self.cache_path)
+            if cache_dir and not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(asdict(report), f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: Failed to write capabilities cache '{self.cache_path}': {e}")
+
+    # --- Запросы ---
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Ожидает первого результата проверки. Возвращает состояние готовности."""
+        return self._ready.wait(timeout)
+
+    def add_listener(self, callback: Callable[[], None]):
+        """
+        Регистрирует функцию, вызываемую при получении или изменении результата
+        проверки. Может вызываться из фонового потока.
+        """
+        with self._lock:
+            self._listeners.append(callback)
+            ready = self.report is not None
+        if ready:
+            callback()
+
+    def which(self, name: str) -> Optional[str]:
+        """Путь к программе; результат запоминается до изменения PATH."""
+        self._check_path()
+        with self._lock:
+            report = self.report
+            if report is not None and report.key == self._key(self._path) and name in report.executables:
+                return report.executables[name]
+            if name in self._which_cache:
+                return self._which_cache[name]
+        location = shutil.which(name)
+        with self._lock:
+            self._which_cache[name] = location
+        return location
+
+    def needs_sudo(self) -> bool:
+        """Нужно ли повышать права через sudo (процесс не от имени root)."""
+        return not (self.report.is_admin if self.report else _is_admin())
+
+    def adapt_command(self, command: str) -> str:
+        """Убирает "sudo" в начале команды, если процесс уже работает от имени root."""
+        if self.os_type == "astro" and command.startswith("sudo ") and not self.needs_sudo():
+            return command[len("sudo "):].lstrip()
+        return command
+
+    def sudo_password_required(self, command: str) -> bool:
+        """Запросит ли sudo пароль при запуске команды (запуск из UI без терминала)."""
+        return (self.os_type == "astro" and command.startswith("sudo ") and self.needs_sudo()
+                and self.report is not None and not self.report.sudo_passwordless)
+
+    def missing_executables(self, command: str) -> List[str]:
+        """Программы команды, которые не найдены в PATH."""
+        names = command_executables(command)
+        if names and names[0] == "sudo" and not self.needs_sudo():
+            names = names[1:]
+        return [name for name in names if self.which(name) is None]
+
+    def unavailable_reason(self, intent: str) -> Optional[str]:
+        """
+        Причина недоступности интента в этой системе или None. До окончания
+        первой проверки интент считается доступным.
+        """
+        if not self.is_ready() or self.native(intent) or self.command_templates is None:
+            return None
+        template = self.command_templates.get_intent_template(intent)
+        command = template.templates.get(self.os_type) if template else None
+        if not command:
+            return "нет шаблона команды для этой ОС"
+        missing = self.missing_executables(command)
+        if missing:
+            return "не найдено: " + ", ".join(missing)
+        return None
+
+
+_capability_probe: Optional[CapabilityProbe] = None
+_probe_lock = threading.Lock()
+
+
+def get_capabilities() -> CapabilityProbe:
+    """
+    Возвращает общий для приложения экземпляр CapabilityProbe. Без вызова
+    start_probe() программы ищутся по мере необходимости.
+    """
+    global _capability_probe
+    with _probe_lock:
+        if _capability_probe is None:
+            _capability_probe = CapabilityProbe()
+        return _capability_probe
+
+
+def start_probe(command_templates, native: Optional[Callable[[str], bool]] = None,
+                cache_path: Optional[str] = CAPABILITIES_CACHE_PATH) -> CapabilityProbe:
+    """Создает общий CapabilityProbe для шаблонов команд и запускает фоновую проверку."""
+    global _capability_probe
+    probe = CapabilityProbe(command_templates, cache_path, native)
+    with _probe_lock:
+        _capability_probe = probe
+    probe.start()
+    return probe
@@ -5,9 +5,10 @@
 Содержит классы для описания параметров, интентов и загрузки
 конфигурации из JSON-файла.
 """
+import hashlib
 import json
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 
 @dataclass
 class ParamSpec:
@@ -39,12 +40,30 @@ class IntentTemplate:
         phrases: Список ключевых фраз для распознавания этого интента.
         params: Словарь спецификаций параметров, где ключ - имя параметра.
         templates: Словарь с шаблонами команд для разных ОС ('win', 'astro').
+        timeout: Таймаут выполнения в секундах (None - значение по умолчанию,
+                 0 - без ограничения).
+        cacheable: Интент только читает состояние, его результат можно кэшировать.
+        cache_ttl: Время хранения результата в кэше в секундах.
+        invalidates: Интенты (или "категория.*"), кэш которых сбрасывается
+                     после выполнения этого интента.
+        pool_safe: Команду можно выполнять в постоянной оболочке пула
+                   (shell_pool) вместо запуска нового процесса; без
+                   свободной оболочки она выполняется через оболочку ОС.
+                   Команда не должна требовать ввода (sudo с паролем).
+        parser: Имя разборщика табличного вывода (output_parsers.PARSERS)
+                для каждой ОС ('win', 'astro').
     """
     intent: str
     description: str = ""
     phrases: List[str] = field(default_factory=list)
     params: Dict[str, ParamSpec] = field(default_factory=dict)
     templates: Dict[str, str] = field(default_factory=dict)
+    timeout: Optional[float] = None
+    cacheable: bool = False
+    cache_ttl: Optional[float] = None
+    invalidates: List[str] = field(default_factory=list)
+    pool_safe: bool = False
+    parser: Dict[str, str] = field(default_factory=dict)
 
 class CommandTemplates:
     """
@@ -53,8 +72,21 @@ class CommandTemplates:
     def __init__(self):
         """Инициализирует пустой контейнер для шаблонов."""
         self.intents: Dict[str, IntentTemplate] = {}
+        # SHA-256 содержимого загруженного файла (используется для кэшей)
+        self.source_hash: Optional[str] = None
+        self._reload_listeners: List[Callable[[], None]] = []
         print("CommandTemplates initialized.")
 
+    def add_reload_listener(self, callback: Callable[[], None]) -> None:
+        """
+        Регистрирует функцию, вызываемую после каждой успешной загрузки
+        определений (например, для сброса кэшей, построенных по шаблонам).
+
+        Args:
+            callback: Функция без аргументов.
+        """
+        self._reload_listeners.append(callback)
+
     def load_from_json(self, file_path: str) -> None:
         """
         Загружает определения интентов из JSON-файла.
@@ -69,8 +101,9 @@ class CommandTemplates:
         """
         print(f"Attempting to load command templates from '{file_path}'...")
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(file_path, 'rb') as f:
+                raw_data = f.read()
+            data = json.loads(raw_data.decode('utf-8'))
 
             self.intents.clear()
             for intent_key, intent_data in data.items():
@@ -84,10 +117,17 @@ class CommandTemplates:
                     description=intent_data.get("description", ""),
                     phrases=intent_data.get("phrases", []),
                     params=params,
-                    templates=intent_data.get("templates", {})
+                    templates=intent_data.get("templates", {}),
+                    timeout=intent_data.get("timeout"),
+                    cacheable=intent_data.get("cacheable", False),
+                    cache_ttl=intent_data.get("cache_ttl"),
+                    invalidates=intent_data.get("invalidates", []),
+                    pool_safe=intent_data.get("pool_safe", False),
+                    parser=intent_data.get("parser", {})
                 )
                 self.intents[intent_key] = template
-            
+
+            self.source_hash = hashlib.sha256(raw_data).hexdigest()
             print(f"Successfully loaded {len(self.intents)} intent templates.")
 
         except FileNotFoundError:
@@ -100,6 +140,9 @@ class CommandTemplates:
             print(f"ERROR: Invalid format in command definitions file: {e}")
             raise
 
+        for callback in self._reload_listeners:
+            callback()
+
     def get_intent_template(self, intent: str) -> Optional[IntentTemplate]:
         """
         Возвращает шаблон для указанного интента.
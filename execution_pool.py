@@ -0,0 +1,294 @@
+# execution_pool.py
+"""
+Пул параллельного выполнения интентов.
+
+Принимает несколько заданий (интент + параметры) и выполняет их одновременно
+в движке процессов, не превышая заданного лимита параллельности. Для каждого
+задания хранится собственный вывод и статус, а изменения передаются
+подписчикам через колбэки. Задания можно отменять: процессы команды
+останавливаются вместе с потомками. Если для интента задан разборщик
+вывода ("parser" в commands.json), стандартный вывод задания по мере
+поступления разбирается в таблицу записей. Вывод может храниться не в
+памяти, а в файле на диске (output_spool) - для очень больших выводов.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import Future, wait as wait_futures
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from capabilities import detect_os_type
+from command_templates import CommandTemplates
+from output_parsers import RecordTable, StreamParser, create_parser
+from output_spool import OutputSpool
+from process_engine import ExecutionResult, get_engine
+from sysadmin_actions import execute_intent_async, has_special_handler
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Статусы задания
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+@dataclass
+class Job:
+    """
+    Задание пула.
+
+    Attributes:
+        job_id: Порядковый номер задания.
+        intent: Выполняемый интент.
+        params: Параметры интента.
+        status: Текущий статус (PENDING, RUNNING, DONE, FAILED, CANCELLED).
+        exit_code: Код возврата команды (None, если команда не запускалась).
+        timeout: Таймаут задания в секундах (None - из шаблона интента).
+        use_cache: Разрешено вернуть результат из кэша результатов.
+        result: Итог выполнения со статистикой ресурсов.
+        output: Вывод задания в порядке поступления (если он не пишется в spool).
+        spool: Файл с выводом задания (None - вывод хранится в output).
+        table: Записи, разобранные из стандартного вывода (None - у интента
+               нет разборщика вывода).
+        started_at: Время запуска (time.time()).
+        finished_at: Время завершения (time.time()).
+        future: Future выполнения в движке процессов.
+    """
+    job_id: int
+    intent: str
+    params: Dict[str, Any]
+    status: str = PENDING
+    exit_code: Optional[int] = None
+    timeout: Optional[float] = None
+    use_cache: bool = True
+    result: Optional[ExecutionResult] = None
+    output: List[str] = field(default_factory=list)
+    spool: Optional[OutputSpool] = field(default=None, repr=False)
+    table: Optional[RecordTable] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    future: Optional[Future] = field(default=None, repr=False)
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+    _parser: Optional[StreamParser] = field(default=None, repr=False)
+    _cancel_requested: bool = field(default=False, repr=False)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Длительность выполнения в секундах."""
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def text(self) -> str:
+        """Полный вывод задания одной строкой."""
+        # После ошибки записи в spool остаток вывода хранится в output
+        return (self.spool.text() if self.spool else "") + "".join(self.output)
+
+
+class ExecutionPool:
+    """
+    Выполняет задания параллельно с ограничением числа одновременно
+    работающих команд. Колбэки вызываются из потока движка процессов.
+    """
+
+    def __init__(self, command_templates: CommandTemplates,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 on_output: Optional[Callable[[Job, str], None]] = None,
+                 on_status: Optional[Callable[[Job], None]] = None,
+                 spool_dir: Optional[str] = None):
+        """
+        Args:
+            command_templates: Шаблоны команд.
+            max_concurrency: Максимальное число одновременно выполняемых заданий.
+            on_output: Функция (job, text), получающая вывод задания.
+            on_status: Функция (job), вызываемая при смене статуса задания.
+            spool_dir: Каталог для файлов вывода заданий (None - вывод в памяти).
+                       Файл удаляется вызовом forget() или close().
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.command_templates = command_templates
+        self.max_concurrency = max_concurrency
+        self.on_output = on_output
+        self.on_status = on_status
+        self.spool_dir = spool_dir
+        self.jobs: Dict[int, Job] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Семафор создается в цикле движка при первом задании
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def submit(self, intent: str, params: Optional[Dict[str, Any]] = None,
+               timeout: Optional[float] = None, use_cache: bool = True, header: str = "") -> Job:
+        """
+        Ставит задание в очередь и возвращает его.
+
+        Args:
+            timeout: Таймаут в секундах, заменяющий значение из шаблона интента.
+            use_cache: False - выполнить команду заново, даже если результат есть в кэше.
+            header: Текст в начале вывода задания, перед выводом команды
+                    (on_output для него не вызывается).
+        """
+        with self._lock:
+            job = Job(job_id=next(self._ids), intent=intent, params=dict(params or {}), timeout=timeout,
+                      use_cache=use_cache)
+            job._parser = self._create_parser(intent)
+            job.table = job._parser.table if job._parser else None
+            job.spool = self._create_spool(job.job_id)
+            if header:
+                self._store_output(job, header)
+            self.jobs[job.job_id] = job
+        job.future = get_engine().submit(self._run(job))
+        return job
+
+    def _create_parser(self, intent: str) -> Optional[StreamParser]:
+        """Разборщик вывода интента для текущей ОС (у специальных обработчиков его нет)."""
+        template = self.command_templates.get_intent_template(intent)
+        if template is None or has_special_handler(intent):
+            return None
+        return create_parser(template.parser.get(detect_os_type()))
+
+    def _create_spool(self, job_id: int) -> Optional[OutputSpool]:
+        if not self.spool_dir:
+            return None
+        try:
+            return OutputSpool.create(f"job{job_id}", self.spool_dir)
+        except OSError as e:
+            print(f"Warning: Failed to create output spool in '{self.spool_dir}', keeping output in memory: {e}")
+            return None
+
+    def submit_many(self, jobs: Iterable[Tuple[str, Dict[str, Any]]]) -> List[Job]:
+        """Ставит в очередь несколько заданий (интент, параметры)."""
+        return [self.submit(intent, params) for intent, params in jobs]
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def active_jobs(self) -> List[Job]:
+        """Задания, которые ожидают запуска или выполняются."""
+        with self._lock:
+            return [job for job in self.jobs.values() if not job.is_finished]
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Отменяет задание: ожидающее снимается с очереди, у выполняющегося
+        останавливается дерево процессов. Возвращает False, если задание
+        не найдено или уже завершено.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.is_finished:
+            return False
+        loop = get_engine().loop
+
+        def cancel_task():
+            job._cancel_requested = True
+            if job._task is not None:
+                job._task.cancel()
+
+        loop.call_soon_threadsafe(cancel_task)
+        return True
+
+    def cancel_all(self):
+        """Отменяет все незавершенные задания."""
+        for job in self.active_jobs():
+            self.cancel(job.job_id)
+
+    def annotate(self, job_id: int, text: str):
+        """Дописывает в вывод задания служебный текст (например, итог) без вызова on_output."""
+        job = self.jobs.get(job_id)
+        if job:
+            self._store_output(job, text)
+
+    def forget(self, job_id: int):
+        """Удаляет завершенное задание из списка вместе с файлом его вывода."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if not job or not job.is_finished:
+                return
+            del self.jobs[job_id]
+        if job.spool:
+            job.spool.close()
+
+    def close(self):
+        """Удаляет файлы вывода всех заданий (при завершении приложения)."""
+        with self._lock:
+            spools = [job.spool for job in self.jobs.values() if job.spool]
+        for spool in spools:
+            spool.close()
+
+    def wait_all(self, timeout: Optional[float] = None) -> bool:
+        """
+        Блокирует вызывающий поток до завершения всех заданий.
+        Возвращает False, если за timeout секунд завершились не все.
+        """
+        pending = [job.future for job in self.active_jobs() if job.future]
+        _, not_done = wait_futures(pending, timeout=timeout)
+        return not not_done
+
+    async def _run(self, job: Job):
+        job._task = asyncio.current_task()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            if job._cancel_requested:
+                raise asyncio.CancelledError()
+            async with self._semaphore:
+                job.status, job.started_at = RUNNING, time.time()
+                self._notify_status(job)
+                result = await execute_intent_async(job.intent, job.params, self.command_templates,
+                                                    lambda text: self._append_output(job, text),
+                                                    timeout=job.timeout, use_cache=job.use_cache,
+                                                    on_stdout=lambda text: self._parse_output(job, text))
+                job.result, job.exit_code = result, result.exit_code
+                job.status = DONE if result.exit_code == 0 and not result.timed_out else FAILED
+        except asyncio.CancelledError:
+            # Задача верхнего уровня: отмена превращается в статус задания
+            self._append_output(job, "\nERROR: Выполнение отменено пользователем\n")
+            job.status = CANCELLED
+        except Exception as e:
+            self._append_output(job, f"ERROR: Сбой задания: {e}\n")
+            job.status = FAILED
+        finally:
+            job._task = None
+            self._parse_output(job, None)
+            job.finished_at = time.time()
+            self._notify_status(job)
+
+    def _append_output(self, job: Job, text: str):
+        self._store_output(job, text)
+        if self.on_output:
+            self.on_output(job, text)
+
+    def _store_output(self, job: Job, text: str):
+        if job.spool and not job.spool.error:
+            job.spool.write(text)
+        else:
+            job.output.append(text)
+
+    def _parse_output(self, job: Job, text: Optional[str]):
+        """Передает кусок stdout разборщику задания (None - вывод закончен)."""
+        parser = job._parser
+        if parser is None:
+            return
+        try:
+            if text is None:
+                job._parser = None
+                parser.close()
+            else:
+                parser.feed(text)
+        except Exception as e:
+            # Ошибка разбора не должна прерывать команду; текст вывода сохраняется
+            job._parser = None
+            print(f"Warning: Output parser for job #{job.job_id} ({job.intent}) failed: {e}")
+
+    def _notify_status(self, job: Job):
+        if self.on_status:
+            self.on_status(job)
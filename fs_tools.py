@@ -0,0 +1,371 @@
+# fs_tools.py
+"""
+Встроенные файловые операции, одинаково работающие в Windows и Astra Linux.
+
+find_files обходит дерево каталогов через os.scandir в нескольких потоках
+и передает совпадения по мере нахождения, не дожидаясь конца обхода.
+Поддерживаются маски (glob) и регулярные выражения, ограничение глубины,
+исключения и лимит результатов с немедленной остановкой обхода.
+
+checksum_paths считает контрольные суммы файлов и каталогов: каждый файл
+читается один раз крупными блоками, которые сразу передаются во все
+выбранные алгоритмы hashlib; файлы обрабатываются параллельно.
+"""
+import fnmatch
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Pattern, Tuple
+
+# Число потоков обхода каталогов (операции ввода-вывода, а не CPU)
+FIND_WORKERS = min(16, (os.cpu_count() or 1) * 4)
+# Число потоков подсчета контрольных сумм (hashlib освобождает GIL)
+CHECKSUM_WORKERS = min(8, os.cpu_count() or 1)
+# Размер блока чтения при подсчете контрольных сумм (кратен размеру страницы)
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class FindStats:
+    """
+    Итоги поиска файлов.
+
+    Attributes:
+        matches: Количество найденных путей.
+        dirs_scanned: Количество просмотренных каталогов.
+        errors: Количество каталогов, которые не удалось прочитать.
+        elapsed: Время поиска в секундах.
+        limit_reached: Поиск остановлен по лимиту результатов.
+        cancelled: Поиск прерван извне.
+    """
+    matches: int = 0
+    dirs_scanned: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    limit_reached: bool = False
+    cancelled: bool = False
+
+
+def compile_name_pattern(pattern: str, regex: bool = False) -> Pattern:
+    """
+    Компилирует шаблон имени файла. Маска (glob) сравнивается с именем целиком,
+    регулярное выражение ищется в любой части имени. В Windows регистр не учитывается.
+
+    Raises:
+        ValueError: Если регулярное выражение некорректно.
+    """
+    flags = re.IGNORECASE if os.name == 'nt' else 0
+    try:
+        return re.compile(pattern if regex else fnmatch.translate(pattern), flags)
+    except re.error as e:
+        raise ValueError(f"Invalid pattern '{pattern}': {e}")
+
+
+def split_patterns(value: Optional[str]) -> List[str]:
+    """Разбирает список масок, разделенных запятыми ("*.tmp, .git")."""
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+class _ParallelFinder:
+    """Обход дерева каталогов общей очередью и пулом потоков."""
+
+    def __init__(self, root: str, matcher: Pattern, regex: bool, max_depth: Optional[int], limit: int,
+                 excludes: List[Pattern], on_match: Callable[[str], None],
+                 stop_event: Optional[threading.Event], workers: int):
+        self.root = root
+        self.matcher = matcher
+        self.regex = regex
+        self.max_depth = max_depth
+        self.limit = limit
+        self.excludes = excludes
+        self.on_match = on_match
+        self.external_stop = stop_event
+        self.workers = max(1, workers)
+        self.stats = FindStats()
+        self._queue: "queue.Queue[Optional[Tuple[str, int]]]" = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # Первое исключение из on_match или обхода; пробрасывается из run()
+        self._error: Optional[BaseException] = None
+
+    def run(self) -> FindStats:
+        started = time.perf_counter()
+        self._pending = 1
+        self._queue.put((self.root, 0))
+        threads = [threading.Thread(target=self._worker, name=f"FindFiles-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stats.elapsed = time.perf_counter() - started
+        if self._error is not None:
+            raise self._error
+        return self.stats
+
+    def _finish(self):
+        """Будит все потоки, чтобы они завершились."""
+        if not self._stop.is_set():
+            self._stop.set()
+            for _ in range(self.workers):
+                self._queue.put(None)
+
+    def _stopped(self) -> bool:
+        if self.external_stop is not None and self.external_stop.is_set():
+            with self._lock:
+                self.stats.cancelled = True
+                self._finish()
+        return self._stop.is_set()
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                if not self._stopped():
+                    self._scan(*item)
+            except Exception as e:
+                with self._lock:
+                    self._error = self._error or e
+                    self._finish()
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                    if self._pending == 0:
+                        self._finish()
+
+    def _matches(self, name: str) -> bool:
+        return bool(self.matcher.search(name) if self.regex else self.matcher.match(name))
+
+    def _scan(self, path: str, depth: int):
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if self._stopped():
+                        return
+                    name = entry.name
+                    if any(exclude.match(name) for exclude in self.excludes):
+                        continue
+                    if self._matches(name):
+                        with self._lock:
+                            if self._stop.is_set():
+                                return
+                            self.stats.matches += 1
+                            self.on_match(entry.path)
+                            if self.limit and self.stats.matches >= self.limit:
+                                self.stats.limit_reached = True
+                                self._finish()
+                                return
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if is_dir and (self.max_depth is None or depth < self.max_depth):
+                        with self._lock:
+                            self._pending += 1
+                        self._queue.put((entry.path, depth + 1))
+            with self._lock:
+                self.stats.dirs_scanned += 1
+        except OSError:
+            with self._lock:
+                self.stats.errors += 1
+
+
+def find_files(root: str, pattern: str, on_match: Callable[[str], None], regex: bool = False,
+               max_depth: Optional[int] = None, limit: int = 0, exclude: Iterable[str] = (),
+               stop_event: Optional[threading.Event] = None, workers: int = FIND_WORKERS) -> FindStats:
+    """
+    Ищет файлы и каталоги, имя которых соответствует шаблону.
+
+    Args:
+        root: Каталог, с которого начинается поиск.
+        pattern: Маска имени (например, "*.log") или регулярное выражение.
+        on_match: Функция, получающая путь каждого совпадения сразу после нахождения.
+                  Вызывается из потоков обхода, но никогда одновременно.
+        regex: Интерпретировать pattern как регулярное выражение.
+        max_depth: Максимальная глубина вложенности (0 - только сам root, None - без ограничения).
+        limit: Максимальное количество результатов (0 - без ограничения).
+        exclude: Маски имен файлов и каталогов, которые пропускаются (каталоги - вместе с содержимым).
+        stop_event: Событие, прерывающее поиск извне.
+        workers: Количество потоков обхода.
+
+    Returns:
+        FindStats с итогами поиска.
+
+    Raises:
+        ValueError: Если шаблон некорректен или root не является каталогом.
+    """
+    root = os.path.expanduser(root)
+    if not os.path.isdir(root):
+        raise ValueError(f"'{root}' is not a directory.")
+    matcher = compile_name_pattern(pattern, regex)
+    excludes = [compile_name_pattern(mask) for mask in exclude]
+    finder = _ParallelFinder(root, matcher, regex, max_depth, limit, excludes, on_match, stop_event, workers)
+    return finder.run()
+
+
+@dataclass
+class FileDigest:
+    """
+    Контрольные суммы одного файла.
+
+    Attributes:
+        path: Путь к файлу.
+        size: Размер прочитанных данных в байтах.
+        digests: Шестнадцатеричные суммы по именам алгоритмов.
+        elapsed: Время чтения и подсчета в секундах.
+        error: Текст ошибки, если файл не удалось прочитать.
+    """
+    path: str
+    size: int = 0
+    digests: Dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class ChecksumStats:
+    """
+    Итоги подсчета контрольных сумм.
+
+    Attributes:
+        files: Количество обработанных файлов.
+        errors: Количество файлов, которые не удалось прочитать.
+        total_bytes: Общий объем прочитанных данных.
+        elapsed: Общее время в секундах.
+        cancelled: Подсчет прерван извне.
+    """
+    files: int = 0
+    errors: int = 0
+    total_bytes: int = 0
+    elapsed: float = 0.0
+    cancelled: bool = False
+
+    @property
+    def throughput(self) -> float:
+        """Скорость чтения в МБ/с."""
+        return self.total_bytes / (1024 * 1024) / self.elapsed if self.elapsed else 0.0
+
+
+def normalize_algorithms(algorithms: Iterable[str]) -> List[str]:
+    """
+    Приводит имена алгоритмов к виду hashlib ("SHA256" -> "sha256").
+
+    Raises:
+        ValueError: Если алгоритм не поддерживается или не имеет фиксированной
+                    длины суммы (shake_128, shake_256).
+    """
+    names = []
+    for algorithm in algorithms:
+        name = algorithm.strip().lower().replace("-", "")
+        if name not in hashlib.algorithms_available:
+            raise ValueError(f"Unsupported hash algorithm '{algorithm}'.")
+        # У алгоритмов с произвольной длиной суммы digest_size равен 0
+        if hashlib.new(name).digest_size == 0:
+            raise ValueError(f"Hash algorithm '{algorithm}' has no fixed digest length.")
+        if name not in names:
+            names.append(name)
+    if not names:
+        raise ValueError("At least one hash algorithm is required.")
+    return names
+
+
+def hash_file(path: str, algorithms: List[str], chunk_size: int = CHECKSUM_CHUNK_SIZE,
+              stop_event: Optional[threading.Event] = None) -> FileDigest:
+    """
+    Считает несколько контрольных сумм файла за одно чтение. Блоки читаются
+    в один заранее выделенный буфер, без копирования на каждой итерации.
+    """
+    result = FileDigest(path=path)
+    started = time.perf_counter()
+    hashers = [hashlib.new(name) for name in algorithms]
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    result.error = "cancelled"
+                    return result
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                chunk = view[:read]
+                for hasher in hashers:
+                    hasher.update(chunk)
+                result.size += read
+    except OSError as e:
+        result.error = str(e)
+        return result
+    finally:
+        result.elapsed = time.perf_counter() - started
+    result.digests = {name: hasher.hexdigest() for name, hasher in zip(algorithms, hashers)}
+    return result
+
+
+def _iter_files(paths: Iterable[str]) -> Iterator[str]:
+    """Перечисляет файлы: сами файлы из списка и содержимое каталогов (рекурсивно)."""
+    for path in paths:
+        path = os.path.expanduser(path)
+        if os.path.isdir(path):
+            for directory, subdirs, files in os.walk(path):
+                subdirs.sort()
+                for name in sorted(files):
+                    yield os.path.join(directory, name)
+        else:
+            yield path
+
+
+def checksum_paths(paths: Iterable[str], algorithms: Iterable[str], on_result: Callable[[FileDigest], None],
+                   stop_event: Optional[threading.Event] = None, workers: int = CHECKSUM_WORKERS,
+                   chunk_size: int = CHECKSUM_CHUNK_SIZE) -> ChecksumStats:
+    """
+    Считает контрольные суммы файлов и каталогов параллельно.
+
+    Args:
+        paths: Файлы и каталоги (каталоги обходятся рекурсивно).
+        algorithms: Имена алгоритмов hashlib (например, ["sha256", "md5"]).
+        on_result: Функция, получающая FileDigest каждого файла по мере готовности.
+                   Вызывается из потока, вызвавшего checksum_paths.
+        stop_event: Событие, прерывающее подсчет извне.
+        workers: Количество потоков.
+        chunk_size: Размер блока чтения.
+
+    Returns:
+        ChecksumStats с итогами.
+
+    Raises:
+        ValueError: Если алгоритм не поддерживается или путь не существует.
+    """
+    algorithms = normalize_algorithms(algorithms)
+    paths = list(paths)
+    for path in paths:
+        if not os.path.exists(os.path.expanduser(path)):
+            raise ValueError(f"Path '{path}' does not exist.")
+
+    stats = ChecksumStats()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="Checksum") as executor:
+        futures = [executor.submit(hash_file, path, algorithms, chunk_size, stop_event)
+                   for path in _iter_files(paths)]
+        for future in as_completed(futures):
+            digest = future.result()
+            if stop_event is not None and stop_event.is_set():
+                stats.cancelled = True
+                for pending in futures:
+                    pending.cancel()
+                break
+            stats.files += 1
+            stats.total_bytes += digest.size
+            if digest.error:
+                stats.errors += 1
+            on_result(digest)
+    stats.elapsed = time.perf_counter() - started
+    return stats
@@ -0,0 +1,62 @@
+# load_graph.py
+"""
+Компактный график загрузки CPU и памяти по истории MetricsService.
+"""
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtGui import QPainter, QColor, QPen, QPainterPath, QFont
+from PyQt5.QtCore import Qt, QTimer, QPointF
+
+import system_monitor
+
+# Отображаемый интервал истории (секунды)
+GRAPH_WINDOW_SECONDS = 5 * 60
+GRAPH_SERIES = (
+    (system_monitor.CPU_PERCENT, "CPU", QColor("#7289da")),
+    (system_monitor.MEMORY_PERCENT, "RAM", QColor("#43b581")),
+)
+
+
+class LoadGraphWidget(QWidget):
+    """Виджет с линиями CPU% и RAM% за последние минуты; обновляется по таймеру."""
+
+    def __init__(self, metrics=None, parent=None):
+        super().__init__(parent)
+        self.metrics = metrics or system_monitor.get_metrics_service()
+        self.setFixedHeight(70)
+        self.setToolTip(f"Загрузка CPU и памяти за последние {GRAPH_WINDOW_SECONDS // 60} мин")
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(self.metrics.interval * 1000))
+        self.timer.timeout.connect(self.update)
+        self.timer.start()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = self.rect().adjusted(1, 1, -1, -1)
+        painter.fillRect(rect, QColor("#202225"))
+        painter.setPen(QPen(QColor("#40444b"), 1, Qt.DashLine))
+        for fraction in (0.25, 0.5, 0.75):
+            y = rect.top() + rect.height() * fraction
+            painter.drawLine(QPointF(rect.left(), y), QPointF(rect.right(), y))
+
+        # Точки располагаются справа налево: последняя - у правого края
+        slots = max(1, int(GRAPH_WINDOW_SECONDS / self.metrics.interval) - 1)
+        step = rect.width() / slots
+        painter.setFont(QFont("Segoe UI", 8))
+        for index, (metric, label, color) in enumerate(GRAPH_SERIES):
+            _, values = self.metrics.history(metric, GRAPH_WINDOW_SECONDS)
+            if values:
+                path = QPainterPath()
+                offset = rect.right() - (len(values) - 1) * step
+                for i, value in enumerate(values):
+                    point = QPointF(offset + i * step, rect.bottom() - rect.height() * min(value, 100.0) / 100)
+                    if i == 0: path.moveTo(point)
+                    else: path.lineTo(point)
+                painter.setPen(QPen(color, 1.5))
+                painter.drawPath(path)
+                caption = f"{label} {values[-1]:.0f}%"
+            else:
+                caption = f"{label} --"
+            painter.setPen(color)
+            painter.drawText(rect.left() + 6 + index * 70, rect.top() + 14, caption)
+        painter.end()
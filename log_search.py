@@ -0,0 +1,417 @@
+# log_search.py
+"""
+Встроенный потоковый поиск по системным журналам Astra Linux.
+
+search_journal читает вывод "journalctl -o json" построчно и проверяет
+поле MESSAGE заранее скомпилированным регулярным выражением; диапазон
+времени передается journalctl (--since/--until), поэтому лишние записи
+не читаются вовсе. search_files просматривает текстовые журналы (по
+умолчанию /var/log), включая ротированные .gz, в нескольких потоках:
+выражение применяется сразу к блоку текста, а строки выделяются только
+вокруг найденных совпадений.
+
+Совпадения передаются по мере нахождения; при достижении лимита или
+отмене чтение сразу прекращается.
+"""
+import gzip
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Pattern
+
+# Каталог текстовых журналов по умолчанию
+DEFAULT_LOG_DIR = "/var/log"
+# Число потоков чтения файлов журналов
+LOG_SEARCH_WORKERS = min(8, os.cpu_count() or 1)
+# Размер блока текста, к которому применяется выражение (символы)
+LOG_SEARCH_BLOCK_SIZE = 1024 * 1024
+# Файлы, которые не являются текстовыми журналами
+BINARY_LOG_NAMES = {"wtmp", "btmp", "lastlog", "faillog", "tallylog"}
+BINARY_LOG_SUFFIXES = (".journal", ".journal~", ".xz", ".bz2", ".zst", ".zip")
+
+_RELATIVE_TIME = re.compile(r"^(\d+)\s*(s|с|m|м|min|мин|h|ч|d|д)$", re.IGNORECASE)
+_RELATIVE_UNITS = {"s": 1, "с": 1, "m": 60, "м": 60, "min": 60, "мин": 60, "h": 3600, "ч": 3600, "d": 86400, "д": 86400}
+_ABSOLUTE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d")
+_ISO_LINE_TIME = re.compile(r"(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})")
+_SYSLOG_LINE_TIME = re.compile(r"([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}):(\d{2}):(\d{2})")
+_MONTHS = {name: i for i, name in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), 1)}
+
+
+@dataclass
+class LogMatch:
+    """
+    Найденная запись журнала.
+
+    Attributes:
+        source: Источник ("journal" или путь к файлу).
+        text: Текст записи.
+        timestamp: Время записи (None, если не определено).
+        line_number: Номер строки в файле (для файлов журналов).
+    """
+    source: str
+    text: str
+    timestamp: Optional[float] = None
+    line_number: Optional[int] = None
+
+    def format(self) -> str:
+        """Строка для вывода в консоль."""
+        if self.line_number is not None:
+            return f"{self.source}:{self.line_number}: {self.text}"
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.timestamp)) if self.timestamp else "-"
+        return f"{stamp} {self.text}"
+
+
+@dataclass
+class SearchStats:
+    """
+    Итоги поиска.
+
+    Attributes:
+        matches: Количество переданных совпадений.
+        sources: Количество просмотренных источников (файлов или журнал).
+        lines: Количество просмотренных строк (записей).
+        errors: Количество источников, которые не удалось прочитать.
+        elapsed: Время поиска в секундах.
+        limit_reached: Поиск остановлен по лимиту результатов.
+    """
+    matches: int = 0
+    sources: int = 0
+    lines: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    limit_reached: bool = False
+
+
+def compile_query(query: str, regex: bool = False) -> Pattern:
+    """
+    Компилирует строку поиска (без учета регистра). В обычном режиме
+    строка ищется как подстрока; "^" и "$" относятся к границам строки.
+
+    Raises:
+        ValueError: Если регулярное выражение некорректно.
+    """
+    if not query:
+        raise ValueError("Search query must not be empty.")
+    try:
+        return re.compile(query if regex else re.escape(query), re.IGNORECASE | re.MULTILINE)
+    except re.error as e:
+        raise ValueError(f"Invalid regular expression '{query}': {e}")
+
+
+def parse_time_bound(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Преобразует границу интервала в метку времени. Поддерживаются
+    относительные значения ("30m", "2h", "1d" - столько времени назад),
+    даты "ГГГГ-ММ-ДД [ЧЧ:ММ[:СС]]" и время "ЧЧ:ММ" (сегодня).
+
+    Raises:
+        ValueError: Если формат не распознан.
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    now = time.time() if now is None else now
+    relative = _RELATIVE_TIME.match(value)
+    if relative:
+        return now - int(relative.group(1)) * _RELATIVE_UNITS[relative.group(2).lower()]
+    for fmt in _ABSOLUTE_FORMATS:
+        try:
+            return time.mktime(time.strptime(value, fmt))
+        except ValueError:
+            continue
+    try:
+        clock = time.strptime(value, "%H:%M")
+    except ValueError:
+        raise ValueError(f"Unrecognized time '{value}'. Use '2h', '2025-06-18 10:00' or '10:00'.")
+    today = time.localtime(now)
+    return time.mktime((today.tm_year, today.tm_mon, today.tm_mday, clock.tm_hour, clock.tm_min, 0, 0, 0, -1))
+
+
+def journal_prefilter(query: str, regex: bool = False) -> Optional[Pattern]:
+    """
+    Выражение для быстрой проверки сырой строки JSON journalctl до ее разбора
+    или None, если такая проверка может пропустить совпадение: регулярное
+    выражение (якоря, классы символов) и текст с символами, которые JSON
+    экранирует (кавычки, обратная косая черта, управляющие символы).
+    """
+    if regex or not query or any(char in '"\\' or ord(char) < 0x20 or ord(char) == 0x7f for char in query):
+        return None
+    return compile_query(query)
+
+
+def journal_available() -> bool:
+    """Доступен ли journalctl."""
+    return shutil.which("journalctl") is not None
+
+
+def _journal_message(entry: dict) -> str:
+    """Текст записи journald; недекодируемые поля приходят массивом байтов."""
+    message = entry.get("MESSAGE", "")
+    if isinstance(message, list):
+        message = bytes(message).decode("utf-8", errors="replace")
+    return message or ""
+
+
+def search_journal(matcher: Pattern, on_match: Callable[[LogMatch], None], since: Optional[float] = None,
+                   until: Optional[float] = None, limit: int = 0, unit: Optional[str] = None,
+                   stop_event: Optional[threading.Event] = None,
+                   prefilter: Optional[Pattern] = None) -> SearchStats:
+    """
+    Ищет записи journald, начиная с самых новых.
+
+    Args:
+        matcher: Скомпилированное выражение, применяемое к полю MESSAGE.
+        on_match: Функция, получающая каждое совпадение сразу после нахождения.
+        since, until: Границы интервала времени (метки времени) или None.
+        limit: Максимальное количество результатов (0 - без ограничения).
+        unit: Ограничить поиск юнитом systemd.
+        stop_event: Событие, прерывающее поиск извне.
+        prefilter: Выражение для сырой строки JSON (см. journal_prefilter());
+                   строки без совпадения не разбираются. None - разбираются все.
+
+    Raises:
+        ValueError: Если journalctl недоступен.
+    """
+    if not journal_available():
+        raise ValueError("journalctl is not available.")
+    command = ["journalctl", "-o", "json", "--no-pager", "--reverse"]
+    if since is not None:
+        command.append(f"--since=@{int(since)}")
+    if until is not None:
+        command.append(f"--until=@{int(until)}")
+    if unit:
+        command.extend(["-u", unit])
+
+    stats = SearchStats(sources=1)
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               encoding="utf-8", errors="replace")
+    try:
+        for raw in process.stdout:
+            if stop_event is not None and stop_event.is_set():
+                break
+            stats.lines += 1
+            # Быстрая проверка по сырой строке: без совпадения JSON не разбирается
+            # (сообщение в виде массива байтов проверяется только после декодирования)
+            if prefilter is not None and not prefilter.search(raw) and '"MESSAGE":[' not in raw:
+                continue
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            message = _journal_message(entry)
+            if not matcher.search(message):
+                continue
+            timestamp = int(entry.get("__REALTIME_TIMESTAMP", 0)) / 1_000_000 or None
+            identifier = entry.get("SYSLOG_IDENTIFIER") or entry.get("_COMM") or "-"
+            pid = entry.get("_PID")
+            prefix = f"{entry.get('_HOSTNAME', '')} {identifier}{f'[{pid}]' if pid else ''}:".lstrip()
+            on_match(LogMatch(source="journal", text=f"{prefix} {message}", timestamp=timestamp))
+            stats.matches += 1
+            if limit and stats.matches >= limit:
+                stats.limit_reached = True
+                break
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+def collect_log_files(paths: Iterable[str], since: Optional[float] = None) -> List[str]:
+    """
+    Перечисляет текстовые файлы журналов (каталоги обходятся рекурсивно),
+    от недавно измененных к старым. Файлы, измененные раньше since,
+    пропускаются: в них не может быть более новых записей.
+    """
+    found = []
+    for path in paths:
+        path = os.path.expanduser(path)
+        candidates = [path]
+        if os.path.isdir(path):
+            candidates = [os.path.join(directory, name)
+                          for directory, _, files in os.walk(path) for name in files]
+        for candidate in candidates:
+            name = os.path.basename(candidate)
+            if name in BINARY_LOG_NAMES or name.endswith(BINARY_LOG_SUFFIXES):
+                continue
+            try:
+                mtime = os.path.getmtime(candidate)
+            except OSError:
+                continue
+            if since is not None and mtime < since:
+                continue
+            found.append((mtime, candidate))
+    found.sort(reverse=True)
+    return [path for _, path in found]
+
+
+class _LineClock:
+    """Определяет время строки текстового журнала (ISO 8601 или формат syslog)."""
+
+    def __init__(self, file_mtime: float):
+        self._year = time.localtime(file_mtime).tm_year
+        self._latest = file_mtime + 86400
+
+    def parse(self, line: str) -> Optional[float]:
+        iso = _ISO_LINE_TIME.match(line)
+        if iso:
+            return time.mktime(tuple(int(part) for part in iso.groups()) + (0, 0, -1))
+        syslog = _SYSLOG_LINE_TIME.match(line)
+        if not syslog or syslog.group(1) not in _MONTHS:
+            return None
+        parts = (self._year, _MONTHS[syslog.group(1)]) + tuple(int(part) for part in syslog.groups()[1:])
+        timestamp = time.mktime(parts + (0, 0, -1))
+        # В формате syslog нет года: запись "из будущего" относится к прошлому году
+        if timestamp > self._latest:
+            timestamp = time.mktime((parts[0] - 1,) + parts[1:] + (0, 0, -1))
+        return timestamp
+
+
+def _read_blocks(f, size: int):
+    """Читает текст блоками, заканчивающимися на границе строки."""
+    tail = ""
+    while True:
+        block = f.read(size)
+        if not block:
+            if tail:
+                yield tail
+            return
+        block = tail + block
+        cut = block.rfind("\n") + 1
+        if cut == 0:
+            tail = block
+            continue
+        tail = block[cut:]
+        yield block[:cut]
+
+
+def _is_binary(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return b"\0" in f.read(1024)
+    except OSError:
+        return False
+
+
+class _FileSearch:
+    """Параллельный поиск по файлам с общим лимитом результатов."""
+
+    def __init__(self, matcher: Pattern, on_match: Callable[[LogMatch], None], since: Optional[float],
+                 until: Optional[float], limit: int, stop_event: Optional[threading.Event]):
+        self.matcher = matcher
+        self.on_match = on_match
+        self.since = since
+        self.until = until
+        self.limit = limit
+        self.stop_event = stop_event
+        self.stats = SearchStats()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def _stopped(self) -> bool:
+        return self._done.is_set() or (self.stop_event is not None and self.stop_event.is_set())
+
+    def search(self, path: str):
+        if self._stopped():
+            return
+        if path.endswith(".gz"):
+            opener = lambda: gzip.open(path, "rt", encoding="utf-8", errors="replace")
+        elif _is_binary(path):
+            return
+        else:
+            opener = lambda: open(path, "r", encoding="utf-8", errors="replace")
+        clock = None
+        lines = 0
+        try:
+            if self.since is not None or self.until is not None:
+                clock = _LineClock(os.path.getmtime(path))
+            with opener() as f:
+                for block in _read_blocks(f, LOG_SEARCH_BLOCK_SIZE):
+                    if self._stopped():
+                        break
+                    counted = 0
+                    pos = 0
+                    while True:
+                        match = self.matcher.search(block, pos)
+                        if match is None:
+                            break
+                        start = block.rfind("\n", 0, match.start()) + 1
+                        end = block.find("\n", match.start())
+                        end = len(block) if end == -1 else end
+                        pos = end + 1
+                        line = block[start:end].rstrip("\r")
+                        # Совпадение могло захватить перевод строки: проверяется сама строка
+                        if match.end() > end and not self.matcher.search(line):
+                            continue
+                        lines += block.count("\n", counted, start)
+                        counted = start
+                        timestamp = clock.parse(line) if clock else None
+                        if timestamp is not None and ((self.since is not None and timestamp < self.since) or
+                                                      (self.until is not None and timestamp > self.until)):
+                            continue
+                        with self._lock:
+                            if self._stopped():
+                                break
+                            self.on_match(LogMatch(source=path, text=line, timestamp=timestamp,
+                                                   line_number=lines + 1))
+                            self.stats.matches += 1
+                            if self.limit and self.stats.matches >= self.limit:
+                                self.stats.limit_reached = True
+                                self._done.set()
+                                break
+                    lines += block.count("\n", counted)
+        except (OSError, EOFError):
+            with self._lock:
+                self.stats.errors += 1
+        finally:
+            with self._lock:
+                self.stats.sources += 1
+                self.stats.lines += lines
+
+
+def search_files(matcher: Pattern, on_match: Callable[[LogMatch], None], paths: Iterable[str] = (DEFAULT_LOG_DIR,),
+                 since: Optional[float] = None, until: Optional[float] = None, limit: int = 0,
+                 stop_event: Optional[threading.Event] = None, workers: int = LOG_SEARCH_WORKERS) -> SearchStats:
+    """
+    Ищет строки в текстовых журналах (включая .gz) параллельно по файлам.
+
+    Args:
+        matcher: Скомпилированное выражение поиска.
+        on_match: Функция, получающая каждое совпадение сразу после нахождения.
+                  Вызывается из потоков чтения, но никогда одновременно.
+        paths: Файлы и каталоги журналов.
+        since, until: Границы интервала времени (метки времени) или None.
+                      Строки без распознанного времени не отбрасываются.
+        limit: Максимальное количество результатов (0 - без ограничения).
+        stop_event: Событие, прерывающее поиск извне.
+        workers: Количество потоков чтения.
+
+    Raises:
+        ValueError: Если путь не существует.
+    """
+    paths = list(paths)
+    for path in paths:
+        if not os.path.exists(os.path.expanduser(path)):
+            raise ValueError(f"Path '{path}' does not exist.")
+    started = time.perf_counter()
+    searcher = _FileSearch(matcher, on_match, since, until, limit, stop_event)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="LogSearch") as executor:
+        # Исключение из on_match (например, отмена обработчика) пробрасывается вызывающему
+        for future in [executor.submit(searcher.search, path) for path in collect_log_files(paths, since)]:
+            try:
+                future.result()
+            except BaseException:
+                searcher._done.set()
+                raise
+    searcher.stats.elapsed = time.perf_counter() - started
+    return searcher.stats
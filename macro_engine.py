@@ -5,6 +5,7 @@
 """
 
 from typing import List, Dict, Any, Callable
+from concurrent.futures import Future
 import time
 import json
 
@@ -18,7 +19,9 @@ class MacroEngine:
 
         Args:
             action_executor: Функция, которая будет выполнять одно действие.
-                             Она должна принимать `intent` и `params`.
+                             Она должна принимать `intent` и `params`. Может
+                             вернуть Future (например, sysadmin_actions.submit_intent) -
+                             тогда движок дожидается его завершения.
         """
         self.is_recording: bool = False
         self.recorded_macro: List[Dict[str, Any]] = []
@@ -80,7 +83,10 @@ class MacroEngine:
             
             print(f"Executing action {i+1}/{len(macro)}: {intent} with params {params}")
             try:
-                self.action_executor(intent=intent, params=params)
+                result = self.action_executor(intent=intent, params=params)
+                # Асинхронный исполнитель: ждем завершения, чтобы сохранить порядок действий
+                if isinstance(result, Future):
+                    result.result()
                 # Можно добавить задержку между действиями
                 time.sleep(0.5)
             except Exception as e:
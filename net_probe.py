@@ -0,0 +1,423 @@
+# net_probe.py
+"""
+Встроенные сетевые проверки на asyncio: опрос хостов (ICMP) и проверка
+TCP-портов для диапазонов адресов.
+
+Цели задаются списком через запятую: адреса, имена хостов, подсети CIDR
+("10.0.0.0/24") и диапазоны ("10.0.0.1-20"); порты - списком с диапазонами
+("22,80,8000-8010"). Все проверки выполняются одновременно с ограничением
+параллельности и таймаутом на каждую проверку; результаты передаются по
+мере готовности.
+
+ICMP отправляется через непривилегированный сокет (Linux, ping_group_range)
+или raw-сокет (администратор). Если ни один недоступен, используется
+системная утилита ping.
+"""
+import asyncio
+import ipaddress
+import os
+import platform
+import re
+import socket
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_PROBE_TIMEOUT = 1.0
+DEFAULT_CONCURRENCY = 256
+# Максимальное число проверок в одном запросе
+MAX_PROBES = 65536
+# До этого числа проверок выводятся все результаты, иначе - только доступные
+STREAM_ALL_LIMIT = 256
+# Пауза между эхо-запросами к одному хосту (секунды)
+PING_INTERVAL = 0.2
+
+# Статусы проверки
+OPEN = "open"
+CLOSED = "closed"
+ALIVE = "alive"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+_ICMP_ECHO_REQUEST = 8
+_ICMP_ECHO_REPLY = 0
+# Строка ответа утилиты ping со временем ответа: "64 bytes from ...: ... time=14.2 ms"
+# (Linux), "Reply from ...: bytes=32 time<1ms" и "Ответ от ...: ... время=14мс"
+# (Windows). Статистика в конце вывода ("Minimum = 14ms", "rtt min/avg/max")
+# и ответы без времени ("Destination host unreachable") не учитываются
+_PING_REPLY = re.compile(r"^\s*(?:\d+ bytes from|Reply from|Ответ от)\b.*?(?:time|время)\s*[=<]\s*([\d.,]+)\s*(?:ms|мс)",
+                         re.IGNORECASE | re.MULTILINE)
+
+
+@dataclass
+class ProbeResult:
+    """
+    Результат одной проверки.
+
+    Attributes:
+        host: Проверяемый хост.
+        port: TCP-порт (None для ICMP).
+        status: OPEN, CLOSED, ALIVE, TIMEOUT или ERROR.
+        rtt: Время ответа в миллисекундах (среднее для нескольких эхо-запросов).
+        received: Получено ответов на эхо-запросы.
+        sent: Отправлено эхо-запросов.
+        error: Текст ошибки.
+    """
+    host: str
+    port: Optional[int] = None
+    status: str = TIMEOUT
+    rtt: Optional[float] = None
+    received: int = 0
+    sent: int = 0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status in (OPEN, ALIVE)
+
+    def format(self) -> str:
+        """Строка для вывода в консоль."""
+        target = self.host if self.port is None else f"{self.host}:{self.port}"
+        text = f"{target:<24} {self.status:<8}"
+        if self.rtt is not None:
+            text += f" {self.rtt:.1f} ms"
+        if self.sent:
+            text += f" ({self.received}/{self.sent})"
+        if self.error:
+            text += f" {self.error}"
+        return text
+
+
+@dataclass
+class ProbeStats:
+    """
+    Итоги серии проверок.
+
+    Attributes:
+        probes: Выполнено проверок.
+        reachable: Успешных проверок (открытых портов или ответивших хостов).
+        elapsed: Общее время в секундах.
+        results: Все результаты в порядке целей.
+    """
+    probes: int = 0
+    reachable: int = 0
+    elapsed: float = 0.0
+    results: List[ProbeResult] = field(default_factory=list)
+
+
+def expand_hosts(spec: str, max_hosts: int = MAX_PROBES) -> List[str]:
+    """
+    Разворачивает список целей в адреса и имена хостов.
+
+    Raises:
+        ValueError: Если элемент некорректен или целей больше max_hosts.
+    """
+    hosts: List[str] = []
+    for item in re.split(r"[,\s]+", spec or ""):
+        if not item:
+            continue
+        if "/" in item:
+            try:
+                network = ipaddress.ip_network(item, strict=False)
+            except ValueError as e:
+                raise ValueError(f"Invalid network '{item}': {e}")
+            if network.num_addresses > max_hosts:
+                raise ValueError(f"Network '{item}' is too large (more than {max_hosts} addresses).")
+            addresses = [network.network_address] if network.num_addresses == 1 else list(network.hosts())
+            hosts.extend(str(address) for address in addresses)
+        elif re.fullmatch(r"\d{1,3}(?:\.\d{1,3}){3}-(?:\d{1,3}(?:\.\d{1,3}){3}|\d{1,3})", item):
+            first, last = item.split("-")
+            if "." not in last:
+                last = first.rsplit(".", 1)[0] + "." + last
+            try:
+                start, end = int(ipaddress.IPv4Address(first)), int(ipaddress.IPv4Address(last))
+            except ValueError as e:
+                raise ValueError(f"Invalid address range '{item}': {e}")
+            if end < start:
+                raise ValueError(f"Invalid address range '{item}'.")
+            if end - start + 1 > max_hosts:
+                raise ValueError(f"Range '{item}' is too large (more than {max_hosts} addresses).")
+            hosts.extend(str(ipaddress.IPv4Address(value)) for value in range(start, end + 1))
+        else:
+            hosts.append(item)
+        if len(hosts) > max_hosts:
+            raise ValueError(f"Too many targets (more than {max_hosts}).")
+    if not hosts:
+        raise ValueError("At least one host is required.")
+    return list(dict.fromkeys(hosts))
+
+
+def parse_ports(spec: str) -> List[int]:
+    """
+    Разбирает список портов с диапазонами ("22,80,8000-8010").
+
+    Raises:
+        ValueError: Если порт вне диапазона 1-65535 или список пуст.
+    """
+    ports: List[int] = []
+    for item in re.split(r"[,\s]+", str(spec or "")):
+        if not item:
+            continue
+        try:
+            first, _, last = item.partition("-")
+            start, end = int(first), int(last or first)
+        except ValueError:
+            raise ValueError(f"Invalid port '{item}'.")
+        if not 1 <= start <= end <= 65535:
+            raise ValueError(f"Invalid port range '{item}'.")
+        ports.extend(range(start, end + 1))
+    if not ports:
+        raise ValueError("At least one port is required.")
+    return list(dict.fromkeys(ports))
+
+
+async def tcp_probe(host: str, port: int, timeout: float = DEFAULT_PROBE_TIMEOUT) -> ProbeResult:
+    """Проверяет TCP-порт установкой соединения."""
+    result = ProbeResult(host=host, port=port)
+    started = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except asyncio.TimeoutError:
+        return result
+    except ConnectionRefusedError:
+        result.status = CLOSED
+        return result
+    except OSError as e:
+        result.status, result.error = ERROR, e.strerror or str(e)
+        return result
+    result.status, result.rtt = OPEN, (time.perf_counter() - started) * 1000
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return result
+
+
+def _icmp_checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _icmp_packet(identifier: int, sequence: int) -> bytes:
+    payload = struct.pack("!d", time.perf_counter()) + b"SysAdmin337"
+    header = struct.pack("!BBHHH", _ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    checksum = _icmp_checksum(header + payload)
+    return struct.pack("!BBHHH", _ICMP_ECHO_REQUEST, 0, checksum, identifier, sequence) + payload
+
+
+_icmp_socket_type: Optional[int] = None
+_icmp_socket_checked = False
+
+
+def icmp_socket_type() -> Optional[int]:
+    """
+    Тип сокета, через который доступен ICMP (SOCK_DGRAM или SOCK_RAW),
+    или None, если нужна системная утилита ping. Проверяется один раз.
+    """
+    global _icmp_socket_type, _icmp_socket_checked
+    if not _icmp_socket_checked:
+        _icmp_socket_checked = True
+        # В Windows raw-сокеты не получают ответы ICMP без дополнительных настроек
+        kinds = () if platform.system().lower() == "windows" else (socket.SOCK_DGRAM, socket.SOCK_RAW)
+        for kind in kinds:
+            try:
+                socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP).close()
+                _icmp_socket_type = kind
+                break
+            except OSError:
+                continue
+    return _icmp_socket_type
+
+
+async def _resolve_ipv4(host: str) -> str:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+    return infos[0][4][0]
+
+
+async def _icmp_echo(sock: socket.socket, kind: int, address: str, identifier: int, sequence: int,
+                     timeout: float) -> Optional[float]:
+    """Отправляет эхо-запрос и ждет ответ; возвращает RTT в мс или None."""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    await loop.sock_sendall(sock, _icmp_packet(identifier, sequence))
+    deadline = started + timeout
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return None
+        try:
+            packet = await asyncio.wait_for(loop.sock_recv(sock, 2048), remaining)
+        except asyncio.TimeoutError:
+            return None
+        if kind == socket.SOCK_RAW:
+            # Raw-сокет получает весь ICMP-трафик хоста вместе с IP-заголовком
+            packet = packet[(packet[0] & 0x0F) * 4:]
+        if len(packet) < 8:
+            continue
+        reply_type, _, _, reply_id, reply_sequence = struct.unpack("!BBHHH", packet[:8])
+        # Для SOCK_DGRAM идентификатор подставляет ядро, ответы уже отфильтрованы
+        if reply_type == _ICMP_ECHO_REPLY and reply_sequence == sequence and \
+                (kind == socket.SOCK_DGRAM or reply_id == identifier):
+            return (time.perf_counter() - started) * 1000
+
+
+async def _socket_ping(host: str, kind: int, count: int, timeout: float) -> ProbeResult:
+    result = ProbeResult(host=host)
+    try:
+        address = await _resolve_ipv4(host)
+    except OSError as e:
+        result.status, result.error = ERROR, f"не удалось разрешить имя: {e.strerror or e}"
+        return result
+    sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+    sock.setblocking(False)
+    identifier = (os.getpid() ^ id(sock)) & 0xFFFF
+    rtts = []
+    try:
+        sock.connect((address, 0))
+        for sequence in range(1, count + 1):
+            if sequence > 1:
+                await asyncio.sleep(PING_INTERVAL)
+            result.sent += 1
+            rtt = await _icmp_echo(sock, kind, address, identifier, sequence, timeout)
+            if rtt is not None:
+                rtts.append(rtt)
+    except OSError as e:
+        result.status, result.error = ERROR, e.strerror or str(e)
+        return result
+    finally:
+        sock.close()
+    result.received = len(rtts)
+    if rtts:
+        result.status, result.rtt = ALIVE, sum(rtts) / len(rtts)
+    return result
+
+
+async def _system_ping(host: str, count: int, timeout: float) -> ProbeResult:
+    """Проверка утилитой ping, если ICMP-сокеты недоступны."""
+    result = ProbeResult(host=host, sent=count)
+    if platform.system().lower() == "windows":
+        command, encoding = ["ping", "-n", str(count), "-w", str(int(timeout * 1000)), host], "cp866"
+    else:
+        command, encoding = ["ping", "-c", str(count), "-W", str(max(1, round(timeout))), host], "utf-8"
+    try:
+        process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.DEVNULL)
+    except OSError as e:
+        result.status, result.error = ERROR, e.strerror or str(e)
+        return result
+    try:
+        stdout, _ = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    replies = _PING_REPLY.findall(stdout.decode(encoding, errors="replace"))[:count]
+    rtts = [float(value.replace(",", ".")) for value in replies]
+    result.received = len(rtts)
+    if process.returncode == 0 and rtts:
+        result.status, result.rtt = ALIVE, sum(rtts) / len(rtts)
+    return result
+
+
+async def icmp_probe(host: str, count: int = 1, timeout: float = DEFAULT_PROBE_TIMEOUT) -> ProbeResult:
+    """Опрашивает хост count эхо-запросами ICMP."""
+    kind = icmp_socket_type()
+    if kind is None:
+        return await _system_ping(host, count, timeout)
+    return await _socket_ping(host, kind, count, timeout)
+
+
+async def run_probes(probes: Iterable[Callable[[], Awaitable[ProbeResult]]],
+                     on_result: Callable[[ProbeResult], None],
+                     concurrency: int = DEFAULT_CONCURRENCY) -> ProbeStats:
+    """
+    Выполняет проверки, не более concurrency одновременно. Проверки берутся
+    из итератора по мере освобождения мест, поэтому память не зависит от их
+    числа. on_result вызывается для каждого результата сразу после готовности.
+    """
+    stats = ProbeStats()
+    started = time.perf_counter()
+    iterator: Iterator[Tuple[int, Callable[[], Awaitable[ProbeResult]]]] = enumerate(probes)
+    ordered: Dict[int, ProbeResult] = {}
+
+    async def worker():
+        for index, probe in iterator:
+            result = await probe()
+            ordered[index] = result
+            stats.probes += 1
+            if result.ok:
+                stats.reachable += 1
+            on_result(result)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    stats.results = [ordered[index] for index in sorted(ordered)]
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+async def scan_ports(hosts: List[str], ports: List[int], on_result: Callable[[ProbeResult], None],
+                     concurrency: int = DEFAULT_CONCURRENCY,
+                     timeout: float = DEFAULT_PROBE_TIMEOUT) -> ProbeStats:
+    """
+    Проверяет каждый порт каждого хоста.
+
+    Raises:
+        ValueError: Если проверок больше MAX_PROBES.
+    """
+    if len(hosts) * len(ports) > MAX_PROBES:
+        raise ValueError(f"Too many probes: {len(hosts) * len(ports)} (maximum {MAX_PROBES}).")
+    probes = (lambda host=host, port=port: tcp_probe(host, port, timeout) for host in hosts for port in ports)
+    return await run_probes(probes, on_result, concurrency)
+
+
+async def ping_sweep(hosts: List[str], on_result: Callable[[ProbeResult], None], count: int = 1,
+                     concurrency: int = DEFAULT_CONCURRENCY,
+                     timeout: float = DEFAULT_PROBE_TIMEOUT) -> ProbeStats:
+    """Опрашивает хосты по ICMP."""
+    probes = (lambda host=host: icmp_probe(host, count, timeout) for host in hosts)
+    return await run_probes(probes, on_result, concurrency)
+
+
+def format_port_summary(stats: ProbeStats, only_reachable: bool = False) -> str:
+    """
+    Итоговая таблица проверки портов: открытые порты по хостам.
+    only_reachable - выводить только хосты с открытыми портами.
+    """
+    by_host: Dict[str, List[ProbeResult]] = {}
+    for result in stats.results:
+        by_host.setdefault(result.host, []).append(result)
+    output = f"{'Host':<24} {'Open':>6} {'Closed':>7} {'No reply':>9}  Open ports\n"
+    output += "-" * 70 + "\n"
+    for host, results in by_host.items():
+        open_ports = [str(r.port) for r in results if r.status == OPEN]
+        closed = sum(1 for r in results if r.status == CLOSED)
+        silent = len(results) - len(open_ports) - closed
+        if only_reachable and not open_ports:
+            continue
+        output += f"{host:<24} {len(open_ports):>6} {closed:>7} {silent:>9}  {','.join(open_ports) or '-'}\n"
+    return output
+
+
+def format_ping_summary(stats: ProbeStats, only_reachable: bool = False) -> str:
+    """
+    Итоговая таблица опроса хостов.
+    only_reachable - выводить только ответившие хосты.
+    """
+    output = f"{'Host':<24} {'Status':<8} {'Replies':>8} {'RTT (ms)':>9}\n"
+    output += "-" * 52 + "\n"
+    for result in stats.results:
+        if only_reachable and not result.ok:
+            continue
+        rtt = f"{result.rtt:.1f}" if result.rtt is not None else "-"
+        output += f"{result.host:<24} {result.status:<8} {f'{result.received}/{result.sent}':>8} {rtt:>9}\n"
+    return output
@@ -0,0 +1,194 @@
+# nlu_benchmark.py
+"""
+Бенчмарк скорости и точности NLU-парсера.
+
+Прогоняет размеченный корпус команд (nlu_corpus.json) через AdvancedNLUParser
+и сохраняет в JSON:
+- задержки p50/p95/p99 для полного разбора (parse);
+- разбивку по этапам: лемматизация, поиск интента, извлечение параметров;
+- точность определения интента и извлечения параметров;
+- список ошибок для разбора.
+
+Запуск:
+    python nlu_benchmark.py --output bench_nlu.json
+
+Результаты разных прогонов можно сравнивать до и после изменений NLU.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import platform
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from command_templates import CommandTemplates
+import utils
+from utils import AdvancedNLUParser
+
+COMMANDS_FILE = "commands.json"
+CORPUS_FILE = "nlu_corpus.json"
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Возвращает перцентиль (метод ближайшего ранга) для списка значений."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """Сводная статистика задержек в миллисекундах."""
+    if not samples_ms:
+        return {"count": 0}
+    return {
+        "count": len(samples_ms),
+        "mean": round(sum(samples_ms) / len(samples_ms), 4),
+        "p50": round(percentile(samples_ms, 50), 4),
+        "p95": round(percentile(samples_ms, 95), 4),
+        "p99": round(percentile(samples_ms, 99), 4),
+        "max": round(max(samples_ms), 4),
+    }
+
+
+def load_corpus(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Загружает корпус: список объектов {"text", "intent", "params"?}.
+    Ключ "params" необязателен: без него параметры образца не проверяются.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+    for i, sample in enumerate(corpus):
+        if "text" not in sample or "intent" not in sample:
+            raise ValueError(f"Corpus sample #{i} must contain 'text' and 'intent'.")
+    return corpus
+
+
+def run_benchmark(parser: AdvancedNLUParser, corpus: List[Dict[str, Any]],
+                  repeat: int = 5, use_parse_cache: bool = False) -> Dict[str, Any]:
+    """
+    Прогоняет корпус через парсер и собирает метрики.
+
+    Args:
+        parser: Готовый к работе парсер.
+        corpus: Размеченные образцы.
+        repeat: Сколько раз прогнать корпус (первый прогон включает
+                заполнение кэша лемм).
+        use_parse_cache: Не сбрасывать кэш разборов между вызовами parse.
+    """
+    timings: Dict[str, List[float]] = {"parse": [], "lemmatize": [], "match": [], "extract": []}
+    intent_correct = params_checked = params_correct = 0
+    failures: List[Dict[str, Any]] = []
+
+    for iteration in range(repeat):
+        for sample in corpus:
+            text = sample["text"]
+
+            # Полный разбор
+            if not use_parse_cache:
+                parser.parse_cache.clear()
+            start = time.perf_counter()
+            result = parser.parse(text)
+            timings["parse"].append((time.perf_counter() - start) * 1000)
+
+            # Разбивка по этапам (те же вызовы, что выполняет parse)
+            start = time.perf_counter()
+            lemmatized = parser._lemmatize_text(text)
+            lemmatize_end = time.perf_counter()
+            intent = parser._find_intent(lemmatized)
+            match_end = time.perf_counter()
+            parser._build_result(text, intent)
+            extract_end = time.perf_counter()
+            timings["lemmatize"].append((lemmatize_end - start) * 1000)
+            timings["match"].append((match_end - lemmatize_end) * 1000)
+            timings["extract"].append((extract_end - match_end) * 1000)
+
+            if iteration:
+                continue
+
+            # Точность считается по первому прогону
+            intent_ok = result["intent"] == sample["intent"]
+            intent_correct += intent_ok
+            params_ok: Optional[bool] = None
+            if "params" in sample:
+                params_checked += 1
+                expected = sample["params"]
+                params_ok = all(result["params"].get(k) == v for k, v in expected.items())
+                params_correct += params_ok
+            if not intent_ok or params_ok is False:
+                failures.append({
+                    "text": text,
+                    "expected_intent": sample["intent"],
+                    "actual_intent": result["intent"],
+                    "expected_params": sample.get("params"),
+                    "actual_params": result["params"],
+                })
+
+    return {
+        "samples": len(corpus),
+        "repeat": repeat,
+        "accuracy": {
+            "intent": round(intent_correct / len(corpus), 4) if corpus else 0.0,
+            "params": round(params_correct / params_checked, 4) if params_checked else None,
+            "params_checked": params_checked,
+        },
+        "latency_ms": {stage: summarize(values) for stage, values in timings.items()},
+        "cache": parser.cache_stats(),
+        "failures": failures,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Бенчмарк скорости и точности NLU-парсера.")
+    arg_parser.add_argument("--commands", default=COMMANDS_FILE, help="Файл с определениями команд.")
+    arg_parser.add_argument("--corpus", default=CORPUS_FILE, help="Размеченный корпус команд.")
+    arg_parser.add_argument("--output", default="bench_nlu.json", help="Файл для результатов в формате JSON.")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Количество прогонов корпуса.")
+    arg_parser.add_argument("--use-parse-cache", action="store_true",
+                            help="Не сбрасывать кэш разборов между вызовами parse.")
+    arg_parser.add_argument("--no-index-cache", action="store_true",
+                            help="Не использовать дисковый кэш индекса фраз.")
+    args = arg_parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    # Сообщения парсера не должны смешиваться с отчетом и искажать замеры
+    with contextlib.redirect_stdout(io.StringIO()):
+        command_templates = CommandTemplates()
+        command_templates.load_from_json(args.commands)
+        start = time.perf_counter()
+        parser = AdvancedNLUParser(command_templates,
+                                   cache_path=None if args.no_index_cache else utils.NLU_CACHE_PATH)
+        init_ms = (time.perf_counter() - start) * 1000
+        report = run_benchmark(parser, corpus, args.repeat, args.use_parse_cache)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pymorphy2": utils.PYMORPHY_AVAILABLE,
+            "rapidfuzz": utils.RAPIDFuzz_AVAILABLE,
+        },
+        "init_ms": round(init_ms, 2),
+        **report,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    parse_latency = report["latency_ms"]["parse"]
+    print(f"Samples: {report['samples']} x {report['repeat']}, init: {report['init_ms']} ms")
+    print(f"Intent accuracy: {report['accuracy']['intent']:.2%}, "
+          f"params accuracy: {report['accuracy']['params'] or 0:.2%} "
+          f"({report['accuracy']['params_checked']} checked)")
+    print(f"parse latency, ms: p50={parse_latency['p50']} p95={parse_latency['p95']} p99={parse_latency['p99']}")
+    for stage in ("lemmatize", "match", "extract"):
+        print(f"  {stage:<10} p50={report['latency_ms'][stage]['p50']} p95={report['latency_ms'][stage]['p95']}")
+    print(f"Failures: {len(report['failures'])}. Full report saved to '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# output_pager.py
+"""
+Консоль задания с постраничным просмотром вывода из OutputSpool.
+В памяти виджета не больше PAGE_LINES строк: пока консоль следит за
+концом вывода, старые строки отбрасываются, а более ранние страницы
+читаются из файла вывода по запросу.
+"""
+from typing import Callable, List, Optional
+
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QPushButton, QLabel
+from PyQt5.QtGui import QIcon
+
+from output_spool import OutputSpool
+
+# Строк на странице и максимум строк в консоли
+PAGE_LINES = 5000
+# Оформление строк вывода, прочитанных из файла: ошибки и служебные строки
+# задания (заголовок, параметры, итог выполнения)
+LINE_TYPES = (("ERROR:", "error"), ("----- ", "header"), ("> Параметры:", "info"))
+
+
+class OutputPager(QWidget):
+    """
+    Консоль вывода задания. Панель перехода по страницам появляется, когда
+    вывод длиннее одной страницы. На странице из начала или середины вывода
+    новые строки не показываются до возврата к концу ("В конец").
+    """
+
+    def __init__(self, spool: Optional[OutputSpool], log: Callable[[str, str, QTextEdit], None], parent=None):
+        """
+        Args:
+            spool: Файл вывода задания (None - вывод только в консоли, без страниц).
+            log: Функция (text, msg_type, console) вывода текста в консоль.
+        """
+        super().__init__(parent)
+        self.spool, self.log = spool, log
+        self.following, self.first_line = True, 0
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.nav_bar = QWidget()
+        nav_layout = QHBoxLayout(self.nav_bar)
+        nav_layout.setContentsMargins(0, 0, 0, 0)
+        self.position_label = QLabel()
+        self.position_label.setStyleSheet("color: #8e9297;")
+        nav_layout.addWidget(self.position_label, 1)
+        self.first_button = self._nav_button("go-first", "В начало", lambda: self.show_page(0))
+        self.prev_button = self._nav_button("go-previous", "Предыдущая страница", self.show_previous)
+        self.next_button = self._nav_button("go-next", "Следующая страница", self.show_next)
+        self.last_button = self._nav_button("go-last", "В конец (следить за выводом)", self.follow)
+        for button in (self.first_button, self.prev_button, self.next_button, self.last_button):
+            nav_layout.addWidget(button)
+        layout.addWidget(self.nav_bar)
+        self.nav_bar.hide()
+        self.console = QTextEdit(); self.console.setReadOnly(True)
+        # +1 - пустой блок после перевода строки в конце страницы
+        self.console.document().setMaximumBlockCount(PAGE_LINES + 1)
+        layout.addWidget(self.console)
+
+    def _nav_button(self, icon_name: str, tooltip: str, handler) -> QPushButton:
+        button = QPushButton(QIcon.fromTheme(icon_name), "")
+        button.setToolTip(tooltip); button.setFlat(True)
+        button.clicked.connect(handler)
+        return button
+
+    @property
+    def total_lines(self) -> int:
+        return self.spool.line_count if self.spool else 0
+
+    def append(self, text: str, msg_type: str = "stdout"):
+        """Выводит текст, если консоль следит за концом вывода."""
+        if self.following:
+            self.log(text, msg_type, self.console)
+        self.update_position()
+
+    def catch_up(self):
+        """Показывает конец вывода, часть которого не была передана в консоль."""
+        if self.following:
+            self.follow()
+        else:
+            self.update_position()
+
+    def show_page(self, first: int):
+        """Показывает PAGE_LINES строк вывода, начиная со строки first."""
+        if not self.spool:
+            return
+        total = self.total_lines
+        self.following = False
+        self.first_line = max(0, min(first, total - PAGE_LINES))
+        self._render(self.spool.read_lines(self.first_line, PAGE_LINES))
+        self.console.verticalScrollBar().setValue(0)
+        self.update_position()
+
+    def show_previous(self):
+        first = self.first_line if not self.following else max(0, self.total_lines - PAGE_LINES)
+        self.show_page(first - PAGE_LINES)
+
+    def show_next(self):
+        if self.first_line + 2 * PAGE_LINES >= self.total_lines:
+            self.follow()
+        else:
+            self.show_page(self.first_line + PAGE_LINES)
+
+    def follow(self):
+        """Показывает последнюю страницу и дальше добавляет новый вывод."""
+        if not self.spool:
+            return
+        self.following = True
+        self.first_line = max(0, self.total_lines - PAGE_LINES)
+        self._render(self.spool.read_lines(self.first_line, PAGE_LINES))
+        self.console.verticalScrollBar().setValue(self.console.verticalScrollBar().maximum())
+        self.update_position()
+
+    def _render(self, lines: List[str]):
+        # Соседние строки одного типа выводятся одним блоком текста
+        self.console.clear()
+        block, block_type = [], None
+        for line in lines:
+            line_type = next((msg_type for prefix, msg_type in LINE_TYPES if line.startswith(prefix)), "stdout")
+            if line_type != block_type and block:
+                self.log("".join(block), block_type, self.console)
+                block = []
+            block.append(line); block_type = line_type
+        if block:
+            self.log("".join(block), block_type, self.console)
+
+    def update_position(self):
+        total = self.total_lines
+        if total <= PAGE_LINES and self.following:
+            self.nav_bar.hide()
+            return
+        self.nav_bar.show()
+        if self.following:
+            self.position_label.setText(f"Последние строки из {total} (остальные - на предыдущих страницах)")
+        else:
+            last = min(total, self.first_line + PAGE_LINES)
+            self.position_label.setText(f"Строки {self.first_line + 1}–{last} из {total}")
+        at_start = self.first_line == 0 and not self.following
+        self.first_button.setEnabled(not at_start); self.prev_button.setEnabled(not at_start)
+        self.next_button.setEnabled(not self.following); self.last_button.setEnabled(not self.following)
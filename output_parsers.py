@@ -0,0 +1,354 @@
+# output_parsers.py
+"""
+Потоковый разбор табличного вывода команд в типизированные записи.
+
+Разборщик получает stdout команды кусками по мере поступления (feed),
+выделяет из него строки и складывает записи в RecordTable - компактную
+таблицу в памяти, которую UI может сортировать, фильтровать и
+подсчитывать без повторного запуска команды. Разборщик выбирается для
+интента полем "parser" в commands.json (по типу ОС, как шаблоны команд)
+из реестра PARSERS. Исходный текст вывода при этом не меняется.
+"""
+import re
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+# Типы столбцов: строка, целое число и строка из небольшого набора значений
+# (состояния, архитектуры), которая хранится в одном экземпляре на значение
+STR = "str"
+INT = "int"
+CATEGORY = "category"
+
+
+@dataclass(frozen=True)
+class Column:
+    """
+    Столбец таблицы записей.
+
+    Attributes:
+        name: Имя столбца (для кода).
+        title: Заголовок для отображения.
+        type: STR, INT или CATEGORY.
+    """
+    name: str
+    title: str
+    type: str = STR
+
+
+def _to_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+# Приведение строкового значения к типу столбца
+_CONVERTERS = {STR: str, INT: _to_int, CATEGORY: sys.intern}
+
+
+class RecordTable:
+    """
+    Таблица записей разобранного вывода. Записи хранятся кортежами;
+    добавляет их поток движка процессов, читать можно из любого потока:
+    записи только дописываются в конец и не меняются.
+    """
+
+    def __init__(self, columns: Sequence[Column]):
+        self.columns: Tuple[Column, ...] = tuple(columns)
+        self.rows: List[tuple] = []
+        self._converters = tuple(_CONVERTERS[column.type] for column in self.columns)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def append(self, values: Sequence[str]):
+        """Добавляет запись из строковых значений, приводя их к типам столбцов."""
+        self.rows.append(tuple([convert(value) for convert, value in zip(self._converters, values)]))
+
+    def column_index(self, name: str) -> int:
+        for index, column in enumerate(self.columns):
+            if column.name == name:
+                return index
+        raise KeyError(name)
+
+    def count_by(self, column: int, rows: Optional[Iterable[int]] = None) -> List[Tuple[Any, int]]:
+        """
+        Количество записей по значениям столбца (по убыванию).
+
+        Args:
+            column: Номер столбца.
+            rows: Номера записей для подсчета (None - все записи).
+        """
+        if rows is None:
+            rows = range(len(self.rows))
+        return Counter(self.rows[row][column] for row in rows).most_common()
+
+
+class StreamParser:
+    """
+    Базовый потоковый разборщик. Наследник задает столбцы и parse_line();
+    незавершенная строка куска ждет следующего куска или close().
+    """
+    columns: Tuple[Column, ...] = ()
+
+    def __init__(self):
+        self.table = RecordTable(self.columns)
+        self._tail = ""
+
+    def feed(self, text: str):
+        """Принимает очередной кусок stdout."""
+        lines = (self._tail + text).split("\n")
+        self._tail = lines.pop()
+        for line in lines:
+            self.feed_line(line.rstrip("\r"))
+
+    def close(self):
+        """Разбирает остаток вывода после завершения команды."""
+        if self._tail:
+            tail, self._tail = self._tail, ""
+            self.feed_line(tail.rstrip("\r"))
+        record = self.finish()
+        if record is not None:
+            self.table.append(record)
+
+    def feed_line(self, line: str):
+        """Разбирает одну строку вывода (без перевода строки)."""
+        record = self.parse_line(line)
+        if record is not None:
+            self.table.append(record)
+
+    def parse_line(self, line: str) -> Optional[Sequence[str]]:
+        """Значения записи для строки или None, если строка не является записью."""
+        raise NotImplementedError
+
+    def finish(self) -> Optional[Sequence[str]]:
+        """Последняя запись, накопленная к концу вывода (для многострочных записей)."""
+        return None
+
+
+# --- Linux ---
+
+# Строка "dpkg -l": код состояния из 2-3 букв и четыре поля; заголовок не нужен,
+# поэтому разбирается и вывод "dpkg -l | grep ..."
+DPKG_ROW = re.compile(r"^([a-z][a-zA-Z ][A-Z ]?)\s+(\S+)\s+(\S+)\s+(\S+)\s*(.*)$")
+
+
+class DpkgParser(StreamParser):
+    """Список пакетов "dpkg -l"."""
+    columns = (Column("status", "Состояние", CATEGORY), Column("name", "Пакет"), Column("version", "Версия"),
+               Column("architecture", "Архитектура", CATEGORY), Column("description", "Описание"))
+
+    def parse_line(self, line):
+        match = DPKG_ROW.match(line)
+        if not match:
+            return None
+        status, name, version, architecture, description = match.groups()
+        return status.strip(), name, version, architecture, description
+
+
+class SystemdUnitsParser(StreamParser):
+    """Таблица "systemctl list-units" (до пустой строки перед легендой)."""
+    columns = (Column("unit", "Юнит"), Column("load", "Загрузка", CATEGORY),
+               Column("active", "Активность", CATEGORY), Column("sub", "Состояние", CATEGORY),
+               Column("description", "Описание"))
+
+    def __init__(self):
+        super().__init__()
+        self._in_table = False
+        self._done = False
+
+    def parse_line(self, line):
+        line = line.strip()
+        if self._done:
+            return None
+        if not self._in_table:
+            self._in_table = line.startswith("UNIT ")
+            return None
+        if not line:
+            self._done = True
+            return None
+        # Маркер неисправного юнита ("●" или "*") стоит перед именем
+        if line[0] in "●*":
+            line = line[1:].lstrip()
+        fields = line.split(None, 4)
+        if len(fields) < 4:
+            return None
+        return fields + [""] * (5 - len(fields))
+
+
+class SsParser(StreamParser):
+    """Сокеты "ss -tulnp" (столбец Netid есть не всегда)."""
+    columns = (Column("netid", "Протокол", CATEGORY), Column("state", "Состояние", CATEGORY),
+               Column("recv_q", "Recv-Q", INT), Column("send_q", "Send-Q", INT),
+               Column("local", "Локальный адрес"), Column("peer", "Удаленный адрес"), Column("process", "Процесс"))
+
+    def __init__(self):
+        super().__init__()
+        self._has_netid = True
+
+    def parse_line(self, line):
+        if line.startswith(("Netid", "State")):
+            self._has_netid = line.startswith("Netid")
+            return None
+        fields = line.split(None, 6 if self._has_netid else 5)
+        if not self._has_netid:
+            fields.insert(0, "")
+        if len(fields) < 6:
+            return None
+        return fields + [""] * (7 - len(fields))
+
+
+class PasswdParser(StreamParser):
+    """Учетные записи "getent passwd"."""
+    columns = (Column("user", "Пользователь"), Column("uid", "UID", INT), Column("gid", "GID", INT),
+               Column("gecos", "Описание"), Column("home", "Домашний каталог"),
+               Column("shell", "Оболочка", CATEGORY))
+
+    def parse_line(self, line):
+        fields = line.split(":")
+        if len(fields) != 7:
+            return None
+        return fields[0], fields[2], fields[3], fields[4], fields[5], fields[6]
+
+
+class GroupParser(StreamParser):
+    """Группы "getent group"."""
+    columns = (Column("group", "Группа"), Column("gid", "GID", INT), Column("members", "Участники"))
+
+    def parse_line(self, line):
+        fields = line.split(":")
+        if len(fields) != 4:
+            return None
+        return fields[0], fields[2], fields[3].replace(",", ", ")
+
+
+# --- Windows ---
+
+class ChocoParser(StreamParser):
+    """Пакеты "choco list": строки "имя версия"."""
+    columns = (Column("name", "Пакет"), Column("version", "Версия"))
+
+    def parse_line(self, line):
+        fields = line.split()
+        if len(fields) != 2 or fields[0] == "Chocolatey":
+            return None
+        return fields
+
+
+class ScQueryParser(StreamParser):
+    """Службы "sc query": многострочные блоки, начинающиеся с SERVICE_NAME."""
+    columns = (Column("name", "Служба"), Column("display_name", "Отображаемое имя"),
+               Column("state", "Состояние", CATEGORY), Column("type", "Тип", CATEGORY),
+               Column("exit_code", "Код выхода", INT))
+
+    def __init__(self):
+        super().__init__()
+        self._current: Optional[Dict[str, str]] = None
+
+    def parse_line(self, line):
+        key, separator, value = line.partition(":")
+        if not separator:
+            return None
+        key, value = key.strip(), value.strip()
+        if key == "SERVICE_NAME":
+            record, self._current = self.finish(), {"name": value}
+            return record
+        if self._current is None:
+            return None
+        if key == "DISPLAY_NAME":
+            self._current["display_name"] = value
+        elif key in ("STATE", "TYPE"):
+            # "4  RUNNING": числовой код и имя
+            self._current[key.lower()] = value.split()[-1] if value else ""
+        elif key == "WIN32_EXIT_CODE":
+            self._current["exit_code"] = value.split()[0] if value else ""
+        return None
+
+    def finish(self):
+        if self._current is None:
+            return None
+        record, self._current = self._current, None
+        return tuple(record.get(column.name, "") for column in self.columns)
+
+
+class NetstatParser(StreamParser):
+    """Подключения "netstat -ano" (у UDP нет состояния)."""
+    columns = (Column("proto", "Протокол", CATEGORY), Column("local", "Локальный адрес"),
+               Column("foreign", "Удаленный адрес"), Column("state", "Состояние", CATEGORY),
+               Column("pid", "PID", INT))
+
+    def parse_line(self, line):
+        fields = line.split()
+        if not fields or fields[0].upper() not in ("TCP", "UDP"):
+            return None
+        if len(fields) == 4:
+            fields.insert(3, "")
+        return fields if len(fields) == 5 else None
+
+
+# Ширина столбца имен в выводе "net user"
+NET_USER_COLUMN_WIDTH = 25
+
+
+class NetUserParser(StreamParser):
+    """
+    Пользователи "net user": имена столбцами по 25 символов после строки
+    из дефисов. Последняя строка - сообщение о завершении на языке системы,
+    поэтому каждая строка разбирается только после получения следующей.
+    """
+    columns = (Column("user", "Пользователь"),)
+
+    def __init__(self):
+        super().__init__()
+        self._in_table = False
+        self._pending: Optional[str] = None
+
+    def feed_line(self, line):
+        # Имена из одной строки вывода - несколько записей
+        if not self._in_table:
+            self._in_table = line.startswith("---")
+            return
+        if not line.strip():
+            return
+        if self._pending:
+            for offset in range(0, len(self._pending), NET_USER_COLUMN_WIDTH):
+                name = self._pending[offset:offset + NET_USER_COLUMN_WIDTH].strip()
+                if name:
+                    self.table.append((name,))
+        self._pending = line
+
+
+class NetLocalgroupParser(StreamParser):
+    """Группы "net localgroup": строки "*Имя"."""
+    columns = (Column("group", "Группа"),)
+
+    def parse_line(self, line):
+        return (line[1:].strip(),) if line.startswith("*") else None
+
+
+# Реестр разборщиков: имя из поля "parser" в commands.json -> класс
+PARSERS: Dict[str, Type[StreamParser]] = {
+    "dpkg": DpkgParser,
+    "systemd_units": SystemdUnitsParser,
+    "ss": SsParser,
+    "passwd": PasswdParser,
+    "group": GroupParser,
+    "choco": ChocoParser,
+    "sc_query": ScQueryParser,
+    "netstat": NetstatParser,
+    "net_user": NetUserParser,
+    "net_localgroup": NetLocalgroupParser,
+}
+
+
+def create_parser(name: Optional[str]) -> Optional[StreamParser]:
+    """Создает разборщик по имени из реестра; None - имя не задано или неизвестно."""
+    if not name:
+        return None
+    parser_class = PARSERS.get(name)
+    if parser_class is None:
+        print(f"Warning: Unknown output parser '{name}'.")
+        return None
+    return parser_class()
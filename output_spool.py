@@ -0,0 +1,175 @@
+# output_spool.py
+"""
+Буферизация вывода заданий на диске.
+
+Вывод каждого задания дописывается в файл в logs/spool/, а в памяти
+остается только индекс начала строк (array('Q'), 8 байт на строку).
+Для чтения файл отображается в память (mmap), поэтому любой диапазон
+строк читается без загрузки всего вывода - консоль UI показывает вывод
+многогигабайтных журналов страницами ограниченного размера.
+"""
+import mmap
+import os
+import tempfile
+import threading
+import time
+from array import array
+from itertools import accumulate
+from typing import List, Optional
+
+try:
+    import psutil
+
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+SPOOL_DIR = os.path.join("logs", "spool")
+SPOOL_SUFFIX = ".spool"
+# Файлы, оставшиеся после аварийного завершения, удаляются при запуске; без
+# psutil (нельзя проверить процесс-владелец) - только старше этого срока
+STALE_SPOOL_SECONDS = 24 * 60 * 60
+
+
+class OutputSpool:
+    """
+    Файл вывода одного задания с индексом строк. Запись (поток движка)
+    и чтение (UI) можно выполнять из разных потоков.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Путь к файлу; существующий файл перезаписывается.
+        """
+        self.path = path
+        self.size = 0
+        # Смещения начала строк; последний элемент - начало еще не начатой
+        # или незавершенной строки
+        self._offsets = array('Q', [0])
+        self._lock = threading.Lock()
+        self._file = open(path, 'wb')
+        self._reader = None
+        self._map: Optional[mmap.mmap] = None
+        self._dirty = False
+        self.closed = False
+        self.error: Optional[str] = None
+
+    @classmethod
+    def create(cls, prefix: str, directory: str = SPOOL_DIR) -> "OutputSpool":
+        """Создает файл с уникальным именем "<pid>-<prefix>-....spool" в directory."""
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=SPOOL_SUFFIX, prefix=f"{os.getpid()}-{prefix}-", dir=directory)
+        os.close(fd)
+        return cls(path)
+
+    @property
+    def line_count(self) -> int:
+        """Число строк, включая незавершенную последнюю."""
+        return len(self._offsets) - (1 if self._offsets[-1] == self.size else 0)
+
+    def write(self, text: str):
+        """Дописывает текст и обновляет индекс строк."""
+        data = text.encode('utf-8')
+        with self._lock:
+            if self.closed or self.error:
+                return
+            try:
+                self._file.write(data)
+            except OSError as e:
+                # Например, закончилось место на диске: вывод остается только в консоли
+                self.error = str(e)
+                print(f"Warning: Failed to write output spool '{self.path}': {e}")
+                return
+            parts = data.split(b"\n")
+            if len(parts) > 1:
+                starts = accumulate((len(part) + 1 for part in parts[:-1]), initial=self.size)
+                next(starts)
+                self._offsets.extend(starts)
+            self.size += len(data)
+            self._dirty = True
+
+    def _view(self, end: int) -> mmap.mmap:
+        """Отображение файла, покрывающее первые end байт (переотображается при росте)."""
+        if self._dirty:
+            self._file.flush()
+            self._dirty = False
+        if self._map is None or len(self._map) < end:
+            if self._map is not None:
+                self._map.close()
+            if self._reader is None:
+                self._reader = open(self.path, 'rb')
+            self._map = mmap.mmap(self._reader.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def read_lines(self, first: int, count: int) -> List[str]:
+        """
+        Читает до count строк, начиная со строки first (с 0). Строки
+        возвращаются с символами перевода строки.
+        """
+        with self._lock:
+            if self.closed:
+                return []
+            total = self.line_count
+            first = max(0, min(first, total))
+            last = min(total, first + max(0, count))
+            if first >= last:
+                return []
+            start = self._offsets[first]
+            end = self._offsets[last] if last < len(self._offsets) else self.size
+            data = self._view(end)[start:end]
+        return data.decode('utf-8', errors='replace').splitlines(keepends=True)
+
+    def text(self) -> str:
+        """Весь вывод одной строкой (для небольших выводов)."""
+        return "".join(self.read_lines(0, self.line_count))
+
+    def close(self, remove: bool = True):
+        """Закрывает файл и (по умолчанию) удаляет его."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            for handle in (self._map, self._reader, self._file):
+                if handle is not None:
+                    handle.close()
+            self._map = self._reader = None
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                print(f"Warning: Failed to remove output spool '{self.path}': {e}")
+
+
+def _owner_alive(filename: str) -> bool:
+    pid = filename.split("-", 1)[0]
+    if not pid.isdigit():
+        return False
+    return int(pid) == os.getpid() or psutil.pid_exists(int(pid))
+
+
+def cleanup_spool_dir(directory: str = SPOOL_DIR) -> int:
+    """
+    Удаляет файлы вывода, оставшиеся от завершившихся процессов приложения.
+    Возвращает число удаленных файлов.
+    """
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    now = time.time()
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(SPOOL_SUFFIX) or not entry.is_file():
+            continue
+        try:
+            if PSUTIL_AVAILABLE:
+                stale = not _owner_alive(entry.name)
+            else:
+                stale = now - entry.stat().st_mtime > STALE_SPOOL_SECONDS
+            if stale:
+                os.remove(entry.path)
+                removed += 1
+        except OSError as e:
+            print(f"Warning: Failed to remove stale output spool '{entry.path}': {e}")
+    if removed:
+        print(f"Removed {removed} stale output spool files from '{directory}'.")
+    return removed
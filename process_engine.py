@@ -0,0 +1,379 @@
+# process_engine.py
+"""
+Асинхронный движок запуска внешних команд.
+
+Все процессы запускаются из одного цикла событий asyncio, который работает
+в отдельном фоновом потоке. stdout и stderr читаются одновременно, поэтому
+процесс, много пишущий в stderr, не блокируется на переполненном канале,
+а ожидание вывода не нагружает CPU. Один цикл обслуживает любое количество
+одновременно выполняемых команд.
+
+Вывод читается крупными блоками и перед передачей потребителю собирается
+в пакеты (OutputCoalescer), чтобы UI получал десятки обновлений в секунду,
+а не по одному на каждую строку.
+
+Для каждой команды поддерживаются таймаут и отмена (останавливается все
+дерево процессов), а по завершении собирается статистика ресурсов:
+время выполнения, процессорное время, пиковая память и объем вывода.
+"""
+import asyncio
+import codecs
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Union
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+STDOUT = "stdout"
+STDERR = "stderr"
+
+# Размер блока, читаемого из канала процесса за один раз
+READ_BLOCK_SIZE = 64 * 1024
+# Период опроса потребления ресурсов дерева процессов (секунды)
+RESOURCE_SAMPLE_INTERVAL = 0.1
+# Сколько ждать закрытия каналов после остановки процесса (секунды)
+KILL_GRACE_PERIOD = 5.0
+
+
+@dataclass
+class FlushPolicy:
+    """
+    Правило передачи накопленного вывода потребителю.
+
+    Attributes:
+        interval: Максимальная задержка вывода в секундах.
+        max_chars: Размер буфера (в символах), при достижении которого
+                   вывод передается сразу, не дожидаясь интервала.
+    """
+    interval: float = 0.05
+    max_chars: int = 64 * 1024
+
+
+DEFAULT_FLUSH_POLICY = FlushPolicy()
+# Передача каждого прочитанного блока без накопления
+NO_COALESCING = FlushPolicy(interval=0, max_chars=0)
+
+
+@dataclass
+class ExecutionResult:
+    """
+    Итог выполнения одной команды.
+
+    Процессорное время и пиковая память оцениваются периодическим опросом
+    дерева процессов через psutil (без psutil остаются None).
+
+    Attributes:
+        exit_code: Код возврата процесса (None, если процесс не был запущен).
+        wall_time: Время выполнения в секундах.
+        user_time: Процессорное время в режиме пользователя (секунды).
+        sys_time: Процессорное время в режиме ядра (секунды).
+        peak_rss: Пиковый суммарный RSS дерева процессов в байтах.
+        output_bytes: Объем вывода (stdout + stderr) в байтах.
+        timed_out: Процесс остановлен по таймауту.
+        cancelled: Выполнение отменено.
+        cached: Результат взят из кэша, команда не запускалась.
+    """
+    exit_code: Optional[int] = None
+    wall_time: float = 0.0
+    user_time: Optional[float] = None
+    sys_time: Optional[float] = None
+    peak_rss: Optional[int] = None
+    output_bytes: int = 0
+    timed_out: bool = False
+    cancelled: bool = False
+    cached: bool = False
+
+    def summary(self) -> str:
+        """Краткая строка со статистикой для вывода пользователю."""
+        if self.cached:
+            return f"из кэша, вывод {self.output_bytes} Б"
+        parts = [f"{self.wall_time:.2f} с"]
+        if self.user_time is not None:
+            parts.append(f"CPU {self.user_time:.2f}+{self.sys_time:.2f} с")
+        if self.peak_rss is not None:
+            parts.append(f"RSS {self.peak_rss / (1024 * 1024):.1f} МБ")
+        parts.append(f"вывод {self.output_bytes} Б")
+        return ", ".join(parts)
+
+
+class _ResourceStats:
+    """Накопитель измерений ресурсов дерева процессов."""
+
+    def __init__(self):
+        self.cpu: Dict[int, Tuple[float, float]] = {}
+        self.peak_rss = 0
+        self.output_bytes = 0
+
+    def sample(self, pid: int):
+        """Снимает потребление процесса pid и всех его потомков."""
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return
+        rss = 0
+        for process in processes:
+            try:
+                with process.oneshot():
+                    cpu = process.cpu_times()
+                    rss += process.memory_info().rss
+            except psutil.Error:
+                continue
+            # Время завершившихся процессов сохраняется по последнему замеру
+            self.cpu[process.pid] = (cpu.user, cpu.system)
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def fill(self, result: ExecutionResult):
+        result.output_bytes = self.output_bytes
+        if PSUTIL_AVAILABLE:
+            result.user_time = sum(user for user, _ in self.cpu.values())
+            result.sys_time = sum(system for _, system in self.cpu.values())
+            result.peak_rss = self.peak_rss
+
+
+def kill_process_tree(pid: int):
+    """
+    Принудительно завершает процесс и всех его потомков.
+    Использует psutil, а без него - группу процессов (POSIX) или taskkill /T (Windows).
+    """
+    if PSUTIL_AVAILABLE:
+        try:
+            root = psutil.Process(pid)
+            children = root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return
+        # Сначала корень, чтобы он не успел отреагировать на гибель потомков
+        for process in [root] + children:
+            try:
+                process.kill()
+            except psutil.NoSuchProcess:
+                pass
+        # Корневой процесс не ожидаем: его код возврата забирает asyncio
+        psutil.wait_procs(children, timeout=KILL_GRACE_PERIOD)
+    elif os.name == 'nt':
+        subprocess.run(["taskkill", "/T", "/F", "/PID", str(pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       creationflags=subprocess.CREATE_NO_WINDOW)
+    else:
+        try:
+            os.killpg(os.getpgid(pid), signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+class OutputCoalescer:
+    """
+    Накапливает вывод процесса и передает его пакетами по FlushPolicy.
+    Соседние фрагменты одного потока склеиваются, порядок между stdout и
+    stderr сохраняется. Работает внутри цикла событий движка.
+    """
+
+    def __init__(self, on_chunk: Callable[[str, str], None], policy: FlushPolicy):
+        self._on_chunk = on_chunk
+        self._policy = policy
+        self._pending: List[Tuple[str, str]] = []
+        self._pending_chars = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def feed(self, stream_name: str, text: str):
+        """Добавляет фрагмент вывода в буфер."""
+        if self._pending and self._pending[-1][0] == stream_name:
+            self._pending[-1] = (stream_name, self._pending[-1][1] + text)
+        else:
+            self._pending.append((stream_name, text))
+        self._pending_chars += len(text)
+
+        if self._pending_chars >= self._policy.max_chars:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._policy.interval, self.flush)
+
+    def flush(self):
+        """Передает накопленный вывод потребителю."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._pending_chars = self._pending, [], 0
+        for stream_name, text in pending:
+            self._on_chunk(stream_name, text)
+
+
+class ProcessEngine:
+    """
+    Цикл событий asyncio в фоновом потоке и методы для запуска в нем команд.
+    Методы submit/run_command/run_in_executor потокобезопасны и возвращают
+    concurrent.futures.Future, которого можно дождаться из любого потока.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Цикл событий движка (запускается при первом обращении)."""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever,
+                                                name="ProcessEngine", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Запускает корутину в цикле движка."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run_command(self, command: Union[str, List[str]], on_chunk: Callable[[str, str], None],
+                    shell: bool = False, encoding: str = 'utf-8',
+                    flush_policy: FlushPolicy = DEFAULT_FLUSH_POLICY, timeout: Optional[float] = None,
+                    **popen_kwargs) -> Future:
+        """Запускает команду; см. execute(). Отмена Future останавливает процесс."""
+        return self.submit(self.execute(command, on_chunk, shell, encoding, flush_policy, timeout,
+                                        **popen_kwargs))
+
+    def run_in_executor(self, func: Callable, *args) -> Future:
+        """Выполняет блокирующую функцию в пуле потоков цикла движка."""
+        return self.submit(self._call_in_executor(func, *args))
+
+    async def _call_in_executor(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def execute(self, command: Union[str, List[str]], on_chunk: Callable[[str, str], None],
+                      shell: bool = False, encoding: str = 'utf-8',
+                      flush_policy: FlushPolicy = DEFAULT_FLUSH_POLICY, timeout: Optional[float] = None,
+                      **popen_kwargs) -> ExecutionResult:
+        """
+        Выполняет команду, передавая вывод пакетами по мере поступления.
+        При превышении таймаута или отмене задачи дерево процессов команды
+        принудительно завершается.
+
+        Args:
+            command: Строка команды или список аргументов.
+            on_chunk: Функция (stream, text), где stream - STDOUT или STDERR.
+                      Вызывается в потоке движка.
+            shell: Выполнить команду через системную оболочку.
+            encoding: Кодировка вывода процесса.
+            flush_policy: Правило накопления вывода перед передачей в on_chunk.
+            timeout: Максимальное время выполнения в секундах (None - без ограничения).
+            popen_kwargs: Дополнительные аргументы для создания процесса
+                          (например, creationflags в Windows).
+
+        Returns:
+            ExecutionResult с кодом возврата и статистикой ресурсов.
+
+        Raises:
+            FileNotFoundError: Если исполняемый файл не найден.
+            asyncio.CancelledError: Если задача отменена (процесс уже остановлен).
+        """
+        if os.name != 'nt':
+            # Отдельная группа процессов позволяет остановить всех потомков без psutil
+            popen_kwargs.setdefault("start_new_session", True)
+        started = time.perf_counter()
+        if shell:
+            process = await asyncio.create_subprocess_shell(
+                command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **popen_kwargs)
+        else:
+            args = shlex.split(command) if isinstance(command, str) else command
+            process = await asyncio.create_subprocess_exec(
+                *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **popen_kwargs)
+
+        result = ExecutionResult()
+        stats = _ResourceStats()
+        coalescer = OutputCoalescer(on_chunk, flush_policy)
+        io_task = asyncio.ensure_future(asyncio.gather(
+            self._drain(process.stdout, STDOUT, encoding, coalescer.feed, stats),
+            self._drain(process.stderr, STDERR, encoding, coalescer.feed, stats),
+            process.wait(),
+        ))
+        sampler = asyncio.ensure_future(self._sample_resources(process.pid, stats)) if PSUTIL_AVAILABLE else None
+        try:
+            await asyncio.wait_for(asyncio.shield(io_task), timeout)
+        except asyncio.TimeoutError:
+            result.timed_out = True
+            await self._stop(process, io_task)
+        except asyncio.CancelledError:
+            result.cancelled = True
+            await self._stop(process, io_task)
+            raise
+        finally:
+            if sampler:
+                sampler.cancel()
+            # Финальная передача остатка вывода
+            coalescer.flush()
+            result.exit_code = process.returncode
+            result.wall_time = time.perf_counter() - started
+            stats.fill(result)
+        return result
+
+    async def _stop(self, process: asyncio.subprocess.Process, io_task: asyncio.Future):
+        """Останавливает дерево процессов и дожидается закрытия его каналов."""
+        await asyncio.get_running_loop().run_in_executor(None, kill_process_tree, process.pid)
+        try:
+            await asyncio.wait_for(io_task, KILL_GRACE_PERIOD)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            io_task.cancel()
+
+    @staticmethod
+    async def _sample_resources(pid: int, stats: _ResourceStats):
+        """Периодически снимает потребление ресурсов дерева процессов."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, stats.sample, pid)
+            await asyncio.sleep(RESOURCE_SAMPLE_INTERVAL)
+
+    @staticmethod
+    async def _drain(stream: asyncio.StreamReader, stream_name: str, encoding: str,
+                     on_chunk: Callable[[str, str], None], stats: Optional[_ResourceStats] = None):
+        """
+        Читает поток блоками до конца, декодируя вывод с учетом символов,
+        разрезанных границей блока.
+        """
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        while True:
+            block = await stream.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            if stats:
+                stats.output_bytes += len(block)
+            text = decoder.decode(block)
+            if text:
+                on_chunk(stream_name, text)
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            on_chunk(stream_name, tail)
+
+    def shutdown(self):
+        """Останавливает цикл событий движка."""
+        with self._lock:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                if self._thread:
+                    self._thread.join(timeout=5)
+                if not self._loop.is_running():
+                    self._loop.close()
+            self._loop, self._thread = None, None
+
+
+_engine: Optional[ProcessEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> ProcessEngine:
+    """Возвращает общий для приложения экземпляр движка."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ProcessEngine()
+        return _engine
@@ -0,0 +1,144 @@
+# record_view.py
+"""
+Просмотр таблицы записей, разобранных из вывода команды (output_parsers).
+Сортировка, фильтр и подсчет выполняются по таблице в памяти, без
+повторного запуска команды.
+"""
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QComboBox, QLabel, QTableView, QHeaderView, QAbstractItemView
+)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QTimer
+
+from output_parsers import INT, RecordTable
+
+# Роль с типизированным значением ячейки для сортировки
+SORT_ROLE = Qt.UserRole
+# Сколько самых частых значений показывать при подсчете
+COUNT_TOP_VALUES = 5
+SUMMARY_DELAY_MS = 200
+
+
+class RecordTableModel(QAbstractTableModel):
+    """Модель Qt поверх RecordTable; новые записи добавляются вызовом refresh()."""
+
+    def __init__(self, table: RecordTable, parent=None):
+        super().__init__(parent)
+        self.table = table
+        self._rows = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.table.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self.table.rows[index.row()][index.column()]
+        column = self.table.columns[index.column()]
+        if role == Qt.DisplayRole:
+            return "" if value is None else str(value)
+        if role == SORT_ROLE:
+            # Пустые числа - перед всеми остальными
+            if value is None:
+                return -1 if column.type == INT else ""
+            return value
+        if role == Qt.TextAlignmentRole and column.type == INT:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.table.columns[section].title
+        return super().headerData(section, orientation, role)
+
+    def refresh(self):
+        """Показывает записи, добавленные в таблицу после прошлого вызова."""
+        count = len(self.table)
+        if count > self._rows:
+            self.beginInsertRows(QModelIndex(), self._rows, count - 1)
+            self._rows = count
+            self.endInsertRows()
+
+
+class RecordTableWidget(QWidget):
+    """Таблица записей со строкой фильтра, выбором столбца и подсчетом значений."""
+
+    def __init__(self, table: RecordTable, parent=None):
+        super().__init__(parent)
+        self.table = table
+        self.model = RecordTableModel(table, self)
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setSortRole(SORT_ROLE)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.proxy.setFilterKeyColumn(-1)
+        self.proxy.setDynamicSortFilter(True)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 6, 0, 0)
+        controls = QHBoxLayout()
+        self.filter_input = QLineEdit(); self.filter_input.setPlaceholderText("Фильтр...")
+        self.filter_column = QComboBox(); self.filter_column.addItem("Все столбцы")
+        self.count_column = QComboBox(); self.count_column.addItem("Без подсчета")
+        for column in table.columns:
+            self.filter_column.addItem(column.title)
+            self.count_column.addItem(f"Подсчет: {column.title}")
+        self.count_column.setToolTip("Самые частые значения столбца среди показанных записей")
+        controls.addWidget(self.filter_input, 1)
+        controls.addWidget(self.filter_column)
+        controls.addWidget(self.count_column)
+        layout.addLayout(controls)
+        self.summary_label = QLabel()
+        self.summary_label.setStyleSheet("color: #8e9297;")
+        layout.addWidget(self.summary_label)
+        self.view = QTableView()
+        self.view.setModel(self.proxy)
+        self.view.setSortingEnabled(True)
+        self.view.sortByColumn(-1, Qt.AscendingOrder)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.verticalHeader().hide()
+        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.view)
+
+        # Сводка пересчитывается не чаще раза в SUMMARY_DELAY_MS
+        self.summary_timer = QTimer(self); self.summary_timer.setSingleShot(True)
+        self.summary_timer.setInterval(SUMMARY_DELAY_MS)
+        self.summary_timer.timeout.connect(self.update_summary)
+        self.filter_input.textChanged.connect(self.apply_filter)
+        self.filter_column.currentIndexChanged.connect(self.apply_filter)
+        self.count_column.currentIndexChanged.connect(self.update_summary)
+        self.update_summary()
+
+    def refresh(self):
+        """Добавляет в представление новые записи таблицы."""
+        had_rows = self.model.rowCount() > 0
+        self.model.refresh()
+        if not had_rows and self.model.rowCount():
+            self.view.resizeColumnsToContents()
+        self.summary_timer.start()
+
+    def apply_filter(self):
+        self.proxy.setFilterKeyColumn(self.filter_column.currentIndex() - 1)
+        self.proxy.setFilterFixedString(self.filter_input.text())
+        self.update_summary()
+
+    def visible_rows(self):
+        """Номера записей таблицы, прошедших фильтр, в порядке отображения."""
+        return [self.proxy.mapToSource(self.proxy.index(row, 0)).row() for row in range(self.proxy.rowCount())]
+
+    def update_summary(self):
+        self.summary_timer.stop()
+        visible, total = self.proxy.rowCount(), self.model.rowCount()
+        summary = f"Записей: {visible}" if visible == total else f"Записей: {visible} из {total}"
+        column = self.count_column.currentIndex() - 1
+        if column >= 0 and visible:
+            counts = self.table.count_by(column, self.visible_rows())
+            top = ", ".join(f"{'—' if value in (None, '') else value}: {count}"
+                            for value, count in counts[:COUNT_TOP_VALUES])
+            rest = len(counts) - COUNT_TOP_VALUES
+            summary += f"  |  {top}" + (f" и еще {rest} знач." if rest > 0 else "")
+        self.summary_label.setText(summary)
@@ -0,0 +1,125 @@
+# result_cache.py
+"""
+Кэш результатов выполнения интентов, только читающих состояние системы.
+
+Вывод команды хранится ограниченное время (TTL) под ключом
+(интент, отрендеренная команда, тип ОС). Размер кэша ограничен: при
+переполнении вытесняются давно не использованные записи. Изменяющие
+интенты сбрасывают связанные записи (поле "invalidates" в commands.json).
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+DEFAULT_CACHE_TTL = 60
+DEFAULT_CACHE_SIZE = 128
+# Вывод больше этого размера (в символах) не кэшируется
+MAX_CACHED_OUTPUT = 1024 * 1024
+
+CacheKey = Tuple[str, str, str]
+
+
+@dataclass
+class CachedResult:
+    """
+    Запись кэша.
+
+    Attributes:
+        output: Полный вывод команды.
+        stdout: Только стандартный вывод команды (для разбора в таблицу).
+        exit_code: Код возврата.
+        created_at: Момент сохранения (по часам кэша).
+        expires_at: Момент истечения срока хранения.
+    """
+    output: str
+    exit_code: int
+    created_at: float
+    expires_at: float
+    stdout: str = ""
+
+
+class ResultCache:
+    """
+    Потокобезопасный LRU-кэш с ограничением времени жизни записей.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            maxsize: Максимальное количество хранимых записей.
+            clock: Источник времени (секунды).
+        """
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data: "OrderedDict[CacheKey, CachedResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey) -> Optional[CachedResult]:
+        """Возвращает действующую запись или None (устаревшая запись удаляется)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry.expires_at <= self._clock():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: CacheKey, output: str, exit_code: int, ttl: float, stdout: str = "") -> None:
+        """Сохраняет результат на ttl секунд."""
+        if ttl <= 0 or len(output) > MAX_CACHED_OUTPUT:
+            return
+        now = self._clock()
+        with self._lock:
+            self._data[key] = CachedResult(output, exit_code, now, now + ttl, stdout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def age(self, entry: CachedResult) -> float:
+        """Возраст записи в секундах."""
+        return self._clock() - entry.created_at
+
+    def invalidate(self, patterns: Iterable[str]) -> int:
+        """
+        Удаляет записи указанных интентов. Шаблон вида "services.*"
+        соответствует всем интентам категории. Возвращает число удаленных записей.
+        """
+        exact, prefixes = set(), []
+        for pattern in patterns:
+            if pattern.endswith("*"):
+                prefixes.append(pattern[:-1])
+            else:
+                exact.add(pattern)
+        with self._lock:
+            stale = [key for key in self._data
+                     if key[0] in exact or any(key[0].startswith(prefix) for prefix in prefixes)]
+            for key in stale:
+                del self._data[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Очищает кэш и сбрасывает счетчики."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику использования кэша."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
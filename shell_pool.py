@@ -0,0 +1,384 @@
+# shell_pool.py
+"""
+Пул заранее запущенных оболочек для быстрого выполнения команд.
+
+Запуск процесса оболочки (особенно powershell в Windows) может занимать
+больше времени, чем сама команда. ShellPool держит несколько постоянно
+работающих оболочек (bash или PowerShell) и передает им команды через
+stdin. После каждой команды оболочка печатает в stdout и stderr метку с
+уникальным идентификатором (и кодом возврата в stdout): по ней
+определяется конец вывода команды. Вывод до метки передается по мере
+поступления.
+
+Окружение не переносится между командами: в bash команда выполняется в
+подоболочке, в PowerShell - в дочерней области видимости с восстановлением
+переменных окружения и текущего каталога. Оболочка, не прошедшая проверку
+работоспособности, превысившая таймаут или нарушившая протокол,
+останавливается и заменяется новой.
+
+Пул используется только для интентов с "pool_safe": true в commands.json.
+"""
+import asyncio
+import base64
+import codecs
+import os
+import shlex
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Deque, List, Optional
+
+from process_engine import (DEFAULT_FLUSH_POLICY, READ_BLOCK_SIZE, STDERR, STDOUT, ExecutionResult,
+                            FlushPolicy, OutputCoalescer, get_engine, kill_process_tree)
+
+DEFAULT_POOL_SIZE = 2
+# Сколько ждать ответа на проверку работоспособности (секунды)
+HEALTH_CHECK_TIMEOUT = 5.0
+# Оболочка, простаивавшая дольше этого времени, проверяется перед выдачей
+HEALTH_CHECK_INTERVAL = 30.0
+# После стольких команд оболочка заменяется новой
+MAX_COMMANDS_PER_WORKER = 200
+# Код возврата команды, прерванной сбоем оболочки пула
+SHELL_FAILURE_EXIT_CODE = 1
+
+_MARKER_PREFIX = "__SYSADMIN_DONE_"
+
+# Запоминает исходные переменные окружения и каталог оболочки PowerShell
+_POWERSHELL_INIT = (
+    "$ProgressPreference = 'SilentlyContinue'; "
+    "$__sa_env = @{}; Get-ChildItem env: | ForEach-Object { $__sa_env[$_.Name] = $_.Value }; "
+    "$__sa_cwd = (Get-Location).Path"
+)
+# Команда PowerShell, выполняющая переданный в base64 скрипт в дочерней области
+# и восстанавливающая окружение; {script} и {marker} подставляются перед отправкой
+_POWERSHELL_COMMAND = (
+    "$global:LASTEXITCODE = 0; $__sa_ok = $true; "
+    "try {{ & ([ScriptBlock]::Create([Text.Encoding]::UTF8.GetString([Convert]::FromBase64String('{script}')))) "
+    "*>&1 | Out-String -Stream -Width 4096 }} catch {{ Write-Output $_; $__sa_ok = $false }}; "
+    "$__sa_rc = if ($LASTEXITCODE) {{ $LASTEXITCODE }} elseif ($__sa_ok) {{ 0 }} else {{ 1 }}; "
+    "Get-ChildItem env: | Where-Object {{ -not $__sa_env.ContainsKey($_.Name) }} | "
+    "ForEach-Object {{ Remove-Item \"env:$($_.Name)\" }}; "
+    "foreach ($__sa_key in $__sa_env.Keys) {{ Set-Item \"env:$__sa_key\" $__sa_env[$__sa_key] }}; "
+    "Set-Location $__sa_cwd; "
+    "[Console]::Out.Write(\"`n{marker} $__sa_rc`n\"); [Console]::Out.Flush(); "
+    "[Console]::Error.Write(\"`n{marker}`n\"); [Console]::Error.Flush()"
+)
+# Команда bash: скрипт выполняется в подоболочке без доступа к stdin оболочки
+_BASH_COMMAND = (
+    "( eval {script} ) </dev/null; __sa_rc=$?; "
+    "printf '\\n%s %d\\n' '{marker}' \"$__sa_rc\"; printf '\\n%s\\n' '{marker}' >&2"
+)
+
+
+class ShellWorkerError(Exception):
+    """Оболочка завершилась или нарушила протокол обмена."""
+
+
+def _unwrap_powershell(command: str) -> str:
+    """
+    Убирает вызов "powershell" из команды шаблона: в оболочке пула она
+    выполняется напрямую. Скрипт в кавычках извлекается из кавычек.
+    """
+    head, _, rest = command.partition(" ")
+    if head.lower() not in ("powershell", "powershell.exe"):
+        return command
+    rest = rest.strip()
+    if len(rest) >= 2 and rest[0] == rest[-1] == '"':
+        rest = rest[1:-1]
+    return rest
+
+
+class ShellWorker:
+    """Один процесс оболочки, выполняющий команды по очереди."""
+
+    def __init__(self, windows: bool):
+        self.windows = windows
+        self.encoding = 'cp866' if windows else 'utf-8'
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.commands_run = 0
+        self.last_used = time.monotonic()
+        self.healthy = False
+
+    async def start(self):
+        """Запускает оболочку и проверяет, что она отвечает."""
+        if self.windows:
+            import subprocess
+            args = ["powershell", "-NoLogo", "-NoProfile", "-NonInteractive", "-ExecutionPolicy", "Bypass",
+                    "-Command", "-"]
+            kwargs = {"creationflags": subprocess.CREATE_NO_WINDOW}
+        else:
+            args = ["bash", "--noprofile", "--norc"]
+            # Отдельная группа процессов, чтобы при остановке завершить и потомков
+            kwargs = {"start_new_session": True}
+        self.process = await asyncio.create_subprocess_exec(
+            *args, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE, **kwargs)
+        if self.windows:
+            self.process.stdin.write((_POWERSHELL_INIT + "\n").encode(self.encoding))
+        self.healthy = True
+        if not await self.check():
+            await self.stop()
+            raise ShellWorkerError("shell did not respond to health check")
+
+    @property
+    def alive(self) -> bool:
+        return self.healthy and self.process is not None and self.process.returncode is None
+
+    async def check(self, timeout: float = HEALTH_CHECK_TIMEOUT) -> bool:
+        """Проверка работоспособности: пустая команда должна завершиться с кодом 0."""
+        try:
+            exit_code = await asyncio.wait_for(self.run("$null" if self.windows else ":", lambda s, t: None),
+                                               timeout)
+        except (asyncio.TimeoutError, ShellWorkerError, OSError):
+            self.healthy = False
+            return False
+        return exit_code == 0
+
+    def _frame(self, command: str, marker: str) -> str:
+        if self.windows:
+            script = base64.b64encode(_unwrap_powershell(command).encode('utf-8')).decode('ascii')
+            return _POWERSHELL_COMMAND.format(script=script, marker=marker) + "\n"
+        return _BASH_COMMAND.format(script=shlex.quote(command), marker=marker) + "\n"
+
+    async def run(self, command: str, on_chunk: Callable[[str, str], None]) -> int:
+        """
+        Выполняет команду и возвращает код возврата. Вывод передается в
+        on_chunk(stream, text) по мере поступления.
+
+        Raises:
+            ShellWorkerError: Если оболочка завершилась или нарушила протокол.
+        """
+        if not self.alive:
+            raise ShellWorkerError("shell is not running")
+        marker = f"{_MARKER_PREFIX}{uuid.uuid4().hex}"
+        self.commands_run += 1
+        # Пока команда не завершена, оболочка считается неисправной: прерванную
+        # команду (таймаут, отмена) нельзя продолжить, оболочку нужно заменить
+        self.healthy = False
+        try:
+            self.process.stdin.write(self._frame(command, marker).encode(self.encoding))
+            await self.process.stdin.drain()
+            # Оба потока дочитываются до конца, даже если один из них оборвался
+            outcomes = await asyncio.gather(
+                self._read_until(self.process.stdout, f"\n{marker} ".encode('ascii'), STDOUT, on_chunk),
+                self._read_until(self.process.stderr, f"\n{marker}\n".encode('ascii'), STDERR, on_chunk),
+                return_exceptions=True,
+            )
+            for outcome in outcomes:
+                if isinstance(outcome, BaseException):
+                    raise outcome
+            stdout_tail = outcomes[0]
+            while b"\n" not in stdout_tail:
+                block = await self.process.stdout.read(64)
+                if not block:
+                    raise ShellWorkerError("shell exited")
+                stdout_tail += block
+            status, _, extra = stdout_tail.partition(b"\n")
+            exit_code = int(status.strip())
+        except (ConnectionError, ValueError) as e:
+            raise ShellWorkerError(f"protocol error: {e}")
+        # Лишние данные после метки означают рассинхронизацию
+        self.healthy = not extra.strip()
+        self.last_used = time.monotonic()
+        return exit_code
+
+    async def _read_until(self, stream: asyncio.StreamReader, marker: bytes, stream_name: str,
+                          on_chunk: Callable[[str, str], None]) -> bytes:
+        """
+        Передает данные потока до метки, удерживая хвост, который может
+        оказаться началом метки. Возвращает данные после метки.
+        """
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        buffer = b""
+        keep = len(marker) - 1
+        while True:
+            index = buffer.find(marker)
+            if index >= 0:
+                text = decoder.decode(buffer[:index], final=True)
+                if text:
+                    on_chunk(stream_name, text)
+                return buffer[index + len(marker):]
+            if len(buffer) > keep:
+                text = decoder.decode(buffer[:-keep])
+                if text:
+                    on_chunk(stream_name, text)
+                buffer = buffer[-keep:]
+            block = await stream.read(READ_BLOCK_SIZE)
+            if not block:
+                # Удержанный хвост - вывод команды, а не часть метки
+                text = decoder.decode(buffer, final=True)
+                if text:
+                    on_chunk(stream_name, text)
+                raise ShellWorkerError("shell exited")
+            buffer += block
+
+    async def stop(self):
+        """Останавливает оболочку вместе с запущенными ей процессами."""
+        self.healthy = False
+        if self.process is None or self.process.returncode is not None:
+            return
+        await asyncio.get_running_loop().run_in_executor(None, kill_process_tree, self.process.pid)
+        try:
+            await asyncio.wait_for(self.process.wait(), HEALTH_CHECK_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+
+
+class ShellPool:
+    """
+    Пул оболочек в цикле движка процессов. Если свободной оболочки нет,
+    execute() возвращает None, и команда запускается обычным способом.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, windows: Optional[bool] = None):
+        self.size = size
+        self.windows = os.name == 'nt' if windows is None else windows
+        self.shell_available = shutil.which("powershell" if self.windows else "bash") is not None
+        self._idle: Deque[ShellWorker] = deque()
+        self._workers: List[ShellWorker] = []
+        self._spawning = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and self.shell_available
+
+    def start(self):
+        """Заранее запускает оболочки пула (в цикле движка, без ожидания)."""
+        if self.enabled:
+            get_engine().submit(self._fill())
+
+    async def _fill(self):
+        while len(self._workers) + self._spawning < self.size:
+            self._spawning += 1
+            try:
+                worker = ShellWorker(self.windows)
+                await worker.start()
+            except (OSError, ShellWorkerError) as e:
+                print(f"Warning: Failed to start pooled shell: {e}")
+                return
+            finally:
+                self._spawning -= 1
+            self._workers.append(worker)
+            self._idle.append(worker)
+
+    async def _acquire(self) -> Optional[ShellWorker]:
+        while self._idle:
+            worker = self._idle.popleft()
+            if worker.alive and time.monotonic() - worker.last_used > HEALTH_CHECK_INTERVAL:
+                await worker.check()
+            if worker.alive:
+                return worker
+            await self._discard(worker)
+        # Свободных оболочек нет: пул пополняется в фоне, команда идет обычным путем
+        asyncio.ensure_future(self._fill())
+        return None
+
+    def _release(self, worker: ShellWorker):
+        if worker.alive and worker.commands_run < MAX_COMMANDS_PER_WORKER:
+            self._idle.append(worker)
+        else:
+            asyncio.ensure_future(self._discard(worker))
+
+    async def _discard(self, worker: ShellWorker):
+        if worker in self._workers:
+            self._workers.remove(worker)
+        await worker.stop()
+        asyncio.ensure_future(self._fill())
+
+    async def execute(self, command: str, on_chunk: Callable[[str, str], None],
+                      flush_policy: FlushPolicy = DEFAULT_FLUSH_POLICY,
+                      timeout: Optional[float] = None) -> Optional[ExecutionResult]:
+        """
+        Выполняет команду в свободной оболочке пула; см. ProcessEngine.execute().
+        Возвращает None, если пул отключен, свободной оболочки нет или оболочка
+        отказала до начала вывода команды. При таймауте, отмене или сбое
+        оболочка останавливается вместе с командой.
+        """
+        if not self.enabled:
+            return None
+        worker = await self._acquire()
+        if worker is None:
+            return None
+        result = ExecutionResult()
+        started = time.perf_counter()
+        coalescer = OutputCoalescer(on_chunk, flush_policy)
+
+        def feed(stream: str, text: str):
+            result.output_bytes += len(text.encode(worker.encoding))
+            coalescer.feed(stream, text)
+
+        run_task = asyncio.ensure_future(worker.run(command, feed))
+        failure = None
+        try:
+            result.exit_code = await asyncio.wait_for(asyncio.shield(run_task), timeout)
+        except asyncio.TimeoutError:
+            result.timed_out = True
+            await self._abort(worker, run_task)
+        except asyncio.CancelledError:
+            result.cancelled = True
+            await self._abort(worker, run_task)
+            raise
+        except ShellWorkerError as e:
+            failure = e
+            print(f"Warning: Pooled shell failed: {e}")
+            # Вывод уже передан: команда завершается с ошибкой, без повторного запуска
+            if result.output_bytes:
+                feed(STDERR, f"Сбой оболочки пула: {e}\n")
+                result.exit_code = SHELL_FAILURE_EXIT_CODE
+        finally:
+            coalescer.flush()
+            result.wall_time = time.perf_counter() - started
+            if failure is None:
+                self._release(worker)
+        if failure is not None:
+            await self._discard(worker)
+            # Команда ничего не вывела - она выполняется обычным способом
+            if result.exit_code is None:
+                return None
+        return result
+
+    async def _abort(self, worker: ShellWorker, run_task: asyncio.Future):
+        await worker.stop()
+        run_task.cancel()
+        try:
+            await run_task
+        except (asyncio.CancelledError, ShellWorkerError):
+            pass
+
+    async def close(self):
+        """Останавливает все оболочки пула."""
+        self.size = 0
+        workers, self._workers = list(self._workers), []
+        self._idle.clear()
+        for worker in workers:
+            await worker.stop()
+
+
+_shell_pool: Optional[ShellPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_shell_pool() -> ShellPool:
+    """Возвращает общий для приложения пул оболочек (создается при первом обращении)."""
+    global _shell_pool
+    with _pool_lock:
+        if _shell_pool is None:
+            _shell_pool = ShellPool()
+        return _shell_pool
+
+
+def start_shell_pool():
+    """Заранее запускает оболочки пула (вызывается при старте UI)."""
+    get_shell_pool().start()
+
+
+def stop_shell_pool(timeout: float = HEALTH_CHECK_TIMEOUT):
+    """Останавливает оболочки пула и ждет их завершения."""
+    if _shell_pool is None:
+        return
+    try:
+        get_engine().submit(_shell_pool.close()).result(timeout)
+    except Exception as e:
+        print(f"Warning: Failed to stop pooled shells: {e}")
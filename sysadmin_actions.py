@@ -3,12 +3,16 @@
 Слой бизнес-логики. Отвечает за выполнение команд.
 
 Этот модуль принимает интент и параметры, рендерит финальную команду
-из шаблона и запускает ее в отдельном процессе.
+из шаблона и запускает ее в отдельном процессе через асинхронный движок
+(process_engine), общий для всех выполняемых команд.
 """
+import asyncio
+import re
 import subprocess
-import shlex
-import platform
-from typing import Dict, Any
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional
 
 # ИСПРАВЛЕНИЕ: Импортируем psutil для надежного сбора данных
 try:
@@ -19,12 +23,73 @@ except ImportError:
     PSUTIL_AVAILABLE = False
 
 # Импортируем класс напрямую, так как он теперь в корне
+from capabilities import detect_os_type, get_capabilities
 from command_templates import CommandTemplates
+import fs_tools
+import log_search
+import net_probe
+from process_engine import DEFAULT_FLUSH_POLICY, ExecutionResult, FlushPolicy, OutputCoalescer, STDOUT, get_engine
+from result_cache import DEFAULT_CACHE_TTL, MAX_CACHED_OUTPUT, CacheKey, ResultCache
+from shell_pool import get_shell_pool
+import system_monitor
+from system_monitor import get_metrics_service, get_process_sampler
+
+# Таймаут выполнения (секунды) для интентов без поля "timeout" в commands.json
+DEFAULT_COMMAND_TIMEOUT = 300
+
+# Общий кэш результатов интентов с "cacheable": true
+result_cache = ResultCache()
+
+# Значения параметров, которые можно подставить без экранирования в команду
+# интента с "pool_safe": true - она всегда выполняется через оболочку
+POOL_SAFE_PARAM = re.compile(r"^[\w.:/@%+=,-]*$")
 
 
 # --- Специальные обработчики для надежности ---
+# Обработчик вызывается в пуле потоков как handler(params, on_output), где
+# params - параметры интента (с учетом значений по умолчанию), а on_output -
+# HandlerOutput для передачи вывода по мере готовности. Возвращаемая строка
+# (если есть) выводится после всего переданного через on_output; строка,
+# начинающаяся с "ERROR:", означает сбой обработчика - результат получает код
+# возврата HANDLER_ERROR_EXIT_CODE и не сохраняется в кэше.
+HANDLER_ERROR_EXIT_CODE = 1
+
+
+class HandlerCancelled(Exception):
+    """Выполнение специального обработчика прервано (отмена или таймаут)."""
+
+
+class HandlerOutput:
+    """
+    Потокобезопасная передача вывода специального обработчика в цикл движка.
+    После отмены вызов бросает HandlerCancelled, а событие cancelled
+    позволяет прервать длительную работу без вывода. После close() вывод,
+    еще не дошедший до цикла, отбрасывается.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, feed: callable):
+        self._loop = loop
+        self._feed = feed
+        self._closed = False
+        self.cancelled = threading.Event()
+        self.output_bytes = 0
+
+    def __call__(self, text: str):
+        if self.cancelled.is_set():
+            raise HandlerCancelled()
+        self.output_bytes += len(text.encode('utf-8'))
+        self._loop.call_soon_threadsafe(self._deliver, text)
 
-def _get_disk_usage():
+    def _deliver(self, text: str):
+        if not self._closed:
+            self._feed(STDOUT, text)
+
+    def close(self):
+        """Прекращает передачу вывода (вызывается в цикле движка)."""
+        self._closed = True
+
+
+def _get_disk_usage(params: Dict[str, Any], on_output: HandlerOutput):
     """Возвращает информацию об использовании диска с помощью psutil."""
     if not PSUTIL_AVAILABLE:
         return "ERROR: Библиотека psutil не найдена. Пожалуйста, установите ее: pip install psutil"
@@ -48,48 +113,77 @@ def _get_disk_usage():
     return output
 
 
-def _list_processes():
-    """Возвращает список процессов с помощью psutil."""
+def _list_processes(params: Dict[str, Any], on_output: HandlerOutput):
+    """
+    Возвращает процессы из снимка фонового ProcessSampler.
+    Параметры: sort (cpu, memory, pid, name), user, name, limit (0 - все).
+    """
     if not PSUTIL_AVAILABLE:
         return "ERROR: Библиотека psutil не найдена."
 
-    header = f"{'PID':<8} {'Name':<25} {'Username':<20} {'CPU%':<8} {'Memory%':<10}\n"
-    separator = "-" * (len(header) + 5) + "\n"
+    try:
+        limit = int(params.get("limit") or 25)
+    except ValueError:
+        return f"ERROR: Некорректное значение limit: {params.get('limit')}\n"
+    snapshot, processes = get_process_sampler().query(sort=params.get("sort") or "cpu",
+                                                      user=params.get("user"), name=params.get("name"),
+                                                      limit=limit)
+    if snapshot is None:
+        return "ERROR: Данные о процессах еще не собраны, повторите запрос.\n"
+
+    header = f"{'PID':<8} {'Name':<25} {'Username':<20} {'CPU%':>7} {'Memory%':>9} {'RSS (MB)':>10}\n"
+    separator = "-" * len(header) + "\n"
     output = header + separator
-
-    for proc in psutil.process_iter(['pid', 'name', 'username', 'cpu_percent', 'memory_percent']):
-        try:
-            pid = proc.info['pid']
-            name = proc.info['name'] or 'N/A'
-            user = proc.info['username'] or 'N/A'
-            cpu = f"{proc.info['cpu_percent']:.1f}"
-            mem = f"{proc.info['memory_percent']:.1f}"
-            output += f"{pid:<8} {name[:24]:<25} {user[:19]:<20} {cpu:<8} {mem:<10}\n"
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            continue
+    for info in processes:
+        output += (f"{info.pid:<8} {info.name[:24]:<25} {info.username[:19]:<20} {info.cpu_percent:>7.1f} "
+                   f"{info.memory_percent:>9.1f} {info.rss / (1024 * 1024):>10.1f}\n")
+    snapshot_time = time.strftime('%H:%M:%S', time.localtime(snapshot.timestamp))
+    output += f"\nПоказано {len(processes)} из {len(snapshot.processes)} процессов (снимок {snapshot_time}).\n"
     return output
 
 
-def _get_system_load():
-    """Возвращает информацию о загрузке CPU и RAM с помощью psutil."""
+def _get_system_load(params: Dict[str, Any], on_output: HandlerOutput):
+    """
+    Возвращает текущую загрузку CPU, памяти, дисков и сети и средние значения
+    за 1/5/15 минут из истории фонового MetricsService (без ожидания замера).
+    """
     if not PSUTIL_AVAILABLE:
         return "ERROR: Библиотека psutil не найдена."
 
-    cpu_percent = psutil.cpu_percent(interval=1)
-    mem = psutil.virtual_memory()
+    metrics = get_metrics_service()
+    if not metrics.wait_until_ready():
+        return "ERROR: Данные о загрузке еще не собраны, повторите запрос.\n"
+    current = metrics.current()
 
-    mem_total_gb = f"{mem.total / (1024 ** 3):.2f} GB"
-    mem_used_gb = f"{mem.used / (1024 ** 3):.2f} GB"
-    mem_percent = f"{mem.percent}%"
+    mem_total_gb = f"{metrics.memory_total / (1024 ** 3):.2f} GB"
+    mem_used_gb = f"{metrics.memory_used / (1024 ** 3):.2f} GB"
+    mb = 1024 * 1024
 
     output = "--- System Load ---\n"
-    output += f"CPU Usage: {cpu_percent}%\n"
-    output += f"Memory Usage: {mem_percent} ({mem_used_gb} / {mem_total_gb})\n"
-
+    output += f"CPU Usage: {current[system_monitor.CPU_PERCENT]:.1f}%\n"
+    output += f"Memory Usage: {current[system_monitor.MEMORY_PERCENT]:.1f}% ({mem_used_gb} / {mem_total_gb})\n"
+    output += (f"Disk I/O: read {current[system_monitor.DISK_READ_BPS] / mb:.2f} MB/s, "
+               f"write {current[system_monitor.DISK_WRITE_BPS] / mb:.2f} MB/s\n")
+    output += (f"Network: recv {current[system_monitor.NET_RECV_BPS] / mb:.2f} MB/s, "
+               f"sent {current[system_monitor.NET_SENT_BPS] / mb:.2f} MB/s\n")
+
+    windows = system_monitor.METRICS_WINDOWS
+    aggregates = [metrics.aggregate(window) for window in windows]
+    output += "\n--- Average (max) ---\n"
+    output += f"{'':<10}" + "".join(f"{f'{window // 60} min':>18}" for window in windows) + "\n"
+    for label, name, scale, unit in (("CPU", system_monitor.CPU_PERCENT, 1, "%"),
+                                     ("Memory", system_monitor.MEMORY_PERCENT, 1, "%"),
+                                     ("Disk R", system_monitor.DISK_READ_BPS, mb, " MB/s"),
+                                     ("Disk W", system_monitor.DISK_WRITE_BPS, mb, " MB/s"),
+                                     ("Net In", system_monitor.NET_RECV_BPS, mb, " MB/s"),
+                                     ("Net Out", system_monitor.NET_SENT_BPS, mb, " MB/s")):
+        cells = [f"{avg / scale:.1f} ({peak / scale:.1f}){unit}" for avg, peak in (a[name] for a in aggregates)]
+        output += f"{label:<10}" + "".join(f"{cell:>18}" for cell in cells) + "\n"
+    output += f"\nИстория: {metrics.history_span() / 60:.1f} мин.\n"
     return output
 
 
-def _list_disks():
+def _list_disks(params: Dict[str, Any], on_output: HandlerOutput):
     """Возвращает список дисков и разделов с помощью psutil."""
     if not PSUTIL_AVAILABLE:
         return "ERROR: Библиотека psutil не найдена."
@@ -104,62 +198,351 @@ def _list_disks():
     return output
 
 
+def _optional_int(params: Dict[str, Any], name: str) -> Optional[int]:
+    """Целочисленный параметр или None, если он не задан."""
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Parameter '{name}' must be an integer, got '{value}'.")
+
+
+def _find_files(params: Dict[str, Any], on_output: HandlerOutput):
+    """
+    Поиск файлов встроенным параллельным обходом (fs_tools.find_files).
+    Параметры: path, name (маска или регулярное выражение), mode (glob/regex),
+    max_depth, limit (0 - без ограничения), exclude (маски через запятую).
+    """
+    stats = fs_tools.find_files(
+        root=params.get("path") or ".",
+        pattern=params["name"],
+        on_match=lambda path: on_output(path + "\n"),
+        regex=params.get("mode") == "regex",
+        max_depth=_optional_int(params, "max_depth"),
+        limit=_optional_int(params, "limit") or 0,
+        exclude=fs_tools.split_patterns(params.get("exclude")),
+        stop_event=on_output.cancelled,
+    )
+    summary = (f"\nНайдено: {stats.matches}, просмотрено каталогов: {stats.dirs_scanned}, "
+               f"недоступно: {stats.errors}, время: {stats.elapsed:.2f} с.")
+    if stats.limit_reached:
+        summary += " Достигнут лимит результатов, поиск остановлен."
+    return summary + "\n"
+
+
+def _checksum(params: Dict[str, Any], on_output: HandlerOutput):
+    """
+    Контрольные суммы файла или всех файлов каталога (fs_tools.checksum_paths).
+    Параметры: filepath (файл или каталог), algorithm (один или несколько
+    алгоритмов через запятую: "SHA256,MD5"). Каждый файл читается один раз.
+    """
+    mb = 1024 * 1024
+
+    def report(digest: fs_tools.FileDigest):
+        if digest.error:
+            on_output(f"ERROR: {digest.path}: {digest.error}\n")
+            return
+        lines = [f"{name.upper()} ({digest.path}) = {value}\n" for name, value in digest.digests.items()]
+        on_output("".join(lines))
+
+    try:
+        algorithms = fs_tools.normalize_algorithms(fs_tools.split_patterns(params.get("algorithm") or "SHA256"))
+    except ValueError as e:
+        return f"ERROR: {e}\n"
+    stats = fs_tools.checksum_paths(
+        paths=[params["filepath"]],
+        algorithms=algorithms,
+        on_result=report,
+        stop_event=on_output.cancelled,
+    )
+    return (f"\nФайлов: {stats.files}, ошибок: {stats.errors}, объем: {stats.total_bytes / mb:.1f} MB, "
+            f"время: {stats.elapsed:.2f} с, скорость: {stats.throughput:.1f} MB/s.\n")
+
+
+def _search_logs(params: Dict[str, Any], on_output: HandlerOutput):
+    """
+    Потоковый поиск по журналам (log_search). Параметры: keyword, mode
+    (text/regex), source (auto, journal, files или пути через запятую),
+    since/until ("2h", "2025-06-18 10:00"), unit (юнит systemd), limit.
+    """
+    regex = params.get("mode") == "regex"
+    matcher = log_search.compile_query(params["keyword"], regex=regex)
+    since = log_search.parse_time_bound(params.get("since"))
+    until = log_search.parse_time_bound(params.get("until"))
+    limit = _optional_int(params, "limit") or 0
+    report = lambda match: on_output(match.format() + "\n")
+
+    source = (params.get("source") or "auto").strip()
+    if source == "journal" or (source == "auto" and log_search.journal_available()):
+        stats = log_search.search_journal(matcher, report, since=since, until=until, limit=limit,
+                                          unit=params.get("unit"), stop_event=on_output.cancelled,
+                                          prefilter=log_search.journal_prefilter(params["keyword"], regex))
+        scope = f"записей журнала: {stats.lines}"
+    else:
+        paths = [log_search.DEFAULT_LOG_DIR] if source in ("auto", "files") else fs_tools.split_patterns(source)
+        stats = log_search.search_files(matcher, report, paths=paths, since=since, until=until, limit=limit,
+                                        stop_event=on_output.cancelled)
+        scope = f"файлов: {stats.sources}, строк: {stats.lines}, недоступно: {stats.errors}"
+    summary = f"\nНайдено: {stats.matches}, просмотрено {scope}, время: {stats.elapsed:.2f} с."
+    if stats.limit_reached:
+        summary += " Достигнут лимит результатов, поиск остановлен."
+    return summary + "\n"
+
+
+def _run_on_engine(coro, on_output: HandlerOutput):
+    """
+    Выполняет корутину в цикле движка процессов и ждет результат.
+    Отмена обработчика отменяет корутину.
+    """
+    future = get_engine().submit(coro)
+    done = threading.Event()
+    future.add_done_callback(lambda _: done.set())
+    while not done.wait(0.1):
+        if on_output.cancelled.is_set():
+            future.cancel()
+            raise HandlerCancelled()
+    return future.result()
+
+
+def _probe_settings(params: Dict[str, Any]):
+    """Общие параметры сетевых проверок: таймаут проверки и параллельность."""
+    try:
+        timeout = float(params.get("probe_timeout") or net_probe.DEFAULT_PROBE_TIMEOUT)
+    except ValueError:
+        raise ValueError(f"Parameter 'probe_timeout' must be a number, got '{params.get('probe_timeout')}'.")
+    concurrency = _optional_int(params, "concurrency") or net_probe.DEFAULT_CONCURRENCY
+    return timeout, concurrency
+
+
+def _probe_reporter(total: int, on_output: HandlerOutput):
+    """При большом числе проверок по мере готовности выводятся только успешные."""
+    stream_all = total <= net_probe.STREAM_ALL_LIMIT
+
+    def report(result: net_probe.ProbeResult):
+        if stream_all or result.ok:
+            on_output(result.format() + "\n")
+    return report, stream_all
+
+
+def _ping_hosts(params: Dict[str, Any], on_output: HandlerOutput):
+    """
+    Опрос хостов по ICMP (net_probe.ping_sweep). Параметры: host (адреса,
+    имена, CIDR и диапазоны через запятую), count, probe_timeout, concurrency.
+    """
+    hosts = net_probe.expand_hosts(params["host"])
+    count = _optional_int(params, "count") or 1
+    timeout, concurrency = _probe_settings(params)
+    report, stream_all = _probe_reporter(len(hosts), on_output)
+    stats = _run_on_engine(net_probe.ping_sweep(hosts, report, count=count, concurrency=concurrency,
+                                                timeout=timeout), on_output)
+    return ("\n" + net_probe.format_ping_summary(stats, only_reachable=not stream_all) +
+            f"\nХостов: {stats.probes}, ответили: {stats.reachable}, время: {stats.elapsed:.2f} с.\n")
+
+
+def _check_ports(params: Dict[str, Any], on_output: HandlerOutput):
+    """
+    Проверка TCP-портов (net_probe.scan_ports). Параметры: host (как в
+    network.ping), port (список с диапазонами), probe_timeout, concurrency.
+    """
+    hosts = net_probe.expand_hosts(params["host"])
+    ports = net_probe.parse_ports(params["port"])
+    timeout, concurrency = _probe_settings(params)
+    report, stream_all = _probe_reporter(len(hosts) * len(ports), on_output)
+    stats = _run_on_engine(net_probe.scan_ports(hosts, ports, report, concurrency=concurrency,
+                                                timeout=timeout), on_output)
+    return ("\n" + net_probe.format_port_summary(stats, only_reachable=not stream_all) +
+            f"\nПроверок: {stats.probes}, открыто: {stats.reachable}, время: {stats.elapsed:.2f} с.\n")
+
+
 # Словарь для специальных, надежных обработчиков
 SPECIAL_HANDLERS = {
     "disk.usage": _get_disk_usage,
     "process.list": _list_processes,
     "system.get_load": _get_system_load,
     "disk.list": _list_disks,
+    "fs.find_files": _find_files,
+    "fs.checksum": _checksum,
+    "logs.search": _search_logs,
+    "network.ping": _ping_hosts,
+    "network.check_port": _check_ports,
     # Сюда можно добавлять другие интенты, требующие особой обработки
 }
 
+# Обработчики, применимые только в указанных ОС; в остальных выполняется шаблон команды
+SPECIAL_HANDLER_OS = {
+    "logs.search": ("astro",),
+}
+
+
+def has_special_handler(intent: str, os_type: Optional[str] = None) -> bool:
+    """Выполняется ли интент специальным обработчиком в данной ОС."""
+    if intent not in SPECIAL_HANDLERS:
+        return False
+    return (os_type or _current_os_type()) in SPECIAL_HANDLER_OS.get(intent, ("win", "astro"))
+
 
 # --- Основная функция выполнения ---
 
-def execute_intent(intent: str, params: Dict[str, Any], command_templates: CommandTemplates,
-                   on_output: callable) -> None:
+def resolve_timeout(intent: str, command_templates: CommandTemplates,
+                    timeout: Optional[float] = None) -> Optional[float]:
     """
-    Основная функция для выполнения действия по интенту.
+    Определяет таймаут выполнения интента: явное значение, затем поле
+    "timeout" шаблона, затем DEFAULT_COMMAND_TIMEOUT. Значение 0 или
+    меньше означает выполнение без ограничения времени.
+    """
+    if timeout is None:
+        template = command_templates.get_intent_template(intent)
+        timeout = template.timeout if template and template.timeout is not None else DEFAULT_COMMAND_TIMEOUT
+    return timeout if timeout > 0 else None
+
+
+def _current_os_type() -> str:
+    # Тип ОС определяется один раз за время работы процесса
+    return detect_os_type()
+
+
+def _cache_key(intent: str, params: Dict[str, Any], command_templates: CommandTemplates) -> Optional[CacheKey]:
+    """
+    Ключ кэша результата: интент, отрендеренная команда и тип ОС.
+    Для специальных обработчиков вместо команды используются параметры.
+    """
+    os_type = _current_os_type()
+    if has_special_handler(intent, os_type):
+        return intent, repr(sorted(params.items())), os_type
+    try:
+        return intent, command_templates.render_command(intent, os_type, params), os_type
+    except (KeyError, ValueError):
+        # Ошибку подготовки команды сообщит основной путь выполнения
+        return None
+
+
+async def execute_intent_async(intent: str, params: Dict[str, Any], command_templates: CommandTemplates,
+                               on_output: callable,
+                               flush_policy: FlushPolicy = DEFAULT_FLUSH_POLICY,
+                               timeout: Optional[float] = None,
+                               use_cache: bool = True,
+                               on_stdout: Optional[callable] = None) -> ExecutionResult:
+    """
+    Выполняет действие по интенту в цикле событий движка процессов.
     Сначала проверяет наличие специального обработчика, затем использует шаблоны.
+    Вывод команды передается в on_output пакетами согласно flush_policy.
+    Ошибки не выбрасываются, а передаются в on_output. Отмена задачи
+    (asyncio.CancelledError) останавливает процесс и пробрасывается дальше.
+
+    Успешные результаты интентов с "cacheable": true хранятся в result_cache
+    cache_ttl секунд; выполнение интента сбрасывает записи из его "invalidates".
+
+    Args:
+        timeout: Таймаут в секундах; см. resolve_timeout().
+        use_cache: Вернуть сохраненный результат, если он есть. При False команда
+                   выполняется заново, а кэш обновляется ее результатом.
+        on_stdout: Функция, получающая только стандартный вывод команды (без
+                   строки с командой и сообщений об ошибках), например для
+                   разбора в таблицу. Специальные обработчики ее не вызывают.
     """
+    template = command_templates.get_intent_template(intent)
+    cache_key = _cache_key(intent, params, command_templates) if template and template.cacheable else None
+    if cache_key and use_cache:
+        entry = result_cache.get(cache_key)
+        if entry is not None:
+            on_output(f"[Результат из кэша, получен {result_cache.age(entry):.0f} с назад]\n")
+            on_output(entry.output)
+            if on_stdout and entry.stdout:
+                on_stdout(entry.stdout)
+            return ExecutionResult(exit_code=entry.exit_code, output_bytes=len(entry.output.encode('utf-8')),
+                                   cached=True)
+
+    captured: List[str] = []
+    captured_stdout: List[str] = []
+    captured_size = 0
+
+    def capture(text: str):
+        nonlocal captured_size
+        captured_size += len(text)
+        if captured_size <= MAX_CACHED_OUTPUT:
+            captured.append(text)
+        on_output(text)
+
+    def capture_stdout(text: str):
+        # Стандартный вывод входит в общий, поэтому его размер уже учтен
+        if captured_size <= MAX_CACHED_OUTPUT:
+            captured_stdout.append(text)
+        if on_stdout:
+            on_stdout(text)
+
+    try:
+        result = await _run_intent(intent, params, command_templates, capture if cache_key else on_output,
+                                   flush_policy, timeout, capture_stdout if cache_key else on_stdout)
+    finally:
+        if template and template.invalidates:
+            result_cache.invalidate(template.invalidates)
+
+    if cache_key and result.exit_code == 0 and not result.timed_out and captured_size <= MAX_CACHED_OUTPUT:
+        ttl = template.cache_ttl if template.cache_ttl is not None else DEFAULT_CACHE_TTL
+        result_cache.put(cache_key, "".join(captured), result.exit_code, ttl, "".join(captured_stdout))
+    return result
+
+
+async def _run_intent(intent: str, params: Dict[str, Any], command_templates: CommandTemplates,
+                      on_output: callable, flush_policy: FlushPolicy,
+                      timeout: Optional[float], on_stdout: Optional[callable] = None) -> ExecutionResult:
+    """Выполняет интент без учета кэша; см. execute_intent_async()."""
+    timeout = resolve_timeout(intent, command_templates, timeout)
     try:
         # Шаг 1: Проверка на наличие специального обработчика
-        if intent in SPECIAL_HANDLERS:
-            handler = SPECIAL_HANDLERS[intent]
-            result = handler()
-            on_output(result)
-            return
+        if has_special_handler(intent):
+            return await _run_special_handler(intent, params, command_templates, on_output, flush_policy, timeout)
 
         # Шаг 2: Если специального обработчика нет, используем стандартный путь через шаблоны
-        os_type = "win" if platform.system().lower() == "windows" else "astro"
-        final_command = command_templates.render_command(intent, os_type, params)
+        os_type = _current_os_type()
+        template = command_templates.get_intent_template(intent)
+        via_shell = bool(template and template.pool_safe)
+        if via_shell:
+            unsafe = [name for name, value in params.items() if not POOL_SAFE_PARAM.match(str(value))]
+            if unsafe:
+                raise ValueError(f"недопустимые символы в значении параметра {', '.join(unsafe)}")
+        capabilities = get_capabilities()
+        final_command = capabilities.adapt_command(command_templates.render_command(intent, os_type, params))
         on_output(f"$ {final_command}\n")
+        # Отсутствующая программа обнаруживается по запомненным путям, без попытки запуска
+        missing = capabilities.missing_executables(final_command)
+        if missing:
+            raise FileNotFoundError(", ".join(missing))
 
         is_shell_needed = os_type == 'win'
         encoding = 'cp866' if os_type == 'win' else 'utf-8'
-
-        process = subprocess.Popen(
-            final_command if is_shell_needed else shlex.split(final_command),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            encoding=encoding,
-            errors='replace',
-            shell=is_shell_needed,
-            creationflags=subprocess.CREATE_NO_WINDOW if os_type == 'win' else 0
-        )
-
-        # Потоковая передача вывода
-        while True:
-            output = process.stdout.readline()
-            if output == '' and process.poll() is not None:
-                break
-            if output:
-                on_output(output)
-
-        stderr_output = process.stderr.read()
-        if stderr_output:
-            on_output(f"\nERROR:\n{stderr_output}")
+        popen_kwargs = {"creationflags": subprocess.CREATE_NO_WINDOW} if os_type == 'win' else {}
+
+        # stdout и stderr читаются одновременно и передаются по мере поступления
+        def on_chunk(stream: str, text: str):
+            if stream != STDOUT:
+                on_output(f"ERROR: {text}")
+                return
+            on_output(text)
+            if on_stdout:
+                on_stdout(text)
+
+        result = None
+        if via_shell:
+            # Без запуска нового процесса; None - свободной оболочки нет
+            result = await get_shell_pool().execute(final_command, on_chunk, flush_policy=flush_policy,
+                                                    timeout=timeout)
+            # Шаблоны пула могут содержать операторы оболочки (&&, |), поэтому
+            # и без пула они выполняются через оболочку, как в пуле - без stdin
+            is_shell_needed = True
+            if os_type != 'win':
+                popen_kwargs["stdin"] = subprocess.DEVNULL
+        if result is None:
+            result = await get_engine().execute(final_command, on_chunk, shell=is_shell_needed,
+                                                encoding=encoding, flush_policy=flush_policy, timeout=timeout,
+                                                **popen_kwargs)
+        if result.timed_out:
+            on_output(f"\nERROR: Превышено время выполнения ({timeout:g} с), процесс остановлен\n")
+        elif result.exit_code:
+            on_output(f"\nERROR: Команда завершилась с кодом {result.exit_code}\n")
+        return result
 
     except (KeyError, ValueError) as e:
         error_message = f"ERROR: Ошибка подготовки команды '{intent}': {e}\n"
@@ -173,4 +556,78 @@ def execute_intent(intent: str, params: Dict[str, Any], command_templates: Comma
         error_message = f"ERROR: Произошла непредвиденная ошибка во время выполнения: {e}\n"
         on_output(error_message)
         print(error_message)
+    return ExecutionResult()
+
 
+async def _run_special_handler(intent: str, params: Dict[str, Any], command_templates: CommandTemplates,
+                               on_output: callable, flush_policy: FlushPolicy,
+                               timeout: Optional[float]) -> ExecutionResult:
+    """
+    Выполняет специальный обработчик в пуле потоков. Промежуточный вывод
+    собирается в пакеты так же, как вывод внешних команд.
+    """
+    template = command_templates.get_intent_template(intent)
+    defaults = {name: spec.default for name, spec in template.params.items()
+                if spec.default is not None} if template else {}
+    params = {**defaults, **params}
+
+    loop = asyncio.get_running_loop()
+    coalescer = OutputCoalescer(lambda _stream, text: on_output(text), flush_policy)
+    handler_output = HandlerOutput(loop, coalescer.feed)
+    started = time.perf_counter()
+    # Обработчики блокирующие, поэтому выполняются в пуле потоков
+    future = loop.run_in_executor(None, SPECIAL_HANDLERS[intent], params, handler_output)
+    # После таймаута или отмены результат обработчика уже никому не нужен
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    output, timed_out = None, False
+    try:
+        output = await asyncio.wait_for(asyncio.shield(future), timeout)
+    except asyncio.TimeoutError:
+        handler_output.cancelled.set()
+        timed_out = True
+    except asyncio.CancelledError:
+        handler_output.cancelled.set()
+        raise
+    except HandlerCancelled:
+        pass
+    finally:
+        # Вывод, переданный до завершения, таймаута или сбоя обработчика, уже
+        # доставлен в цикл и передается раньше итога или сообщения об ошибке
+        # (его выводит _run_intent); более поздний вывод отбрасывается
+        handler_output.close()
+        coalescer.flush()
+    if timed_out:
+        on_output(f"\nERROR: Превышено время выполнения ({timeout:g} с).\n")
+        return ExecutionResult(wall_time=time.perf_counter() - started, timed_out=True,
+                               output_bytes=handler_output.output_bytes)
+    if output:
+        on_output(output)
+    exit_code = HANDLER_ERROR_EXIT_CODE if output and output.lstrip().startswith("ERROR:") else 0
+    return ExecutionResult(exit_code=exit_code, wall_time=time.perf_counter() - started,
+                           output_bytes=handler_output.output_bytes + len((output or "").encode('utf-8')))
+
+
+def submit_intent(intent: str, params: Dict[str, Any], command_templates: CommandTemplates,
+                  on_output: callable, flush_policy: FlushPolicy = DEFAULT_FLUSH_POLICY,
+                  timeout: Optional[float] = None, use_cache: bool = True) -> Future:
+    """
+    Запускает выполнение интента без блокировки вызывающего потока.
+    on_output вызывается из потока движка процессов. Отмена возвращенного
+    Future останавливает все дерево процессов команды.
+
+    Returns:
+        Future с ExecutionResult.
+    """
+    return get_engine().submit(
+        execute_intent_async(intent, params, command_templates, on_output, flush_policy, timeout, use_cache))
+
+
+def execute_intent(intent: str, params: Dict[str, Any], command_templates: CommandTemplates,
+                   on_output: callable, flush_policy: FlushPolicy = DEFAULT_FLUSH_POLICY,
+                   timeout: Optional[float] = None, use_cache: bool = True) -> ExecutionResult:
+    """
+    Основная функция для выполнения действия по интенту.
+    Блокирует вызывающий поток до завершения команды.
+    """
+    return submit_intent(intent, params, command_templates, on_output, flush_policy, timeout,
+                         use_cache).result()
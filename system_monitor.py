@@ -0,0 +1,421 @@
+# system_monitor.py
+"""
+Фоновый сбор сведений о системе для специальных обработчиков.
+
+ProcessSampler периодически обходит процессы и хранит постоянную таблицу
+процессов: CPU% считается по разнице процессорного времени между двумя
+обходами (однократный вызов cpu_percent всегда возвращает 0.0). Готовый
+снимок и вершины по CPU и памяти (heapq) доступны мгновенно, поэтому
+process.list не ждет сбора данных.
+
+MetricsService с фиксированным периодом записывает загрузку CPU, памяти,
+дисков и сети в кольцевые буферы (array) фиксированного размера. По ним
+system.get_load сразу возвращает текущие значения и средние за 1/5/15 минут,
+а UI строит график.
+"""
+import heapq
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Период обхода процессов (секунды)
+PROCESS_SAMPLE_INTERVAL = 2.0
+# Интервал между первым и вторым обходом, после которого снимок готов
+PROCESS_WARMUP_INTERVAL = 0.5
+# Размер заранее вычисляемых вершин по CPU и памяти
+PROCESS_TOP_N = 50
+
+# Период записи системных метрик (секунды) и глубина истории
+METRICS_SAMPLE_INTERVAL = 2.0
+METRICS_HISTORY_SECONDS = 15 * 60
+# Окна усреднения для system.get_load (секунды)
+METRICS_WINDOWS = (60, 5 * 60, 15 * 60)
+
+# Метрики, записываемые MetricsService
+CPU_PERCENT = "cpu_percent"
+MEMORY_PERCENT = "memory_percent"
+DISK_READ_BPS = "disk_read_bps"
+DISK_WRITE_BPS = "disk_write_bps"
+NET_RECV_BPS = "net_recv_bps"
+NET_SENT_BPS = "net_sent_bps"
+METRICS = (CPU_PERCENT, MEMORY_PERCENT, DISK_READ_BPS, DISK_WRITE_BPS, NET_RECV_BPS, NET_SENT_BPS)
+
+
+@dataclass(frozen=True)
+class ProcessInfo:
+    """
+    Сведения об одном процессе в снимке.
+
+    Attributes:
+        pid: Идентификатор процесса.
+        name: Имя процесса.
+        username: Владелец процесса.
+        cpu_percent: Загрузка CPU за последний интервал (100% - одно ядро).
+        memory_percent: Доля занимаемой физической памяти.
+        rss: Резидентная память в байтах.
+    """
+    pid: int
+    name: str
+    username: str
+    cpu_percent: float
+    memory_percent: float
+    rss: int
+
+
+@dataclass(frozen=True)
+class ProcessSnapshot:
+    """
+    Снимок таблицы процессов.
+
+    Attributes:
+        timestamp: Время снимка (time.time()).
+        processes: Все процессы.
+        top_cpu: Вершина по CPU% (не более PROCESS_TOP_N).
+        top_memory: Вершина по памяти (не более PROCESS_TOP_N).
+    """
+    timestamp: float
+    processes: Tuple[ProcessInfo, ...]
+    top_cpu: Tuple[ProcessInfo, ...]
+    top_memory: Tuple[ProcessInfo, ...]
+
+
+def _by_cpu(info: ProcessInfo) -> float:
+    return info.cpu_percent
+
+
+def _by_memory(info: ProcessInfo) -> int:
+    return info.rss
+
+
+class ProcessSampler:
+    """
+    Фоновый поток, периодически обновляющий снимок процессов.
+    """
+
+    # Порядок сортировки: ключ и направление (True - по убыванию)
+    SORT_ORDERS: Dict[str, Tuple[Callable[[ProcessInfo], object], bool]] = {
+        "cpu": (_by_cpu, True),
+        "memory": (_by_memory, True),
+        "pid": (lambda info: info.pid, False),
+        "name": (lambda info: info.name.lower(), False),
+    }
+
+    def __init__(self, interval: float = PROCESS_SAMPLE_INTERVAL, top_n: int = PROCESS_TOP_N):
+        self.interval = interval
+        self.top_n = top_n
+        self._snapshot: Optional[ProcessSnapshot] = None
+        # pid -> (время создания, суммарное процессорное время) с прошлого обхода
+        self._cpu_table: Dict[int, Tuple[float, float]] = {}
+        self._last_tick: Optional[float] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Запускает фоновый сбор (повторный вызов ничего не делает)."""
+        if not PSUTIL_AVAILABLE:
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="ProcessSampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Останавливает фоновый сбор."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def snapshot(self, timeout: float = 5.0) -> Optional[ProcessSnapshot]:
+        """
+        Возвращает последний снимок. При первом обращении запускает сбор
+        и ждет готовности не дольше timeout секунд.
+        """
+        self.start()
+        self._ready.wait(timeout)
+        with self._lock:
+            return self._snapshot
+
+    def query(self, sort: str = "cpu", user: Optional[str] = None, name: Optional[str] = None,
+              limit: int = 25) -> Tuple[Optional[ProcessSnapshot], List[ProcessInfo]]:
+        """
+        Выбирает процессы из последнего снимка.
+
+        Args:
+            sort: Порядок: "cpu", "memory", "pid" или "name".
+            user: Подстрока имени владельца (без учета регистра).
+            name: Подстрока имени процесса (без учета регистра).
+            limit: Максимальное количество строк (0 - все).
+
+        Returns:
+            Снимок (None, если данных нет) и выбранные процессы.
+
+        Raises:
+            ValueError: Если порядок сортировки неизвестен.
+        """
+        if sort not in self.SORT_ORDERS:
+            raise ValueError(f"Unknown sort order '{sort}'. Use one of: {', '.join(self.SORT_ORDERS)}.")
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return None, []
+
+        key, descending = self.SORT_ORDERS[sort]
+        if not user and not name and sort in ("cpu", "memory") and 0 < limit <= self.top_n:
+            # Быстрый путь: вершина уже посчитана при обходе
+            top = snapshot.top_cpu if sort == "cpu" else snapshot.top_memory
+            return snapshot, list(top[:limit])
+
+        processes = snapshot.processes
+        if user:
+            user = user.lower()
+            processes = [info for info in processes if user in info.username.lower()]
+        if name:
+            name = name.lower()
+            processes = [info for info in processes if name in info.name.lower()]
+        if limit <= 0:
+            return snapshot, sorted(processes, key=key, reverse=descending)
+        select = heapq.nlargest if descending else heapq.nsmallest
+        return snapshot, select(limit, processes, key=key)
+
+    def _run(self):
+        while True:
+            try:
+                self._tick()
+            except Exception as e:
+                print(f"ProcessSampler: sampling failed: {e}")
+            interval = self.interval if self._ready.is_set() else min(PROCESS_WARMUP_INTERVAL, self.interval)
+            if self._stop_event.wait(interval):
+                break
+
+    def _tick(self):
+        """Один обход процессов: обновляет таблицу CPU и публикует снимок."""
+        now = time.monotonic()
+        elapsed = now - self._last_tick if self._last_tick else None
+        cpu_table: Dict[int, Tuple[float, float]] = {}
+        processes: List[ProcessInfo] = []
+        attrs = ['pid', 'name', 'username', 'create_time', 'cpu_times', 'memory_info', 'memory_percent']
+        for proc in psutil.process_iter(attrs):
+            info = proc.info
+            cpu_times = info.get('cpu_times')
+            cpu_percent = 0.0
+            if cpu_times is not None:
+                cpu_total = cpu_times.user + cpu_times.system
+                previous = self._cpu_table.get(info['pid'])
+                # Время создания отличает новый процесс с тем же pid
+                if elapsed and previous and previous[0] == info['create_time']:
+                    cpu_percent = max(0.0, (cpu_total - previous[1]) / elapsed * 100)
+                cpu_table[info['pid']] = (info['create_time'], cpu_total)
+            memory_info = info.get('memory_info')
+            processes.append(ProcessInfo(
+                pid=info['pid'],
+                name=info.get('name') or 'N/A',
+                username=info.get('username') or 'N/A',
+                cpu_percent=cpu_percent,
+                memory_percent=info.get('memory_percent') or 0.0,
+                rss=memory_info.rss if memory_info else 0,
+            ))
+        self._cpu_table, self._last_tick = cpu_table, now
+        if elapsed is None:
+            # Первый обход только запоминает процессорное время
+            return
+
+        snapshot = ProcessSnapshot(
+            timestamp=time.time(),
+            processes=tuple(processes),
+            top_cpu=tuple(heapq.nlargest(self.top_n, processes, key=_by_cpu)),
+            top_memory=tuple(heapq.nlargest(self.top_n, processes, key=_by_memory)),
+        )
+        with self._lock:
+            self._snapshot = snapshot
+        self._ready.set()
+
+
+class RingBuffer:
+    """
+    Кольцевой буфер чисел фиксированного размера на основе array('d').
+    Новые значения вытесняют самые старые, память не растет.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = array('d', bytes(8 * capacity))
+        self._next = 0
+        self.count = 0
+
+    def append(self, value: float):
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def last(self, n: Optional[int] = None) -> List[float]:
+        """Последние n значений (по умолчанию все) в хронологическом порядке."""
+        n = self.count if n is None else max(0, min(n, self.count))
+        start = (self._next - n) % self.capacity
+        if start + n <= self.capacity:
+            return self._data[start:start + n].tolist()
+        return self._data[start:].tolist() + self._data[:self._next].tolist()
+
+    def latest(self) -> Optional[float]:
+        return self._data[self._next - 1] if self.count else None
+
+
+class MetricsService:
+    """
+    Фоновый поток, записывающий системные метрики в кольцевые буферы.
+    Все методы чтения возвращают данные мгновенно.
+    """
+
+    def __init__(self, interval: float = METRICS_SAMPLE_INTERVAL,
+                 history_seconds: float = METRICS_HISTORY_SECONDS):
+        self.interval = interval
+        self.capacity = max(1, int(history_seconds / interval))
+        self._timestamps = RingBuffer(self.capacity)
+        self._series: Dict[str, RingBuffer] = {name: RingBuffer(self.capacity) for name in METRICS}
+        self.memory_total = 0
+        self.memory_used = 0
+        self._previous_counters: Optional[Tuple[float, object, object]] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Запускает фоновую запись (повторный вызов ничего не делает)."""
+        if not PSUTIL_AVAILABLE:
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="MetricsService", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Останавливает фоновую запись."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def wait_until_ready(self, timeout: float = 5.0) -> bool:
+        """Запускает запись при необходимости и ждет первого измерения."""
+        self.start()
+        return self._ready.wait(timeout)
+
+    def current(self) -> Dict[str, float]:
+        """Последние записанные значения всех метрик."""
+        with self._lock:
+            return {name: series.latest() for name, series in self._series.items()}
+
+    def aggregate(self, window_seconds: float) -> Dict[str, Tuple[float, float]]:
+        """
+        Среднее и максимум каждой метрики за последние window_seconds
+        (или за всю историю, если она короче).
+        """
+        n = max(1, int(window_seconds / self.interval))
+        result = {}
+        with self._lock:
+            for name, series in self._series.items():
+                values = series.last(n)
+                result[name] = (sum(values) / len(values), max(values)) if values else (0.0, 0.0)
+        return result
+
+    def history(self, metric: str, seconds: Optional[float] = None) -> Tuple[List[float], List[float]]:
+        """Отметки времени (time.time()) и значения метрики за последние seconds."""
+        n = None if seconds is None else max(1, int(seconds / self.interval))
+        with self._lock:
+            return self._timestamps.last(n), self._series[metric].last(n)
+
+    def history_span(self) -> float:
+        """Длительность накопленной истории в секундах."""
+        with self._lock:
+            return self._timestamps.count * self.interval
+
+    def _run(self):
+        # Первый вызов cpu_percent(None) и счетчики только задают точку отсчета
+        psutil.cpu_percent(interval=None)
+        self._previous_counters = (time.monotonic(), psutil.disk_io_counters(), psutil.net_io_counters())
+        interval = min(PROCESS_WARMUP_INTERVAL, self.interval)
+        while not self._stop_event.wait(interval):
+            try:
+                self._sample()
+            except Exception as e:
+                print(f"MetricsService: sampling failed: {e}")
+            interval = self.interval
+
+    def _sample(self):
+        now = time.monotonic()
+        cpu = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory()
+        disk, net = psutil.disk_io_counters(), psutil.net_io_counters()
+        previous_time, previous_disk, previous_net = self._previous_counters
+        self._previous_counters = (now, disk, net)
+        elapsed = max(now - previous_time, 1e-6)
+
+        def rate(current, previous, field_name: str) -> float:
+            # Счетчики могут отсутствовать (нет дисков) или сброситься
+            if current is None or previous is None:
+                return 0.0
+            return max(0.0, (getattr(current, field_name) - getattr(previous, field_name)) / elapsed)
+
+        values = {
+            CPU_PERCENT: cpu,
+            MEMORY_PERCENT: memory.percent,
+            DISK_READ_BPS: rate(disk, previous_disk, "read_bytes"),
+            DISK_WRITE_BPS: rate(disk, previous_disk, "write_bytes"),
+            NET_RECV_BPS: rate(net, previous_net, "bytes_recv"),
+            NET_SENT_BPS: rate(net, previous_net, "bytes_sent"),
+        }
+        with self._lock:
+            self._timestamps.append(time.time())
+            for name, value in values.items():
+                self._series[name].append(value)
+            self.memory_total, self.memory_used = memory.total, memory.used
+        self._ready.set()
+
+
+_process_sampler: Optional[ProcessSampler] = None
+_metrics_service: Optional[MetricsService] = None
+_sampler_lock = threading.Lock()
+
+
+def get_process_sampler() -> ProcessSampler:
+    """Возвращает общий для приложения экземпляр ProcessSampler."""
+    global _process_sampler
+    with _sampler_lock:
+        if _process_sampler is None:
+            _process_sampler = ProcessSampler()
+        return _process_sampler
+
+
+def get_metrics_service() -> MetricsService:
+    """Возвращает общий для приложения экземпляр MetricsService."""
+    global _metrics_service
+    with _sampler_lock:
+        if _metrics_service is None:
+            _metrics_service = MetricsService()
+        return _metrics_service
+
+
+def start_background_sampling():
+    """Запускает фоновый сбор сведений о системе (вызывается при старте UI)."""
+    get_process_sampler().start()
+    get_metrics_service().start()
+
+
+def stop_background_sampling():
+    """Останавливает фоновый сбор сведений о системе."""
+    get_process_sampler().stop()
+    get_metrics_service().stop()
@@ -2,8 +2,14 @@
 """
 Модуль содержит NLU-парсер и другие вспомогательные утилиты.
 """
+import hashlib
+import json
+import os
 import re
-from typing import Dict, Any, Optional, List
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Callable, Set, Sequence, Tuple, Union
 
 # --- Опциональные зависимости ---
 try:
@@ -20,6 +26,171 @@ except ImportError:
     RAPIDFuzz_AVAILABLE = False
     print("Warning: rapidfuzz not found. Fuzzy search will be disabled.")
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DB_DIR = "db"
+NLU_CACHE_PATH = os.path.join(DB_DIR, "nlu_index.json")
+NLU_CACHE_FORMAT = 2
+
+# --- Кэши ---
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Ограниченный LRU-кэш "ключ -> значение" со счетчиками попаданий.
+
+    Используется для лемм отдельных слов (разбор слова через pymorphy2 - самая
+    дорогая часть NLU) и для результатов сопоставления команд с интентами.
+    При переполнении вытесняются давно не использованные записи.
+    """
+
+    def __init__(self, loader: Callable[[str], Any], maxsize: int = 4096):
+        """
+        Args:
+            loader: Функция, вычисляющая значение для ключа при промахе кэша.
+            maxsize: Максимальное количество хранимых записей.
+        """
+        self._loader = loader
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        """Возвращает значение для ключа, вычисляя его только при промахе кэша."""
+        value = self._data.get(key, _MISSING)
+        if value is not _MISSING:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = self._loader(key)
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """Очищает кэш и сбрасывает счетчики."""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику использования кэша."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+# --- Извлечение параметров ---
+
+@dataclass
+class ParamMatch:
+    """
+    Найденное значение параметра и его позиция в исходном тексте.
+
+    Attributes:
+        name: Имя параметра из шаблона интента.
+        value: Извлеченное значение.
+        start: Начало значения в тексте (для подсветки).
+        end: Конец значения в тексте.
+    """
+    name: str
+    value: str
+    start: int
+    end: int
+
+
+class ParamExtractor:
+    """
+    Предкомпилированный извлекатель параметров одного интента.
+
+    Параметры заполняются в порядке их объявления в шаблоне: каждый получает
+    первое совпадение своего шаблона, не пересекающееся с уже занятыми
+    фрагментами текста. Каждое регулярное выражение проходит по тексту
+    один раз и лениво, без копирования строки.
+    """
+
+    def __init__(self, params: List[Tuple[str, "re.Pattern"]]):
+        """
+        Args:
+            params: Пары (имя параметра, скомпилированное выражение) в порядке
+                    объявления параметров в шаблоне.
+        """
+        self.params = params
+
+    def extract(self, text: str) -> List[ParamMatch]:
+        """Возвращает найденные параметры вместе с их позициями в тексте."""
+        taken: List[Tuple[int, int]] = []
+        scanners: Dict["re.Pattern", Any] = {}
+        matches: List[ParamMatch] = []
+
+        for name, pattern in self.params:
+            # Один и тот же шаблон продолжает сканирование с места остановки
+            scanner = scanners.get(pattern)
+            if scanner is None:
+                scanner = scanners[pattern] = pattern.finditer(text)
+            for match in scanner:
+                start, end = match.span()
+                if any(start < t_end and t_start < end for t_start, t_end in taken):
+                    continue
+                taken.append((start, end))
+                # Если у регулярки есть группа, берем ее, иначе - все совпадение
+                group = 1 if match.re.groups else 0
+                matches.append(ParamMatch(name, match.group(group), match.start(group), match.end(group)))
+                break
+        return matches
+
+
+# --- Префиксное дерево для подсказок ---
+
+class _TrieNode:
+    """Узел префиксного дерева: дочерние узлы и фразы, слова которых имеют этот префикс."""
+    __slots__ = ("children", "phrases")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.phrases: Set[int] = set()
+
+
+class PhraseTrie:
+    """
+    Префиксное дерево по словам фраз. Каждый узел хранит номера фраз,
+    содержащих слово с соответствующим префиксом, поэтому недописанное
+    слово сопоставляется с фразами за время, пропорциональное его длине.
+    """
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, word: str, phrase_index: int) -> None:
+        """Добавляет слово фразы с номером phrase_index."""
+        node = self.root
+        for char in word:
+            node = node.children.setdefault(char, _TrieNode())
+            node.phrases.add(phrase_index)
+
+    @staticmethod
+    def step(node: Optional[_TrieNode], char: str) -> Optional[_TrieNode]:
+        """Переходит от узла по одному символу. None - префикс не найден."""
+        if node is None:
+            return None
+        return node.children.get(char)
+
+
 # --- Основной класс NLU ---
 
 class AdvancedNLUParser:
@@ -37,6 +208,10 @@ class AdvancedNLUParser:
         "hostname": r"\b(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,63}\b",
         "hostname_or_ip": r"\b(?:\d{1,3}(?:\.\d{1,3}){3}|(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,63})\b",
         "port": r"\b\d{1,5}\b",
+        # Список целей: адреса, подсети CIDR, диапазоны ("10.0.0.1-20") и имена через запятую
+        "host_list": r"\b(?:\d{1,3}(?:\.\d{1,3}){3}(?:/\d{1,2}|-\d{1,3}(?:\.\d{1,3}){0,3})?|(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,63})"
+                     r"(?:\s*,\s*(?:\d{1,3}(?:\.\d{1,3}){3}(?:/\d{1,2}|-\d{1,3}(?:\.\d{1,3}){0,3})?|(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,63}))*",
+        "port_list": r"\b\d{1,5}(?:-\d{1,5})?(?:\s*,\s*\d{1,5}(?:-\d{1,5})?)*\b",
         "pid_or_name": r"\b(?:[a-zA-Z.-][a-zA-Z0-9.-]*|\d+)\b",
         "username": r"(?:user|пользовател[ья])\s+([a-zA-Z0-9_.-]+)",
         "filepath": r"([a-zA-Z]:(?:\\(?:[^\\/:*?\"<>|\r\n]+))+|/(?:[^/]+/)*[^/]+)",
@@ -44,37 +219,281 @@ class AdvancedNLUParser:
         "number": r"\b\d+\b",
         "string": r"['\"]([^'\"]+)['\"]", # Для явных строк в кавычках
     }
+
+    COMPILED_PARAM_REGEX = {
+        param_type: re.compile(regex, re.IGNORECASE) for param_type, regex in PARAM_REGEX.items()
+    }
+
+    WORD_REGEX = re.compile(r'[a-zа-я0-9]+')
+    LEMMA_CACHE_SIZE = 4096
+    PARSE_CACHE_SIZE = 512
+    FUZZY_SCORE_CUTOFF = 88
+    # Доля слов фразы, которая должна присутствовать во вводе (поиск без rapidfuzz)
+    BITSET_MIN_COVERAGE = 1.0
     
-    def __init__(self, command_templates):
+    def __init__(self, command_templates, cache_path: Optional[str] = NLU_CACHE_PATH,
+                 background: bool = False):
         """
         Инициализирует парсер.
 
         Args:
             command_templates (CommandTemplates): Экземпляр класса с загруженными
                                                   шаблонами команд.
+            cache_path: Путь к файлу с предрасчитанным индексом фраз.
+                        None отключает дисковый кэш.
+            background: Загружать словари pymorphy2 и индекс фраз в фоновом
+                        потоке. До окончания загрузки парсер работает в
+                        упрощенном режиме (сравнение слов в нижнем регистре).
         """
         self.command_templates = command_templates
-        self.morph: Optional[MorphAnalyzer] = MorphAnalyzer() if PYMORPHY_AVAILABLE else None
+        self.cache_path = cache_path
+        self.morph: Optional[MorphAnalyzer] = None
+        # Защищает данные поиска при переключении на полный режим
+        self._lock = threading.RLock()
+        self._ready = threading.Event()
+        self._ready_callbacks: List[Callable[[], None]] = []
+        # Общий кэш лемм для подготовки фраз и разбора команд
+        self.lemma_cache = LRUCache(self._lemmatize_word, self.LEMMA_CACHE_SIZE)
+        # Кэш "нормализованная команда -> интент"; параметры всегда извлекаются заново
+        self.parse_cache = LRUCache(self._match_normalized, self.PARSE_CACHE_SIZE)
         
         # Подготовка данных для нечеткого поиска
         self.intent_phrases_map: Dict[str, str] = {}
-        self.prepare_intent_data()
+        # Исходная фраза из commands.json -> ее лемматизированная форма
+        self.phrase_lemmas: Dict[str, str] = {}
+        self.phrase_choices: List[str] = []
+        self.token_index: Dict[str, Set[str]] = {}
+        self._phrase_order: Dict[str, int] = {}
+        self.token_ids: Dict[str, int] = {}
+        self.phrase_masks: List[Tuple[int, int]] = []
+        self.param_extractors: Dict[str, ParamExtractor] = {}
+        self.phrase_trie = PhraseTrie()
+        # Состояние поиска подсказок с предыдущего нажатия клавиши
+        self._suggest_words: Tuple[str, ...] = ()
+        self._suggest_mask = 0
+        self._suggest_prefix = ""
+        self._suggest_path: List[Optional[_TrieNode]] = [self.phrase_trie.root]
+
+        # Перезагрузка commands.json перестраивает индекс и сбрасывает кэш разборов
+        if hasattr(command_templates, "add_reload_listener"):
+            command_templates.add_reload_listener(self._on_templates_reloaded)
+
+        if not PYMORPHY_AVAILABLE:
+            self.prepare_intent_data()
+            self._set_ready()
+        elif background:
+            # Упрощенный индекс строится мгновенно, полный - в фоне
+            self.prepare_intent_data()
+            threading.Thread(target=self._load_morph, name="NLULoader", daemon=True).start()
+        else:
+            self._load_morph()
         print("AdvancedNLUParser initialized.")
 
+    def _load_morph(self):
+        """Загружает словари pymorphy2 и перестраивает индекс фраз по леммам."""
+        try:
+            morph = MorphAnalyzer()
+        except Exception as e:
+            print(f"ERROR: Failed to load pymorphy2 dictionaries: {e}. Lemmatization will be disabled.")
+            with self._lock:
+                if not self.intent_phrases_map:
+                    self.prepare_intent_data()
+            self._set_ready()
+            return
+
+        with self._lock:
+            self.morph = morph
+            self.lemma_cache.clear()
+            self.prepare_intent_data()
+        print("NLU: lemmatizer loaded, full matching enabled.")
+        self._set_ready()
+
+    def _on_templates_reloaded(self):
+        """Вызывается CommandTemplates после повторной загрузки определений."""
+        with self._lock:
+            self.prepare_intent_data()
+
+    def _set_ready(self):
+        """Отмечает парсер готовым и вызывает подписчиков."""
+        with self._lock:
+            self._ready.set()
+            callbacks, self._ready_callbacks = self._ready_callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def is_ready(self) -> bool:
+        """Возвращает True, если лемматизатор и полный индекс фраз загружены."""
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Ожидает окончания фоновой загрузки. Возвращает состояние готовности."""
+        return self._ready.wait(timeout)
+
+    def on_ready(self, callback: Callable[[], None]):
+        """
+        Регистрирует функцию, вызываемую после окончания загрузки.
+        Функция может быть вызвана из фонового потока; если парсер уже готов,
+        она вызывается сразу.
+        """
+        with self._lock:
+            if not self._ready.is_set():
+                self._ready_callbacks.append(callback)
+                return
+        callback()
+
     def prepare_intent_data(self):
-        """Готовит словарь 'фраза -> интент' для быстрого поиска."""
-        self.intent_phrases_map = {}
-        for intent, template in self.command_templates.intents.items():
-            for phrase in template.phrases:
-                lemmatized_phrase = self._lemmatize_text(phrase)
-                # Проверяем на дубликаты, чтобы избежать перезаписи
-                if lemmatized_phrase not in self.intent_phrases_map:
-                    self.intent_phrases_map[lemmatized_phrase] = intent
-                else:
-                    print(f"Warning: Duplicate lemmatized phrase '{lemmatized_phrase}' for intent '{intent}'. "
-                          f"It's already mapped to '{self.intent_phrases_map[lemmatized_phrase]}'.")
+        """
+        Готовит словарь 'фраза -> интент' для быстрого поиска.
+        Лемматизированные фразы берутся из дискового кэша, если он построен
+        для того же commands.json и той же версии лемматизатора.
+        """
+        cache_key = self._intent_cache_key()
+        if not self._load_intent_cache(cache_key):
+            self.intent_phrases_map, self.phrase_lemmas = {}, {}
+            for intent, template in self.command_templates.intents.items():
+                for phrase in template.phrases:
+                    lemmatized_phrase = self._lemmatize_text(phrase)
+                    self.phrase_lemmas[phrase] = lemmatized_phrase
+                    # Проверяем на дубликаты, чтобы избежать перезаписи
+                    if lemmatized_phrase not in self.intent_phrases_map:
+                        self.intent_phrases_map[lemmatized_phrase] = intent
+                    else:
+                        print(f"Warning: Duplicate lemmatized phrase '{lemmatized_phrase}' for intent '{intent}'. "
+                              f"It's already mapped to '{self.intent_phrases_map[lemmatized_phrase]}'.")
+            self._save_intent_cache(cache_key)
+        self._build_token_index()
+        self._build_param_extractors()
+        self._build_phrase_trie()
+        self.parse_cache.clear()
         print(f"Prepared {len(self.intent_phrases_map)} unique phrases for NLU matching.")
 
+    def _lemmatizer_version(self) -> str:
+        """Возвращает строку, идентифицирующую лемматизатор и его словари."""
+        meta = self.morph.dictionary.meta
+        return (f"pymorphy2-{meta.get('pymorphy2_version')}/{meta.get('language_code')}"
+                f"-{meta.get('source_revision')}-{meta.get('corpus_revision')}")
+
+    def _intent_cache_key(self) -> Optional[str]:
+        """
+        Вычисляет ключ дискового кэша по хэшу commands.json и версии лемматизатора.
+        Возвращает None, если кэш отключен, источник шаблонов неизвестен или
+        лемматизатор не загружен (фразы в нижнем регистре не требуют кэша).
+        """
+        source_hash = getattr(self.command_templates, "source_hash", None)
+        if not self.cache_path or not source_hash or not self.morph:
+            return None
+        key_data = f"{NLU_CACHE_FORMAT}|{source_hash}|{self._lemmatizer_version()}"
+        return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+    def _load_intent_cache(self, cache_key: Optional[str]) -> bool:
+        """Загружает карту фраз из кэша. Возвращает True, если кэш актуален."""
+        if not cache_key or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Failed to read NLU cache '{self.cache_path}': {e}")
+            return False
+        if (data.get("key") != cache_key or not isinstance(data.get("intent_phrases_map"), dict)
+                or not isinstance(data.get("phrase_lemmas"), dict)):
+            return False
+        self.intent_phrases_map = data["intent_phrases_map"]
+        self.phrase_lemmas = data["phrase_lemmas"]
+        print(f"NLU phrase index loaded from cache '{self.cache_path}'.")
+        return True
+
+    def _save_intent_cache(self, cache_key: Optional[str]):
+        """Сохраняет карту фраз в кэш (через временный файл, атомарно)."""
+        if not cache_key:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            cache_dir = os.path.dirname(self.cache_path)
+            if cache_dir and not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"key": cache_key, "intent_phrases_map": self.intent_phrases_map,
+                           "phrase_lemmas": self.phrase_lemmas}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: Failed to write NLU cache '{self.cache_path}': {e}")
+
+    def _build_token_index(self):
+        """
+        Строит инвертированный индекс 'лемма -> фразы', содержащие эту лемму.
+        Индекс позволяет сравнивать ввод только с фразами, у которых есть
+        хотя бы одно общее слово, вместо перебора всех фраз.
+
+        Дополнительно каждому слову назначается номер, а каждой фразе - битовая
+        маска ее слов (используется для поиска без rapidfuzz).
+        """
+        self.phrase_choices = list(self.intent_phrases_map.keys())
+        self._phrase_order = {phrase: i for i, phrase in enumerate(self.phrase_choices)}
+        self.token_index = {}
+        self.token_ids = {}
+        self.phrase_masks = []
+        for phrase in self.phrase_choices:
+            for token in phrase.split():
+                self.token_index.setdefault(token, set()).add(phrase)
+
+            mask = 0
+            for token in self.WORD_REGEX.findall(phrase):
+                mask |= 1 << self.token_ids.setdefault(token, len(self.token_ids))
+            self.phrase_masks.append((mask, bin(mask).count("1")))
+
+    def _build_phrase_trie(self):
+        """
+        Строит префиксное дерево по леммам фраз и по исходным словам фраз
+        (недописанное слово совпадает с началом словоформы, а не леммы).
+        """
+        self.phrase_trie = PhraseTrie()
+        for index, phrase in enumerate(self.phrase_choices):
+            for token in self.WORD_REGEX.findall(phrase):
+                self.phrase_trie.insert(token, index)
+        for template in self.command_templates.intents.values():
+            for phrase in template.phrases:
+                # Леммы фраз уже известны (в том числе из дискового кэша)
+                index = self._phrase_order.get(self.phrase_lemmas.get(phrase))
+                if index is None:
+                    continue
+                for word in self.WORD_REGEX.findall(phrase.lower()):
+                    self.phrase_trie.insert(word, index)
+        self._suggest_words, self._suggest_mask = (), 0
+        self._suggest_prefix, self._suggest_path = "", [self.phrase_trie.root]
+
+    def _build_param_extractors(self):
+        """Компилирует извлекатели параметров для всех интентов с параметрами."""
+        self.param_extractors = {}
+        for intent, template in self.command_templates.intents.items():
+            params = [(name, self.COMPILED_PARAM_REGEX[spec.type])
+                      for name, spec in template.params.items()
+                      if spec.type in self.COMPILED_PARAM_REGEX]
+            if params:
+                self.param_extractors[intent] = ParamExtractor(params)
+
+    def _candidate_phrases(self, lemmatized_input: str) -> List[str]:
+        """
+        Возвращает фразы, имеющие общие слова с вводом, в исходном порядке.
+        Если общих слов нет (например, из-за опечатки), возвращает все фразы,
+        чтобы нечеткий поиск мог найти совпадение.
+        """
+        candidates: Set[str] = set()
+        for token in lemmatized_input.split():
+            candidates.update(self.token_index.get(token, ()))
+        if not candidates:
+            return self.phrase_choices
+        return sorted(candidates, key=self._phrase_order.__getitem__)
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Возвращает статистику кэша лемм и кэша разборов."""
+        with self._lock:
+            return {"lemma": self.lemma_cache.stats(), "parse": self.parse_cache.stats()}
+
+    def _lemmatize_word(self, word: str) -> str:
+        """Возвращает лемму одного слова через pymorphy2 (без кэша)."""
+        return self.morph.parse(word)[0].normal_form
+
     def _lemmatize_text(self, text: str) -> str:
         """
         Приводит слова в тексте к их нормальной форме (лемме).
@@ -82,18 +501,132 @@ class AdvancedNLUParser:
         if not self.morph:
             return text.lower()
         
-        words = re.findall(r'[a-zа-я0-9]+', text.lower())
-        lemmas = [self.morph.parse(word)[0].normal_form for word in words]
+        words = self.WORD_REGEX.findall(text.lower())
+        lemmas = [self.lemma_cache.get(word) for word in words]
         return " ".join(lemmas)
 
     def parse(self, text: str) -> Dict[str, Any]:
         """
         Основной метод, выполняющий полный разбор текста команды.
         """
-        lemmatized_input = self._lemmatize_text(text)
-        
-        intent = self._find_intent(lemmatized_input)
-        
+        with self._lock:
+            intent = self.parse_cache.get(self._normalize_input(text))
+            # Параметры извлекаются из исходного текста при каждом вызове
+            return self._build_result(text, intent)
+
+    def _normalize_input(self, text: str) -> str:
+        """
+        Приводит команду к ключу кэша разборов. Ключ выбран так, чтобы его
+        лемматизация совпадала с лемматизацией исходного текста.
+        """
+        if not self.morph:
+            return text.lower()
+        return " ".join(self.WORD_REGEX.findall(text.lower()))
+
+    def _match_normalized(self, normalized_text: str) -> Optional[str]:
+        """Определяет интент для нормализованной команды (при промахе кэша)."""
+        return self._find_intent(self._lemmatize_text(normalized_text))
+
+    def parse_many(self, texts: Sequence[str], workers: int = 1,
+                   return_scores: bool = False) -> Union[List[Dict[str, Any]], Tuple[List[Dict[str, Any]], Any]]:
+        """
+        Пакетный разбор команд (например, для прогона журнала команд).
+
+        Все тексты лемматизируются разом, а оценки сходства со всеми фразами
+        вычисляются одной матричной операцией rapidfuzz.process.cdist.
+        Результаты совпадают с результатами parse() для каждого текста.
+
+        Args:
+            texts: Список команд на естественном языке.
+            workers: Количество потоков для cdist (-1 - все ядра).
+            return_scores: Вернуть также матрицу оценок
+                           (строки - тексты, столбцы - self.phrase_choices).
+
+        Returns:
+            Список словарей {"intent", "params"} или кортеж
+            (список, матрица оценок), если return_scores=True.
+        """
+        with self._lock:
+            lemmatized_inputs = [self._lemmatize_text(text) for text in texts]
+
+            if not (RAPIDFuzz_AVAILABLE and NUMPY_AVAILABLE) or not self.phrase_choices:
+                results = [self._build_result(text, self._find_intent(lemmatized))
+                           for text, lemmatized in zip(texts, lemmatized_inputs)]
+                return (results, None) if return_scores else results
+
+            scores = process.cdist(lemmatized_inputs, self.phrase_choices, scorer=fuzz.WRatio,
+                                   workers=workers)
+
+            results = []
+            for row, (text, lemmatized) in enumerate(zip(texts, lemmatized_inputs)):
+                intent = self.intent_phrases_map.get(lemmatized)
+                if not intent:
+                    # Ограничиваем выбор теми же кандидатами, что и в _find_intent
+                    columns = [self._phrase_order[p] for p in self._candidate_phrases(lemmatized)]
+                    row_scores = scores[row, columns]
+                    best = int(np.argmax(row_scores))
+                    if row_scores[best] >= self.FUZZY_SCORE_CUTOFF:
+                        intent = self.intent_phrases_map[self.phrase_choices[columns[best]]]
+                results.append(self._build_result(text, intent))
+
+            return (results, scores) if return_scores else results
+
+    def suggest(self, text: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """
+        Возвращает до limit интентов, наиболее подходящих к частично
+        введенной команде, с оценкой 0-100.
+
+        Законченные слова лемматизируются и сравниваются с масками фраз,
+        последнее (недописанное) слово ищется в префиксном дереве. Состояние
+        сохраняется между вызовами: при дописывании слова спуск по дереву
+        продолжается с прошлого узла, а законченные слова не разбираются заново.
+        """
+        with self._lock:
+            words = self.WORD_REGEX.findall(text.lower())
+            prefix = ""
+            if words and text and not text[-1].isspace():
+                prefix = words.pop()
+
+            complete = tuple(words)
+            if complete != self._suggest_words:
+                mask = 0
+                for word in complete:
+                    lemma = self.lemma_cache.get(word) if self.morph else word
+                    token_id = self.token_ids.get(lemma, self.token_ids.get(word))
+                    if token_id is not None:
+                        mask |= 1 << token_id
+                self._suggest_words, self._suggest_mask = complete, mask
+                self._suggest_prefix, self._suggest_path = "", [self.phrase_trie.root]
+
+            # Продолжаем спуск по дереву от общего с прошлым вводом префикса
+            path = self._suggest_path
+            common = len(os.path.commonprefix([self._suggest_prefix, prefix]))
+            del path[common + 1:]
+            for char in prefix[common:]:
+                path.append(PhraseTrie.step(path[-1], char))
+            self._suggest_prefix = prefix
+            prefix_phrases = path[-1].phrases if prefix and path[-1] is not None else set()
+
+            if not self._suggest_mask and not prefix_phrases:
+                return []
+
+            best: Dict[str, Tuple[float, int, int]] = {}
+            for index, (phrase_mask, phrase_size) in enumerate(self.phrase_masks):
+                matched = bin(phrase_mask & self._suggest_mask).count("1")
+                if index in prefix_phrases and matched < phrase_size:
+                    matched += 1
+                if not matched:
+                    continue
+                intent = self.intent_phrases_map[self.phrase_choices[index]]
+                rank = (matched / phrase_size, matched, -index)
+                if intent not in best or rank > best[intent]:
+                    best[intent] = rank
+
+            ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [(intent, round(rank[0] * 100, 1)) for intent, rank in ranked]
+
+    def _build_result(self, text: str, intent: Optional[str]) -> Dict[str, Any]:
+        """Формирует итоговый результат разбора для найденного интента."""
         if not intent:
             return {"intent": None, "params": {}}
             
@@ -112,17 +645,19 @@ class AdvancedNLUParser:
         """
         Находит наиболее подходящий интент для лемматизированного ввода.
         """
+        # Точное совпадение с фразой не требует нечеткого поиска
+        exact_intent = self.intent_phrases_map.get(lemmatized_input)
+        if exact_intent:
+            return exact_intent
+
         if not RAPIDFuzz_AVAILABLE:
-            # Простой, но менее надежный поиск
-            for phrase, intent in self.intent_phrases_map.items():
-                if all(word in lemmatized_input for word in phrase.split()):
-                    return intent
-            return None
+            return self._find_intent_bitset(lemmatized_input)
 
         # Нечеткий поиск с высоким порогом
-        choices = list(self.intent_phrases_map.keys())
+        choices = self._candidate_phrases(lemmatized_input)
         # Используем WRatio, который хорошо справляется с разным порядком слов
-        best_match = process.extractOne(lemmatized_input, choices, scorer=fuzz.WRatio, score_cutoff=88)
+        best_match = process.extractOne(lemmatized_input, choices, scorer=fuzz.WRatio,
+                                        score_cutoff=self.FUZZY_SCORE_CUTOFF)
         
         if best_match:
             best_phrase, score, _ = best_match
@@ -132,29 +667,54 @@ class AdvancedNLUParser:
         print(f"NLU: No intent found with sufficient score for '{lemmatized_input}'")
         return None
 
-    def _extract_params(self, text: str, intent: str) -> Dict[str, Any]:
+    def extract_param_spans(self, text: str, intent: str) -> List[ParamMatch]:
         """
-        Извлекает параметры из текста на основе спецификации интента.
+        Извлекает параметры интента вместе с их позициями в исходном тексте.
+        Позиции можно использовать для подсветки найденных значений.
         """
-        params: Dict[str, Any] = {}
-        template = self.command_templates.get_intent_template(intent)
-        
-        if not template:
-            return params
-            
-        text_to_parse = text
-        for param_name, param_spec in template.params.items():
-            regex = self.PARAM_REGEX.get(param_spec.type)
-            if not regex:
+        extractor = self.param_extractors.get(intent)
+        if not extractor:
+            return []
+        return extractor.extract(text)
+
+    def _find_intent_bitset(self, lemmatized_input: str) -> Optional[str]:
+        """
+        Поиск интента без rapidfuzz: сравнивает битовые маски слов ввода и фраз.
+        Оценка - доля слов фразы, найденных во вводе; при равенстве выигрывает
+        фраза с большим числом совпавших слов, затем - объявленная раньше.
+        """
+        input_mask = 0
+        for token in self.WORD_REGEX.findall(lemmatized_input):
+            token_id = self.token_ids.get(token)
+            if token_id is not None:
+                input_mask |= 1 << token_id
+        if not input_mask:
+            print(f"NLU: No intent found for '{lemmatized_input}'")
+            return None
+
+        best_score, best_index = (0.0, 0), -1
+        for index, (phrase_mask, phrase_size) in enumerate(self.phrase_masks):
+            matched = bin(phrase_mask & input_mask).count("1")
+            if not matched:
                 continue
+            score = (matched / phrase_size, matched)
+            if score[0] >= self.BITSET_MIN_COVERAGE and score > best_score:
+                best_score, best_index = score, index
 
-            match = re.search(regex, text_to_parse, re.IGNORECASE)
-            if match:
-                # Если у регулярки есть группа, берем ее, иначе - все совпадение
-                value = match.group(1) if match.groups() else match.group(0)
-                params[param_name] = value
-                # Удаляем найденный параметр из строки, чтобы не найти его снова
-                text_to_parse = text_to_parse[:match.start()] + text_to_parse[match.end():]
+        if best_index < 0:
+            print(f"NLU: No intent found for '{lemmatized_input}'")
+            return None
+
+        best_phrase = self.phrase_choices[best_index]
+        print(f"NLU match: '{best_phrase}' with coverage {best_score[0]:.2f} for input '{lemmatized_input}'")
+        return self.intent_phrases_map[best_phrase]
 
+    def _extract_params(self, text: str, intent: str) -> Dict[str, Any]:
+        """
+        Извлекает параметры из текста на основе спецификации интента.
+        """
+        params: Dict[str, Any] = {
+            match.name: match.value for match in self.extract_param_spans(text, intent)
+        }
         print(f"Extracted params for intent '{intent}': {params}")
         return params